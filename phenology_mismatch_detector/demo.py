@@ -2,13 +2,19 @@
 EcoSync -  Demo Script
 Demonstrates all capabilities of the AI agent
 """
+import os
+import sys
 import time
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
 import pandas as pd
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scripts'))
+from climate_features import load_feature_store
+from payload_schema import COMMON_CODES, TYPE_CODES, TIMING_FIELDS, LISTING_FIELDS, decode_observation
+from embedders import get_embedder
+
 def print_header(text, char="="):
    
     width = 70
@@ -28,7 +34,7 @@ def pause(seconds=2):
 
 # Initialize
 client = QdrantClient("localhost", port=6333)
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+embedder = get_embedder()
 
 print("""
 ╔══════════════════════════════════════════════════════════════════════╗
@@ -94,16 +100,18 @@ results = client.query_points(
     query=query_vector,
     limit=3,
     query_filter=Filter(must=[
-        FieldCondition(key="species_type", match=MatchValue(value="butterfly")),
+        FieldCondition(key="type_id", match=MatchValue(value=TYPE_CODES["butterfly"])),
         FieldCondition(key="year", match=MatchValue(value=2024))
-    ])
+    ]),
+    with_payload=LISTING_FIELDS + ['season_id']
 ).points
 
 print(f"🔍 Retrieved {len(results)} relevant observations:\n")
 
 for i, r in enumerate(results, 1):
-    print(f"  {i}. {r.payload.get('species_common')} - {r.payload.get('observed_date', '')[:10]}")
-    print(f"     Day of Year: {r.payload.get('day_of_year')}, Season: {r.payload.get('season')}")
+    obs = decode_observation(r.payload)
+    print(f"  {i}. {obs['species_common']} - {obs['observed_date']}")
+    print(f"     Day of Year: {obs['day_of_year']}, Season: {obs['season']}")
     print()
 
 pause(2)
@@ -173,9 +181,10 @@ bee_obs = client.query_points(
     query=embedder.encode("Giant Honey Bee").tolist(),
     limit=200,
     query_filter=Filter(must=[
-        FieldCondition(key="species_common", match=MatchValue(value="Giant Honey Bee")),
+        FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES["Giant Honey Bee"])),
         FieldCondition(key="year", match=MatchValue(value=2024))
-    ])
+    ]),
+    with_payload=TIMING_FIELDS
 ).points
 
 mango_obs = client.query_points(
@@ -183,9 +192,10 @@ mango_obs = client.query_points(
     query=embedder.encode("Mango").tolist(),
     limit=200,
     query_filter=Filter(must=[
-        FieldCondition(key="species_common", match=MatchValue(value="Mango")),
+        FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES["Mango"])),
         FieldCondition(key="year", match=MatchValue(value=2024))
-    ])
+    ]),
+    with_payload=TIMING_FIELDS
 ).points
 
 bee_median = pd.Series([b.payload['day_of_year'] for b in bee_obs]).median()
@@ -213,12 +223,21 @@ pause(3)
 
 print_header("SECTION 7: CAUSAL REASONING")
 
-print("""
+climate_features = load_feature_store()
+pre_monsoon_anomaly = climate_features.window_anomaly('temperature_mean', 2024)
+gdd_advance = climate_features.gdd_advance(2024, reference_doy=90)
+if gdd_advance is None:
+    gdd_line = "Heat accumulation (GDD) never reached its 2019-2020 end-of-March level"
+else:
+    timing = f"{abs(gdd_advance)} days {'earlier' if gdd_advance >= 0 else 'later'} than"
+    gdd_line = f"Heat accumulation (GDD) reached its 2019-2020 end-of-March level {timing} baseline"
+
+print(f"""
 🔗 WHY THE MISMATCH OCCURRED:
 
 1. CLIMATE DRIVER:
-   • Pre-monsoon temperatures increased by ~2°C
-   • Warming advanced by 10 days over baseline
+   • Pre-monsoon 2024 temperatures {pre_monsoon_anomaly:+.1f}°C vs 2019-2020
+   • {gdd_line}
 
 2. PLANT RESPONSE (Fast):
    • Mango flowering responds directly to temperature
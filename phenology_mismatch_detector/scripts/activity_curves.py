@@ -0,0 +1,159 @@
+"""
+Smoothed periodic activity curves and consumer-resource overlap
+
+Each species/year gets a 366-bin circular kernel density of its observation
+days (Gaussian kernel applied in the Fourier domain, so it wraps Dec -> Jan).
+Curves are stored as one dense array, so overlap between any set of curves
+is a single matrix product.
+"""
+import numpy as np
+import pandas as pd
+
+from circular_stats import YEAR_DAYS
+from species_catalog import COMMON_TO_KEY, SPECIES_RELATIONSHIPS
+
+CURVES_PATH = 'data/processed/activity_curves.npz'
+DEFAULT_BANDWIDTH_DAYS = 10
+
+
+def circular_kde(hist, bandwidth_days=DEFAULT_BANDWIDTH_DAYS):
+    """Smooth DOY histograms (..., 366) into densities that sum to 1"""
+    hist = np.asarray(hist, dtype=float)
+
+    freqs = np.arange(YEAR_DAYS // 2 + 1)
+    kernel = np.exp(-0.5 * (2 * np.pi * freqs * bandwidth_days / YEAR_DAYS) ** 2)
+
+    smoothed = np.fft.irfft(np.fft.rfft(hist, axis=-1) * kernel, n=YEAR_DAYS, axis=-1)
+    smoothed = np.clip(smoothed, 0, None)
+
+    totals = smoothed.sum(axis=-1, keepdims=True)
+    return np.divide(smoothed, totals, out=np.zeros_like(smoothed), where=totals > 0)
+
+
+class ActivityCurves:
+    """Dense (n_curves, 366) activity densities with a key -> row index"""
+
+    def __init__(self, keys, curves, key_names=('species_key', 'year'), counts=None):
+        self.keys = [tuple(k) for k in keys]
+        self.curves = np.asarray(curves, dtype=float)
+        self.key_names = tuple(key_names)
+        self.counts = np.zeros(len(self.keys), dtype=int) if counts is None else np.asarray(counts)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self._sqrt = np.sqrt(self.curves)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return tuple(key) in self.index
+
+    def curve(self, key):
+        return self.curves[self.index[tuple(key)]]
+
+    def rows(self, keys):
+        return np.array([self.index[tuple(k)] for k in keys], dtype=int)
+
+    def overlap_matrix(self, rows_a=None, rows_b=None):
+        """Bhattacharyya overlap (0-1) between every curve in rows_a and rows_b"""
+        a = self._sqrt if rows_a is None else self._sqrt[rows_a]
+        b = self._sqrt if rows_b is None else self._sqrt[rows_b]
+        return a @ b.T
+
+    def overlap_coefficient(self, rows_a, rows_b):
+        """Shared area under paired curves (sum of pointwise minimum)"""
+        return np.minimum(self.curves[rows_a], self.curves[rows_b]).sum(axis=-1)
+
+    def save(self, path=CURVES_PATH):
+        key_columns = {
+            f'key_{name}': np.array([k[i] for k in self.keys])
+            for i, name in enumerate(self.key_names)
+        }
+        np.savez_compressed(
+            path,
+            curves=self.curves,
+            counts=self.counts,
+            key_names=np.array(self.key_names),
+            **key_columns
+        )
+
+    @classmethod
+    def load(cls, path=CURVES_PATH):
+        data = np.load(path)
+        key_names = tuple(str(n) for n in data['key_names'])
+        columns = [data[f'key_{name}'].tolist() for name in key_names]
+        return cls(list(zip(*columns)), data['curves'], key_names, data['counts'])
+
+
+def build_activity_curves(df, by=('species_key', 'year'), bandwidth_days=DEFAULT_BANDWIDTH_DAYS,
+                          weight_col=None):
+    """Build one activity curve per group of an observations dataframe"""
+    by = list(by)
+    grouped = df.groupby(by, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    n_groups = grouped.ngroups
+
+    doys = df['day_of_year'].to_numpy(dtype=int)
+    weights = df[weight_col].to_numpy(dtype=float) if weight_col else None
+
+    hist = np.bincount(
+        codes * YEAR_DAYS + doys - 1, weights=weights, minlength=n_groups * YEAR_DAYS
+    ).reshape(n_groups, YEAR_DAYS)
+
+    sizes = grouped.size()
+    keys = [k if isinstance(k, tuple) else (k,) for k in sizes.index]
+
+    return ActivityCurves(keys, circular_kde(hist, bandwidth_days), by, sizes.to_numpy())
+
+
+def relationship_overlap(curves, relationships=SPECIES_RELATIONSHIPS, years=None):
+    """
+    Overlap between consumer and resource activity for every relationship
+    and year where both species have a curve.
+    """
+    if years is None:
+        years = sorted({k[1] for k in curves.keys})
+
+    pairs = []
+    for rel in relationships:
+        consumer_key = COMMON_TO_KEY.get(rel['consumer'])
+        resource_key = COMMON_TO_KEY.get(rel['resource'])
+
+        for year in years:
+            if (consumer_key, year) in curves and (resource_key, year) in curves:
+                pairs.append((rel, year, curves.index[(consumer_key, year)], curves.index[(resource_key, year)]))
+
+    if not pairs:
+        return pd.DataFrame()
+
+    consumer_rows = np.array([p[2] for p in pairs])
+    resource_rows = np.array([p[3] for p in pairs])
+
+    # One matrix product covers every consumer x resource curve combination
+    overlap = curves.overlap_matrix()
+
+    return pd.DataFrame({
+        'consumer': [p[0]['consumer'] for p in pairs],
+        'resource': [p[0]['resource'] for p in pairs],
+        'relationship': [p[0]['relationship'] for p in pairs],
+        'year': [p[1] for p in pairs],
+        'consumer_obs': curves.counts[consumer_rows],
+        'resource_obs': curves.counts[resource_rows],
+        'bhattacharyya_overlap': overlap[consumer_rows, resource_rows],
+        'overlap_coefficient': curves.overlap_coefficient(consumer_rows, resource_rows)
+    })
+
+
+if __name__ == "__main__":
+
+    print("📈 BUILDING ACTIVITY CURVES")
+    print("="*70)
+
+    df = pd.read_csv('data/processed/all_species_combined.csv')
+
+    curves = build_activity_curves(df)
+    curves.save()
+    print(f"\n✅ Built {len(curves)} species/year curves → {CURVES_PATH}")
+
+    overlap = relationship_overlap(curves)
+    print("\n🔗 Consumer-resource activity overlap:\n")
+    print(overlap.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
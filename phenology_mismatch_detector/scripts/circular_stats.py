@@ -0,0 +1,136 @@
+"""
+Circular (day-of-year wraparound) statistics for phenology timing
+
+Day of year is treated as an angle on a 366-day circle, so Dec 31 and Jan 1
+are one day apart instead of 364. All functions are vectorized over DOY arrays.
+"""
+import numpy as np
+import pandas as pd
+
+YEAR_DAYS = 366
+HALF_YEAR = YEAR_DAYS / 2
+
+_DISTANCE_MATRIX = None
+
+
+def doy_to_angle(doy):
+    """Map day of year (1-366) to an angle in radians"""
+    return 2 * np.pi * (np.asarray(doy, dtype=float) - 1) / YEAR_DAYS
+
+
+def angle_to_doy(angle):
+    """Map an angle in radians back to day of year, within 1-366"""
+    doy = np.mod(angle, 2 * np.pi) * YEAR_DAYS / (2 * np.pi) + 1
+    # (366, 367) lies between Dec 31 and Jan 1: wrap to whichever is nearer
+    return np.where(doy > YEAR_DAYS + 0.5, 1.0, np.minimum(doy, YEAR_DAYS))
+
+
+def circular_distance(doy_a, doy_b):
+    """Signed shortest distance a - b in days, in (-183, 183]"""
+    diff = np.asarray(doy_a, dtype=float) - np.asarray(doy_b, dtype=float)
+    return HALF_YEAR - np.mod(HALF_YEAR - diff, YEAR_DAYS)
+
+
+def circular_mean(doys, weights=None):
+    """Return (mean DOY, resultant length) of a set of days of year"""
+    angles = doy_to_angle(doys)
+    if angles.size == 0:
+        return np.nan, np.nan
+
+    weights = np.ones_like(angles) if weights is None else np.asarray(weights, dtype=float)
+    c = np.sum(weights * np.cos(angles)) / np.sum(weights)
+    s = np.sum(weights * np.sin(angles)) / np.sum(weights)
+
+    return float(angle_to_doy(np.arctan2(s, c))), float(np.hypot(c, s))
+
+
+def resultant_length(doys, weights=None):
+    """Concentration of timing: 1 = all on one day, 0 = spread evenly"""
+    return circular_mean(doys, weights)[1]
+
+
+def circular_sd_days(resultant):
+    """Circular standard deviation in days from a resultant length"""
+    resultant = np.clip(np.asarray(resultant, dtype=float), 1e-12, 1)
+    return np.sqrt(np.abs(2 * np.log(resultant))) * YEAR_DAYS / (2 * np.pi)
+
+
+def doy_histogram(doys, weights=None):
+    """Counts per day of year as a length-366 array"""
+    idx = np.asarray(doys, dtype=int) - 1
+    return np.bincount(idx, weights=weights, minlength=YEAR_DAYS).astype(float)
+
+
+def _distance_matrix():
+    """366 x 366 absolute circular distances between days"""
+    global _DISTANCE_MATRIX
+
+    if _DISTANCE_MATRIX is None:
+        days = np.arange(1, YEAR_DAYS + 1)
+        _DISTANCE_MATRIX = np.abs(circular_distance(days[:, None], days[None, :]))
+
+    return _DISTANCE_MATRIX
+
+
+def histogram_circular_median(hist):
+    """
+    Circular median from DOY histograms of shape (366,) or (groups, 366).
+
+    The median is the day minimising total circular distance to all
+    observations; ties are resolved to the centre of the tied arc.
+    """
+    hist = np.atleast_2d(np.asarray(hist, dtype=float))
+    cost = hist @ _distance_matrix()
+
+    tied = cost <= cost.min(axis=1, keepdims=True) + 1e-9
+    angles = doy_to_angle(np.arange(1, YEAR_DAYS + 1))
+    median = angle_to_doy(np.arctan2(tied @ np.sin(angles), tied @ np.cos(angles)))
+    median[hist.sum(axis=1) == 0] = np.nan
+
+    return median if median.size > 1 else float(median[0])
+
+
+def circular_median(doys, weights=None):
+    """Circular median day of year"""
+    if np.asarray(doys).size == 0:
+        return np.nan
+    return histogram_circular_median(doy_histogram(doys, weights))
+
+
+def circular_summary(df, by, doy_col='day_of_year', weight_col=None):
+    """
+    Circular timing statistics for every group of a dataframe in one pass.
+
+    Returns one row per group with n, mean_doy, median_doy,
+    resultant_length and sd_days.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    grouped = df.groupby(by, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    n_groups = grouped.ngroups
+
+    doys = df[doy_col].to_numpy(dtype=int)
+    weights = df[weight_col].to_numpy(dtype=float) if weight_col else np.ones(len(df))
+    angles = doy_to_angle(doys)
+
+    total = np.bincount(codes, weights=weights, minlength=n_groups)
+    c = np.bincount(codes, weights=weights * np.cos(angles), minlength=n_groups) / total
+    s = np.bincount(codes, weights=weights * np.sin(angles), minlength=n_groups) / total
+    resultant = np.hypot(c, s)
+
+    hist = np.bincount(
+        codes * YEAR_DAYS + doys - 1, weights=weights, minlength=n_groups * YEAR_DAYS
+    ).reshape(n_groups, YEAR_DAYS)
+
+    summary = pd.DataFrame(
+        {
+            'n': np.bincount(codes, minlength=n_groups),
+            'mean_doy': angle_to_doy(np.arctan2(s, c)),
+            'median_doy': np.atleast_1d(histogram_circular_median(hist)),
+            'resultant_length': resultant,
+            'sd_days': circular_sd_days(resultant),
+        },
+        index=grouped.size().index
+    )
+
+    return summary
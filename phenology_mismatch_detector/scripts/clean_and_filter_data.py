@@ -1,7 +1,15 @@
 import pandas as pd
 import numpy as np
 import os
+import tempfile
 from datetime import datetime
+from window_analysis import BASELINE_YEARS, CURRENT_YEARS, YearlyHistograms, format_years, parse_years, period_path
+from species_catalog import SPECIES_INFO
+from effort_correction import add_effort_weights
+from outlier_detection import filter_outliers, OUTLIER_MODES, OUTLIERS_PATH
+from climate_drivers import rank_climate_drivers, DRIVERS_PATH
+from streaming import (DEFAULT_MEMORY_MB, iter_csv_chunks, chunk_rows_for_budget, count_lines,
+                       iter_unique_chunks, append_csv, peak_rss_mb)
 
 print("CLEANING AND FILTERING PHENOLOGY DATA")
 print("="*70)
@@ -17,35 +25,15 @@ KARNATAKA_BOUNDS = {
 }
 
 
-SPECIES_INFO = {
-    'papilio_polytes': {'type': 'butterfly', 'common': 'Common Mormon', 'role': 'consumer'},
-    'danaus_chrysippus': {'type': 'butterfly', 'common': 'Plain Tiger', 'role': 'consumer'},
-    'apis_cerana': {'type': 'bee', 'common': 'Asian Honey Bee', 'role': 'pollinator'},
-    'apis_dorsata': {'type': 'bee', 'common': 'Giant Honey Bee', 'role': 'pollinator'},
-    'leptocoma_zeylonica': {'type': 'bird', 'common': 'Purple-rumped Sunbird', 'role': 'consumer'},
-    'eudynamys_scolopaceus': {'type': 'bird', 'common': 'Asian Koel', 'role': 'consumer'},
-    'murraya_koenigii': {'type': 'plant', 'common': 'Curry Leaf', 'role': 'resource'},
-    'mangifera_indica': {'type': 'plant', 'common': 'Mango', 'role': 'resource'},
-    'ficus_benghalensis': {'type': 'plant', 'common': 'Banyan', 'role': 'resource'},
-    'lantana_camara': {'type': 'plant', 'common': 'Lantana', 'role': 'resource'}
-}
-
-def clean_species_data(filename, species_key):
-    
+def clean_chunk(df, species_key):
+    """Column mapping, date/bounds filters and derived fields for raw rows"""
     
-    filepath = f'data/raw/{filename}'
     info = SPECIES_INFO[species_key]
     
-    print(f"\n🔧 Processing {info['common']} ({info['type']})...")
-    
-    
-    df = pd.read_csv(filepath)
-    original_count = len(df)
-    
-    
     column_mapping = {
         'id': 'observation_id',
         'observed_on': 'observed_date',
+        'user': 'user_login',
     }
     df = df.rename(columns=column_mapping)
     
@@ -108,38 +96,107 @@ def clean_species_data(filename, species_key):
     final_columns = [
         'observation_id', 'species_key', 'species_common', 'species_type', 'species_role',
         'observed_date', 'year', 'month', 'day', 'day_of_year', 'season',
-        'latitude', 'longitude', 'place_guess', 'scientific_name', 'quality_grade'
+        'latitude', 'longitude', 'place_guess', 'scientific_name', 'quality_grade', 'user_login'
     ]
     
     
     final_columns = [col for col in final_columns if col in df.columns]
-    df = df[final_columns]
+    return df[final_columns]
+
+def clean_species_data(filename, species_key, memory_mb=None, raw_dir='data/raw', output_dir='data/processed'):
+    """
+    Clean one raw export into {output_dir}/{species_key}_cleaned.csv and
+    return {'original', 'cleaned', 'years'}: row counts before and after
+    cleaning and the per-year totals. With memory_mb set, the raw file is
+    streamed in chunks sized to that ceiling and rows are deduplicated
+    through on-disk hash buckets. Read the output back with read_cleaned.
+    """
+    
+    filepath = f'{raw_dir}/{filename}'
+    info = SPECIES_INFO[species_key]
     
+    print(f"\n🔧 Processing {info['common']} ({info['type']})...")
     
-    output_file = f'data/processed/{species_key}_cleaned.csv'
-    df.to_csv(output_file, index=False)
+    output_file = f'{output_dir}/{species_key}_cleaned.csv'
+    
+    if memory_mb is None:
+        raw = pd.read_csv(filepath)
+        original_count = len(raw)
+        df = clean_chunk(raw, species_key)
+        df.to_csv(output_file, index=False)
+        cleaned_count, year_counts = len(df), df['year'].value_counts().sort_index()
+    else:
+        chunk_rows = chunk_rows_for_budget(filepath, memory_mb)
+        seen = {'original': 0, 'columns': []}
+        
+        def cleaned_chunks():
+            for chunk in iter_csv_chunks(filepath, chunksize=chunk_rows):
+                seen['original'] += len(chunk)
+                chunk = clean_chunk(chunk, species_key)
+                seen['columns'] = chunk.columns
+                yield chunk
+        
+        # Duplicates can span chunk boundaries: one bucket of rows per memory budget
+        n_buckets = max(1, -(-count_lines(filepath) // chunk_rows))
+        cleaned_count, year_counts = 0, pd.Series(dtype=np.int64)
+        with tempfile.TemporaryDirectory(dir=output_dir) as workdir:
+            unique = iter_unique_chunks(cleaned_chunks(), 'observation_id', n_buckets, workdir)
+            for i, chunk in enumerate(unique):
+                append_csv(chunk, output_file, first=(i == 0))
+                cleaned_count += len(chunk)
+                year_counts = year_counts.add(chunk['year'].value_counts(), fill_value=0)
+        
+        # Every row filtered out: still leave a (header-only) output for read_cleaned
+        if cleaned_count == 0:
+            pd.DataFrame(columns=seen['columns']).to_csv(output_file, index=False)
+        
+        original_count = seen['original']
+        year_counts = year_counts.astype(np.int64).sort_index()
     
   
-    removed = original_count - len(df)
+    removed = original_count - cleaned_count
     removal_pct = (removed / original_count * 100) if original_count > 0 else 0
     
-    print(f"  📊 Original: {original_count:,} → Cleaned: {len(df):,} (removed {removed:,} / {removal_pct:.1f}%)")
+    print(f"  📊 Original: {original_count:,} → Cleaned: {cleaned_count:,} (removed {removed:,} / {removal_pct:.1f}%)")
+    if memory_mb is not None:
+        print(f"  💾 Streamed in chunks ({memory_mb} MB ceiling), peak RSS {peak_rss_mb():.0f} MB")
     
     
-    year_counts = df['year'].value_counts().sort_index()
     print(f"  📅 Year distribution:")
     for year, count in year_counts.items():
         print(f"     {year}: {count:>4} obs")
     
-    return df
+    return {'original': original_count, 'cleaned': cleaned_count, 'years': year_counts}
 
-def create_combined_dataset(all_data):
+def read_cleaned(species_keys, memory_mb=None, output_dir='data/processed'):
+    """
+    Cleaned species files as {species_key: DataFrame}, each read chunk by
+    chunk (sized to memory_mb when set). Outlier and effort scoring pool all
+    species, so the combined rows themselves are the working set.
+    """
+    
+    all_data = {}
+    for species_key in species_keys:
+        path = f'{output_dir}/{species_key}_cleaned.csv'
+        if os.path.exists(path):
+            chunks = iter_csv_chunks(path, memory_mb or DEFAULT_MEMORY_MB, parse_dates=['observed_date'])
+            all_data[species_key] = pd.concat(chunks, ignore_index=True)
+    
+    return all_data
+
+def create_combined_dataset(all_data, outliers='drop'):
     """Combine all species into single dataset"""
     
     print("\n Creating combined dataset...")
     
     combined = pd.concat(all_data.values(), ignore_index=True)
     
+    # Out-of-season, spatially isolated records (see outlier_detection)
+    combined = filter_outliers(combined, mode=outliers)
+    
+    # Observer-effort weights (week x region, pooled over all taxa)
+    combined = add_effort_weights(combined)
+    
     # Save
     combined.to_csv('data/processed/all_species_combined.csv', index=False)
     
@@ -148,26 +205,30 @@ def create_combined_dataset(all_data):
     
     return combined
 
-def create_baseline_vs_current(combined_df):
-    """Create baseline (2019-2020) vs current (2022-2024) comparison"""
+def create_baseline_vs_current(combined_df, baseline=BASELINE_YEARS, current=CURRENT_YEARS):
+    """Export the baseline and current windows' observations (inclusive year ranges)"""
     
     print("\n📊 Creating baseline vs current datasets...")
     
-    baseline = combined_df[combined_df['year'].isin([2019, 2020])]
-    current = combined_df[combined_df['year'].isin([2022, 2023, 2024])]
-    
-    baseline.to_csv('data/processed/baseline_2019_2020.csv', index=False)
-    current.to_csv('data/processed/current_2022_2024.csv', index=False)
-    
-    print(f"  📅 Baseline (2019-2020): {len(baseline):,} observations")
-    print(f"  📅 Current (2022-2024): {len(current):,} observations")
+    periods = {}
+    for name, years in [('baseline', baseline), ('current', current)]:
+        periods[name] = combined_df[combined_df['year'].between(*years)]
+        periods[name].to_csv(period_path(name, years), index=False)
+        print(f"  📅 {name.capitalize()} ({format_years(years)}): {len(periods[name]):,} observations")
     
-    return baseline, current
+    return periods['baseline'], periods['current']
 
-def analyze_temporal_patterns(combined_df):
+def analyze_temporal_patterns(combined_df, baseline=BASELINE_YEARS, current=CURRENT_YEARS):
+    """Baseline vs current timing per species using circular DOY statistics"""
     
+    print(f"\n🔍 Analyzing temporal patterns ({format_years(baseline)} → {format_years(current)})...")
     
-    print("\n🔍 Analyzing temporal patterns...")
+    # Any window's histogram is a difference of cumulative yearly histograms
+    stats = YearlyHistograms.from_frame(combined_df).compare(baseline, current)
+    
+    corrected = None
+    if 'effort_weight' in combined_df.columns:
+        corrected = YearlyHistograms.from_frame(combined_df, weight_col='effort_weight').compare(baseline, current)
     
     summary = []
     
@@ -177,20 +238,27 @@ def analyze_temporal_patterns(combined_df):
         if len(species_df) < 10:
             continue
         
+        row_stats = stats.loc[species_key]
+        has_baseline = row_stats['baseline_n'] > 0
+        has_current = row_stats['current_n'] > 0
         
-        baseline_doy = species_df[species_df['year'].isin([2019, 2020])]['day_of_year'].median()
-        current_doy = species_df[species_df['year'].isin([2022, 2023, 2024])]['day_of_year'].median()
-        
-        shift = current_doy - baseline_doy if (pd.notna(baseline_doy) and pd.notna(current_doy)) else None
-        
-        summary.append({
+        row = {
             'species': SPECIES_INFO[species_key]['common'],
             'type': SPECIES_INFO[species_key]['type'],
             'total_obs': len(species_df),
-            'baseline_median_doy': baseline_doy,
-            'current_median_doy': current_doy,
-            'shift_days': shift
-        })
+            'baseline_median_doy': row_stats['baseline_median_doy'],
+            'current_median_doy': row_stats['current_median_doy'],
+            'shift_days': float(row_stats['shift_days']) if (has_baseline and has_current) else None,
+            'baseline_concentration': row_stats['baseline_resultant_length'] if has_baseline else np.nan,
+            'current_concentration': row_stats['current_resultant_length'] if has_current else np.nan
+        }
+        
+        if corrected is not None and has_baseline and has_current:
+            row['corrected_baseline_median_doy'] = corrected.loc[species_key, 'baseline_median_doy']
+            row['corrected_current_median_doy'] = corrected.loc[species_key, 'current_median_doy']
+            row['corrected_shift_days'] = float(corrected.loc[species_key, 'shift_days'])
+        
+        summary.append(row)
     
     summary_df = pd.DataFrame(summary)
     summary_df.to_csv('data/processed/phenology_summary.csv', index=False)
@@ -200,29 +268,39 @@ def analyze_temporal_patterns(combined_df):
     
     return summary_df
 
-def main():
+def build_combined_outputs(all_data, outliers='drop', baseline=BASELINE_YEARS, current=CURRENT_YEARS):
+    """Combined dataset, period splits, shift summary and climate drivers from cleaned species"""
+    
+    combined = create_combined_dataset(all_data, outliers)
+    
+    create_baseline_vs_current(combined, baseline, current)
+    
+    analyze_temporal_patterns(combined, baseline, current)
+    
+    drivers = rank_climate_drivers(combined)
+    drivers.to_csv(DRIVERS_PATH, index=False)
+    
+    return combined
+
+def main(memory_mb=None, outliers='drop', baseline=BASELINE_YEARS, current=CURRENT_YEARS):
     """Main cleaning pipeline"""
     
-    all_data = {}
+    cleaned = []
     
     # Clean each species
     for species_key in SPECIES_INFO.keys():
         filename = f'{species_key}.csv'
         
         if os.path.exists(f'data/raw/{filename}'):
-            df = clean_species_data(filename, species_key)
-            all_data[species_key] = df
+            clean_species_data(filename, species_key, memory_mb=memory_mb)
+            cleaned.append(species_key)
         else:
             print(f"\n  ⚠️  {filename} not found, skipping...")
     
-   
-    combined = create_combined_dataset(all_data)
-    
-   
-    baseline, current = create_baseline_vs_current(combined)
-    
+    # The combine steps pool every species, so they work on the full combined frame
+    all_data = read_cleaned(cleaned, memory_mb)
     
-    summary = analyze_temporal_patterns(combined)
+    combined = build_combined_outputs(all_data, outliers, baseline, current)
     
    
     print("\n" + "="*70)
@@ -232,9 +310,11 @@ def main():
     print(f"\n  Processed files created:")
     print(f"  - Individual species: data/processed/[species]_cleaned.csv (10 files)")
     print(f"  - Combined dataset: data/processed/all_species_combined.csv")
-    print(f"  - Baseline period: data/processed/baseline_2019_2020.csv")
-    print(f"  - Current period: data/processed/current_2022_2024.csv")
+    print(f"  - Baseline period: {period_path('baseline', baseline)}")
+    print(f"  - Current period: {period_path('current', current)}")
     print(f"  - Summary: data/processed/phenology_summary.csv")
+    print(f"  - Climate drivers: {DRIVERS_PATH}")
+    print(f"  - Flagged outliers: {OUTLIERS_PATH}")
     
     print(f"\n📊 Dataset Statistics:")
     print(f"  Total observations: {len(combined):,}")
@@ -249,4 +329,17 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Clean and filter raw phenology exports")
+    parser.add_argument('--memory-mb', type=int, default=None,
+                        help="stream raw files in chunks that fit this memory ceiling while cleaning "
+                             "(the combine, outlier and effort steps still load the combined data)")
+    parser.add_argument('--outliers', choices=OUTLIER_MODES, default='drop',
+                        help="drop out-of-season outliers, flag them with score columns, or keep everything")
+    parser.add_argument('--baseline', type=parse_years, default=BASELINE_YEARS,
+                        help="baseline years, e.g. 2019-2020")
+    parser.add_argument('--current', type=parse_years, default=CURRENT_YEARS,
+                        help="comparison years, e.g. 2022-2024")
+    args = parser.parse_args()
+    main(memory_mb=args.memory_mb, outliers=args.outliers, baseline=args.baseline, current=args.current)
\ No newline at end of file
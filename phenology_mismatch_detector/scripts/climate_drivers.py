@@ -0,0 +1,228 @@
+"""
+Climate-phenology lag regression across all species
+
+For every species, yearly onset (10th percentile) and median timing are
+correlated with climate aggregated over a sweep of calendar windows
+(growing degree days, rainfall, mean temperature). Window sums come from
+the climate feature store's cumulative arrays, so each window is O(1).
+
+Every driver gets a permutation p-value for the whole sweep (p_sweep);
+only significant ones are described to users.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from circular_stats import circular_mean, circular_distance
+from species_catalog import SPECIES_INFO
+from climate_features import load_feature_store, GDD_BASE_TEMP
+
+DRIVERS_PATH = 'data/processed/climate_drivers.csv'
+
+WINDOW_ENDS = np.arange(-60, 331, 15)       # day offset from Jan 1 of the event year
+WINDOW_LENGTHS = np.array([15, 30, 60, 90, 120])
+MIN_OBS_PER_YEAR = 5
+MIN_YEARS = 6
+RESPONSES = ['onset', 'median']
+
+# Sweep-wide significance: permutation null of the best |r| per species
+N_PERMUTATIONS = 999
+ALPHA = 0.05
+
+VARIABLE_LABELS = {
+    'gdd': f'growing degree days (base {GDD_BASE_TEMP:.0f}°C)',
+    'rainfall': 'rainfall total',
+    'temperature_mean': 'mean temperature'
+}
+
+
+def window_aggregates(store, years, ends=WINDOW_ENDS, lengths=WINDOW_LENGTHS):
+    """
+    Climate aggregates for every (year, window) as arrays of shape
+    (n_years, n_windows), read from the feature store's running totals.
+    Windows not fully covered by the series are NaN.
+    """
+    ends_grid, lengths_grid = np.meshgrid(ends, lengths, indexing='ij')
+    ends_flat, lengths_flat = ends_grid.ravel(), lengths_grid.ravel()
+
+    jan1 = pd.to_datetime([f'{int(y)}-01-01' for y in years]).to_numpy()
+    stop = jan1[:, None] + (ends_flat[None, :] - 1).astype('timedelta64[D]')
+    start = stop - (lengths_flat[None, :] - 1).astype('timedelta64[D]')
+
+    shape = stop.shape
+    start, stop = start.ravel(), stop.ravel()
+    covered = (store.range_days(start, stop) == np.repeat(lengths_flat[None, :], len(years), axis=0).ravel())
+
+    aggregates = {
+        'gdd': store.range_total('gdd', start, stop),
+        'rainfall': store.range_total('rainfall_mm', start, stop),
+        'temperature_mean': store.range_mean('temperature_mean', start, stop)
+    }
+    aggregates = {name: np.where(covered, values, np.nan).reshape(shape) for name, values in aggregates.items()}
+
+    return ends_flat, lengths_flat, aggregates
+
+
+def yearly_timing(df):
+    """
+    Yearly onset and median timing per species, in days relative to the
+    species' overall circular mean (so Dec-Jan activity does not wrap).
+    """
+    df = df[['species_key', 'year', 'day_of_year']].copy()
+
+    peaks = {key: circular_mean(group['day_of_year'])[0] for key, group in df.groupby('species_key')}
+    df['offset'] = circular_distance(df['day_of_year'], df['species_key'].map(peaks))
+
+    grouped = df.groupby(['species_key', 'year'])['offset']
+    timing = pd.DataFrame({
+        'n_obs': grouped.size(),
+        'onset': grouped.quantile(0.10),
+        'median': grouped.median()
+    }).reset_index()
+
+    return timing[timing['n_obs'] >= MIN_OBS_PER_YEAR]
+
+
+def _correlate(y, x):
+    """
+    Pearson r and slope of y on every column of x, ignoring NaN windows.
+    y may be (n,) or a stack of responses (..., n); r and slope are then (..., windows).
+    """
+    valid = ~np.isnan(x)
+    n = valid.sum(axis=0)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN windows
+        y_col = np.where(valid, np.asarray(y, dtype=float)[..., :, None], np.nan)
+        x_dev = x - np.nanmean(x, axis=0)
+        y_dev = y_col - np.nanmean(y_col, axis=-2, keepdims=True)
+
+        sxy = np.nansum(x_dev * y_dev, axis=-2)
+        sxx = np.nansum(x_dev ** 2, axis=0)
+        syy = np.nansum(y_dev ** 2, axis=-2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = sxy / np.sqrt(sxx * syy)
+        slope = sxy / sxx
+
+    return r, slope, n
+
+
+def _max_abs_r(responses, aggregates, usable):
+    """Largest |r| over every response, variable and usable window; responses is (..., n_responses, n)"""
+    best = np.zeros(responses.shape[:-2])
+    for x in aggregates.values():
+        r, _, _ = _correlate(responses, x[:, usable])
+        best = np.maximum(best, np.nan_to_num(np.abs(r)).max(axis=(-2, -1)))
+    return best
+
+
+def rank_climate_drivers(df, store=None, top_n=3, permutations=N_PERMUTATIONS, seed=0):
+    """
+    Ranked table of the best lagged climate windows per species and response.
+
+    With a handful of years and hundreds of windows, some |r| near 1 is
+    expected by chance, so every driver carries p_sweep: the share of
+    year-shuffled responses whose best |r| over the species' whole sweep
+    (both responses, all variables and windows) reaches the driver's |r|.
+    significant marks p_sweep < ALPHA.
+    """
+    store = load_feature_store() if store is None else store
+    timing = yearly_timing(df)
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for species_key, species_timing in timing.groupby('species_key'):
+        if len(species_timing) < MIN_YEARS:
+            continue
+
+        years = species_timing['year'].to_numpy()
+        ends, lengths, aggregates = window_aggregates(store, years)
+        usable = np.all([(~np.isnan(x)).sum(axis=0) >= MIN_YEARS for x in aggregates.values()], axis=0)
+
+        responses = species_timing[RESPONSES].to_numpy(dtype=float).T
+        # Same shuffle of years for both responses keeps their correlation intact
+        shuffles = np.argsort(rng.random((permutations, len(years))), axis=1)
+        null_max = _max_abs_r(responses[:, shuffles].transpose(1, 0, 2), aggregates, usable)
+
+        for response, y in zip(RESPONSES, responses):
+            for variable, x in aggregates.items():
+                r, slope, n = _correlate(y, x)
+
+                for w in np.flatnonzero(usable & (n >= MIN_YEARS)):
+                    if np.isnan(r[w]):
+                        continue
+                    rows.append({
+                        'species': SPECIES_INFO[species_key]['common'],
+                        'species_type': SPECIES_INFO[species_key]['type'],
+                        'response': response,
+                        'variable': variable,
+                        'window_start': int(ends[w] - lengths[w] + 1),
+                        'window_end': int(ends[w]),
+                        'window_days': int(lengths[w]),
+                        'r': r[w],
+                        'slope': slope[w],
+                        'n_years': int(n[w]),
+                        'p_sweep': (1 + np.sum(null_max >= abs(r[w]) - 1e-12)) / (1 + permutations)
+                    })
+
+    columns = ['species', 'species_type', 'response', 'variable', 'window_start', 'window_end',
+               'window_days', 'r', 'slope', 'n_years', 'p_sweep', 'significant', 'rank']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    drivers = pd.DataFrame(rows)
+    drivers['significant'] = drivers['p_sweep'] < ALPHA
+    drivers['abs_r'] = drivers['r'].abs()
+    drivers = drivers.sort_values(['species', 'abs_r'], ascending=[True, False])
+    drivers['rank'] = drivers.groupby('species').cumcount() + 1
+
+    return drivers[drivers['rank'] <= top_n][columns].reset_index(drop=True)
+
+
+def load_climate_drivers(path=DRIVERS_PATH):
+    try:
+        return pd.read_csv(path)
+    except FileNotFoundError:
+        return None
+
+
+def _window_label(start, end):
+    to_date = lambda offset: (pd.Timestamp('2023-01-01') + pd.Timedelta(days=int(offset))).strftime('%b %d')
+    return f"{to_date(start - 1)}–{to_date(end - 1)}"
+
+
+def describe_driver(drivers, species):
+    """One-line description of a species' best climate driver, or None"""
+    if drivers is None:
+        return None
+
+    best = drivers[(drivers['species'] == species) & (drivers['rank'] == 1)]
+    # Older tables without p_sweep predate the significance test: treat as unverified
+    if best.empty or not bool(best.iloc[0].get('significant', False)):
+        return None
+
+    d = best.iloc[0]
+    direction = "later" if d['r'] > 0 else "earlier"
+    return (
+        f"{d['response']} timing tracks {VARIABLE_LABELS[d['variable']]} over "
+        f"{_window_label(d['window_start'], d['window_end'])} "
+        f"(r = {d['r']:+.2f}, {d['n_years']} yrs, sweep p = {d['p_sweep']:.3f}; higher → {direction})"
+    )
+
+
+if __name__ == "__main__":
+
+    print("🌡️ RANKING CLIMATE DRIVERS OF PHENOLOGY")
+    print("="*70)
+
+    observations = pd.read_csv('data/processed/all_species_combined.csv')
+    drivers = rank_climate_drivers(observations)
+    drivers.to_csv(DRIVERS_PATH, index=False)
+
+    print(f"\n✅ Saved {len(drivers)} ranked drivers to {DRIVERS_PATH}\n")
+    for species in drivers['species'].unique():
+        best = drivers[(drivers['species'] == species) & (drivers['rank'] == 1)].iloc[0]
+        verdict = describe_driver(drivers, species) or f"no significant driver (best r = {best['r']:+.2f}, sweep p = {best['p_sweep']:.2f})"
+        print(f"  • {species:22} {verdict}")
@@ -0,0 +1,202 @@
+"""
+Precomputed daily climate indices for Karnataka
+
+Daily features are laid out as dense (n_years, 366) arrays (DOY 366 is an
+empty slot in non-leap years) together with per-year cumulative indices:
+growing degree days, rainfall since monsoon onset and heat-stress days.
+A flat cumulative sum over all slots makes any date-range total O(1).
+The store is persisted next to karnataka_climate_daily.csv.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from circular_stats import YEAR_DAYS
+
+CLIMATE_DAILY_PATH = 'data/raw/karnataka_climate_daily.csv'
+FEATURES_PATH = 'data/raw/karnataka_climate_features.npz'
+
+GDD_BASE_TEMP = 10.0
+HEAT_STRESS_TMAX = 35.0
+MONSOON_SEARCH_START_DOY = 121   # May 1
+MONSOON_ONSET_RAIN_MM = 25.0     # 5-day rainfall total marking onset
+MONSOON_ONSET_DAYS = 5
+
+DAILY_FEATURES = ['temperature_mean', 'temperature_max', 'temperature_min', 'rainfall_mm', 'gdd', 'heat_stress']
+
+
+def _monsoon_onset(rain):
+    """First DOY from May 1 whose trailing 5-day rainfall reaches the onset total"""
+    cum = np.concatenate([np.zeros((rain.shape[0], 1)), np.cumsum(rain, axis=1)], axis=1)
+    rolling = cum[:, MONSOON_ONSET_DAYS:] - cum[:, :-MONSOON_ONSET_DAYS]
+    doys = np.arange(MONSOON_ONSET_DAYS, YEAR_DAYS + 1)
+
+    wet = (rolling >= MONSOON_ONSET_RAIN_MM) & (doys >= MONSOON_SEARCH_START_DOY)
+    onset = doys[np.argmax(wet, axis=1)]
+    return np.where(wet.any(axis=1), onset, 0)
+
+
+class ClimateFeatureStore:
+    """Dense per-year climate arrays with constant-time date-range queries"""
+
+    def __init__(self, years, daily, valid, base_temp=GDD_BASE_TEMP, source_hash=''):
+        self.years = np.asarray(years, dtype=int)
+        self.daily = {name: np.asarray(values, dtype=float) for name, values in daily.items()}
+        self.valid = np.asarray(valid, dtype=bool)
+        self.base_temp = float(base_temp)
+        self.source_hash = str(source_hash)
+        self.year_index = {int(y): i for i, y in enumerate(self.years)}
+
+        self.monsoon_onset = _monsoon_onset(self.daily['rainfall_mm'])
+
+        # Per-year cumulative indices (DOY axis)
+        self.cumulative_gdd = np.cumsum(self.daily['gdd'], axis=1)
+        self.cumulative_heat_days = np.cumsum(self.daily['heat_stress'], axis=1)
+        after_onset = np.arange(1, YEAR_DAYS + 1)[None, :] >= np.where(
+            self.monsoon_onset > 0, self.monsoon_onset, YEAR_DAYS + 1
+        )[:, None]
+        self.cumulative_monsoon_rain = np.cumsum(self.daily['rainfall_mm'] * after_onset, axis=1)
+
+        # Flat running totals over every slot for cross-year range queries
+        self._flat_cumsum = {
+            name: np.concatenate([[0.0], np.cumsum(values.ravel())])
+            for name, values in self.daily.items()
+        }
+        self._flat_days = np.concatenate([[0], np.cumsum(self.valid.ravel())])
+
+    @classmethod
+    def from_daily(cls, daily, base_temp=GDD_BASE_TEMP, source_hash=''):
+        """Build from a daily climate dataframe (karnataka_climate_daily.csv layout)"""
+        dates = pd.to_datetime(daily['date'])
+        years = np.arange(dates.dt.year.min(), dates.dt.year.max() + 1)
+        rows = dates.dt.year.to_numpy() - years[0]
+        cols = dates.dt.dayofyear.to_numpy() - 1
+
+        valid = np.zeros((len(years), YEAR_DAYS), dtype=bool)
+        valid[rows, cols] = True
+
+        arrays = {}
+        for name in ['temperature_mean', 'temperature_max', 'temperature_min', 'rainfall_mm']:
+            arr = np.zeros((len(years), YEAR_DAYS))
+            arr[rows, cols] = daily[name].to_numpy(dtype=float)
+            arrays[name] = arr
+
+        arrays['gdd'] = np.where(valid, np.clip(arrays['temperature_mean'] - base_temp, 0, None), 0.0)
+        arrays['heat_stress'] = np.where(valid, arrays['temperature_max'] >= HEAT_STRESS_TMAX, 0).astype(float)
+
+        return cls(years, arrays, valid, base_temp, source_hash)
+
+    def save(self, path=FEATURES_PATH):
+        np.savez_compressed(
+            path,
+            years=self.years,
+            valid=self.valid,
+            base_temp=self.base_temp,
+            source_hash=self.source_hash,
+            **{f'daily_{name}': values for name, values in self.daily.items()}
+        )
+
+    @classmethod
+    def load(cls, path=FEATURES_PATH):
+        data = np.load(path)
+        daily = {name: data[f'daily_{name}'] for name in DAILY_FEATURES}
+        return cls(data['years'], daily, data['valid'], float(data['base_temp']), str(data['source_hash']))
+
+    def slot(self, dates):
+        """Flat slot index of each date (vectorized)"""
+        dates = pd.DatetimeIndex(np.atleast_1d(pd.to_datetime(dates)))
+        return (dates.year.to_numpy() - self.years[0]) * YEAR_DAYS + dates.dayofyear.to_numpy() - 1
+
+    def _bounds(self, start, end):
+        lo = np.clip(self.slot(start), 0, self.valid.size)
+        hi = np.clip(self.slot(end) + 1, 0, self.valid.size)
+        return lo, hi
+
+    def range_total(self, feature, start, end):
+        """Sum of a daily feature over [start, end] inclusive, in O(1) per range"""
+        lo, hi = self._bounds(start, end)
+        cum = self._flat_cumsum[feature]
+        return cum[hi] - cum[lo]
+
+    def range_mean(self, feature, start, end):
+        """Mean of a daily feature over the days with data in [start, end]"""
+        lo, hi = self._bounds(start, end)
+        days = self._flat_days[hi] - self._flat_days[lo]
+        total = self._flat_cumsum[feature][hi] - self._flat_cumsum[feature][lo]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(days > 0, total / np.maximum(days, 1), np.nan)
+
+    def range_days(self, start, end):
+        lo, hi = self._bounds(start, end)
+        return self._flat_days[hi] - self._flat_days[lo]
+
+    def cumulative(self, index, year, doy):
+        """Value of a cumulative index ('gdd', 'heat_days', 'monsoon_rain') on a given day"""
+        arrays = {
+            'gdd': self.cumulative_gdd,
+            'heat_days': self.cumulative_heat_days,
+            'monsoon_rain': self.cumulative_monsoon_rain
+        }
+        return arrays[index][self.year_index[int(year)], int(doy) - 1]
+
+    def window_anomaly(self, feature, year, start='03-01', end='05-31', baseline_years=(2019, 2020)):
+        """Mean of a feature over a calendar window in one year minus the baseline years' mean"""
+        years = [int(year)] + list(baseline_years)
+        means = self.range_mean(
+            feature, [f'{y}-{start}' for y in years], [f'{y}-{end}' for y in years]
+        )
+        return float(means[0] - np.nanmean(means[1:]))
+
+    def gdd_advance(self, year, reference_doy, baseline_years=(2019, 2020)):
+        """
+        Days earlier (positive) that a year reached the baseline's mean
+        cumulative GDD at reference_doy.
+        """
+        baseline_rows = [self.year_index[y] for y in baseline_years if y in self.year_index]
+        threshold = self.cumulative_gdd[baseline_rows, int(reference_doy) - 1].mean()
+
+        reached = self.cumulative_gdd[self.year_index[int(year)]] >= threshold
+        if not reached.any():
+            return None
+        return int(reference_doy) - (int(np.argmax(reached)) + 1)
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def build_feature_store(daily_path=CLIMATE_DAILY_PATH, path=FEATURES_PATH, base_temp=GDD_BASE_TEMP):
+    """Recompute the feature store from the daily CSV and persist it"""
+    store = ClimateFeatureStore.from_daily(
+        pd.read_csv(daily_path), base_temp, _file_hash(daily_path)
+    )
+    store.save(path)
+    return store
+
+
+def load_feature_store(daily_path=CLIMATE_DAILY_PATH, path=FEATURES_PATH, base_temp=GDD_BASE_TEMP):
+    """Load the persisted store, rebuilding it if the daily CSV or GDD base changed"""
+    if os.path.exists(path):
+        store = ClimateFeatureStore.load(path)
+        source_hash = _file_hash(daily_path) if os.path.exists(daily_path) else store.source_hash
+        if store.base_temp == base_temp and store.source_hash == source_hash:
+            return store
+
+    return build_feature_store(daily_path, path, base_temp)
+
+
+if __name__ == "__main__":
+
+    print("🌡️ BUILDING CLIMATE FEATURE STORE")
+    print("="*70)
+
+    store = build_feature_store()
+    print(f"\n✅ Saved {len(store.years)} years x {YEAR_DAYS} days → {FEATURES_PATH}\n")
+
+    for year in store.years:
+        print(f"  {year}: GDD by Mar 31 = {store.cumulative(year=year, index='gdd', doy=90):7.1f}, "
+              f"monsoon onset DOY {store.monsoon_onset[store.year_index[year]]:3d}, "
+              f"heat-stress days = {store.cumulative(year=year, index='heat_days', doy=YEAR_DAYS):3.0f}")
@@ -0,0 +1,149 @@
+"""
+Climate aggregation over the full daily series
+
+Yearly and seasonal temperature anomalies, an OLS warming trend with a 95%
+confidence interval, and yearly extremes, computed with vectorized
+reductions over the ClimateFeatureStore's dense (year x DOY) arrays, i.e.
+every daily record. Results are cached per store version (the daily CSV's
+content hash), so repeated agent queries cost a dictionary lookup.
+"""
+import numpy as np
+import pandas as pd
+
+from circular_stats import YEAR_DAYS
+from climate_features import load_feature_store
+
+SEASON_BY_MONTH = {
+    1: 'winter', 2: 'winter', 3: 'pre_monsoon', 4: 'pre_monsoon', 5: 'pre_monsoon',
+    6: 'monsoon', 7: 'monsoon', 8: 'monsoon', 9: 'monsoon',
+    10: 'post_monsoon', 11: 'post_monsoon', 12: 'winter'
+}
+SEASONS = ['monsoon', 'post_monsoon', 'pre_monsoon', 'winter']
+
+# Anomalies are measured against the mean temperature of each DOY in these years
+BASELINE_YEARS = (2019, 2020)
+
+# Two-sided 95% Student t critical values by degrees of freedom
+T_CRITICAL_95 = [
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042
+]
+
+_CACHE = {}
+
+
+def ols_trend(x, y):
+    """Slope of y on x with a 95% confidence interval: (slope, low, high)"""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    n = len(x)
+    if n < 3:
+        return np.nan, np.nan, np.nan
+
+    x_dev = x - x.mean()
+    sxx = np.sum(x_dev ** 2)
+    slope = np.sum(x_dev * (y - y.mean())) / sxx
+
+    residuals = y - (y.mean() + slope * x_dev)
+    stderr = np.sqrt(np.sum(residuals ** 2) / (n - 2) / sxx)
+    t = T_CRITICAL_95[n - 3] if n - 2 <= len(T_CRITICAL_95) else 1.96
+
+    return slope, slope - t * stderr, slope + t * stderr
+
+
+def _slot_dates(years):
+    """Calendar date of every (year, DOY) slot; DOY 366 of a non-leap year rolls into January"""
+    jan_1 = (np.asarray(years) - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    return jan_1[:, None] + np.arange(YEAR_DAYS)
+
+
+def _temperature_anomaly(store, baseline_years=BASELINE_YEARS):
+    """Daily mean temperature minus the baseline years' mean for the same DOY (0 where no baseline)"""
+    rows = [store.year_index[y] for y in baseline_years if y in store.year_index]
+    temp, valid = store.daily['temperature_mean'], store.valid
+    days = valid[rows].sum(axis=0)
+    baseline = np.where(valid[rows], temp[rows], 0).sum(axis=0) / np.maximum(days, 1)
+    return np.where(valid & (days > 0), temp - baseline, 0.0)
+
+
+def _masked_mean(values, mask):
+    days = mask.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(days > 0, np.where(mask, values, 0).sum(axis=1) / np.maximum(days, 1), np.nan)
+
+
+def summarize_climate(store):
+    """Aggregate a ClimateFeatureStore into yearly, seasonal, trend and extreme tables"""
+    valid = store.valid
+    days = valid.sum(axis=1)
+    has_data = days > 0
+    index = pd.Index(store.years[has_data], name='year')
+    anomaly = _temperature_anomaly(store)
+    rain = store.daily['rainfall_mm']
+    tmax = store.daily['temperature_max']
+
+    yearly = pd.DataFrame({
+        'temperature_mean': _masked_mean(store.daily['temperature_mean'], valid),
+        'temperature_anomaly': _masked_mean(anomaly, valid),
+        'rainfall_mm': np.where(valid, rain, 0).sum(axis=1),
+        'days': days
+    }).iloc[has_data].set_index(index)
+
+    dates = _slot_dates(store.years)
+    months = dates.astype('datetime64[M]').astype(int) % 12 + 1
+    season_of_slot = np.vectorize(SEASON_BY_MONTH.get)(months)
+    in_season = {season: valid & (season_of_slot == season) for season in SEASONS}
+    columns = {('temperature_anomaly', s): _masked_mean(anomaly, mask) for s, mask in in_season.items()}
+    columns.update({
+        ('rainfall_mm', s): np.where(mask.any(axis=1), np.where(mask, rain, 0).sum(axis=1), np.nan)
+        for s, mask in in_season.items()
+    })
+    seasonal = pd.DataFrame(columns).iloc[has_data].set_index(index)
+    seasonal.columns.names = [None, 'climate_season']
+
+    rows = np.arange(len(store.years))
+    hottest = np.argmax(np.where(valid, tmax, -np.inf), axis=1)
+    wettest = np.argmax(np.where(valid, rain, -np.inf), axis=1)
+    extremes = pd.DataFrame({
+        'hottest_date': pd.to_datetime(dates[rows, hottest]),
+        'hottest_tmax': tmax[rows, hottest],
+        'wettest_date': pd.to_datetime(dates[rows, wettest]),
+        'wettest_rain_mm': rain[rows, wettest],
+        'heat_stress_days': store.daily['heat_stress'].sum(axis=1)
+    }).iloc[has_data].set_index(index)
+
+    full_years = yearly[yearly['days'] >= 360]
+    pre_monsoon = seasonal['temperature_anomaly']['pre_monsoon'].dropna()
+
+    return {
+        'yearly': yearly,
+        'seasonal': seasonal,
+        'extremes': extremes,
+        'trend': ols_trend(full_years.index, full_years['temperature_anomaly']),
+        'pre_monsoon_trend': ols_trend(pre_monsoon.index, pre_monsoon.values)
+    }
+
+
+def climate_summary(store=None):
+    """Cached climate summary for the current version of the feature store"""
+    store = load_feature_store() if store is None else store
+
+    if store.source_hash not in _CACHE:
+        _CACHE[store.source_hash] = summarize_climate(store)
+
+    return _CACHE[store.source_hash]
+
+
+if __name__ == "__main__":
+
+    print("🌡️ CLIMATE TRENDS (full daily series)")
+    print("="*70)
+
+    summary = climate_summary()
+    print("\n📊 Yearly:\n")
+    print(summary['yearly'].round(2).to_string())
+    print("\n📊 Pre-monsoon anomaly by year:\n")
+    print(summary['seasonal']['temperature_anomaly']['pre_monsoon'].round(2).to_string())
+
+    slope, low, high = summary['trend']
+    print(f"\n📈 Trend: {slope:+.3f}°C/year (95% CI {low:+.3f} to {high:+.3f})")
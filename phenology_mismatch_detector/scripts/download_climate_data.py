@@ -5,6 +5,7 @@ import requests
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from climate_features import build_feature_store, FEATURES_PATH
 
 print("🌡️ DOWNLOADING CLIMATE DATA FOR KARNATAKA")
 print("="*70)
@@ -94,6 +95,10 @@ def download_nasa_power_data():
         print(f"📁 Saved to: data/raw/karnataka_climate_daily.csv")
         
         
+        build_feature_store()
+        print(f"📁 Saved climate feature store to: {FEATURES_PATH}")
+        
+        
         monthly = df.groupby(['year', 'month']).agg({
             'temperature_mean': 'mean',
             'temperature_max': 'mean',
@@ -140,6 +145,7 @@ if __name__ == "__main__":
         print("\nFiles created:")
         print("  - karnataka_climate_daily.csv   (Daily data)")
         print("  - karnataka_climate_monthly.csv (Monthly summary)")
+        print("  - karnataka_climate_features.npz (GDD, monsoon rain, heat-stress indices)")
         
     else:
         print("\n❌ Download failed. See errors above.")
\ No newline at end of file
@@ -0,0 +1,206 @@
+"""
+Mergeable day-of-year sketches per species x year x region
+
+Onset, median and end timing normally need every DOY of a group in
+memory. DOY is an integer on a 366-day circle, so a 366-bin count
+histogram is an exact sketch of fixed size: it can be updated chunk by
+chunk while streaming, merged across shards by adding counts, rolled up
+over any dimension (e.g. all regions of a species-year) and still
+answers every quantile exactly. (t-digest / KLL trade accuracy for size
+on unbounded domains; here they would only add error.)
+
+Quantiles are circular: each histogram is rotated so its circular median
+sits mid-year, linear quantiles are taken there and mapped back, so
+activity spanning Dec-Jan keeps a sensible onset and end.
+
+Run directly for an accuracy report against exact percentiles on the
+combined data and a streaming / sharded merge check.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from circular_stats import YEAR_DAYS, histogram_circular_median
+from effort_correction import region_cells
+from payload_schema import SPECIES_CODES, SPECIES_KEYS
+
+SKETCH_PATH = 'data/processed/doy_sketches.npz'
+DIMENSIONS = ['species', 'year', 'region']
+TIMING_QUANTILES = {'onset': 0.10, 'median': 0.50, 'end': 0.90}
+
+
+def circular_quantiles(hist, qs):
+    """
+    DOY at each quantile in qs for histograms of shape (groups, 366),
+    as an array of shape (groups, len(qs)); NaN for empty groups.
+    """
+    hist = np.atleast_2d(np.asarray(hist, dtype=float))
+    median = np.atleast_1d(histogram_circular_median(hist))
+
+    # Rotate so bin 182 holds the median: rotated[:, j] = hist[:, (j + start) % 366]
+    start = np.nan_to_num(np.round(median)).astype(np.int64) - 1 - YEAR_DAYS // 2
+    columns = (np.arange(YEAR_DAYS)[None, :] + start[:, None]) % YEAR_DAYS
+    cdf = np.cumsum(np.take_along_axis(hist, columns, axis=1), axis=1)
+
+    total = cdf[:, -1:]
+    positions = np.stack([(cdf < q * total).sum(axis=1) for q in qs], axis=1)
+    doys = ((np.minimum(positions, YEAR_DAYS - 1) + start[:, None]) % YEAR_DAYS + 1).astype(float)
+    doys[total[:, 0] == 0] = np.nan
+    return doys
+
+
+class DoySketches:
+    """366-bin DOY histograms keyed by (species code, year, region cell)"""
+
+    def __init__(self, keys=None, counts=None):
+        self.keys = np.zeros((0, len(DIMENSIONS)), dtype=np.int64) if keys is None else keys
+        self.counts = np.zeros((0, YEAR_DAYS), dtype=np.int32) if counts is None else counts
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Sketches for a dataframe of observations (any chunk or shard)"""
+        keys = np.column_stack([
+            df['species_key'].map(SPECIES_CODES).to_numpy(dtype=np.int64),
+            df['year'].to_numpy(dtype=np.int64),
+            region_cells(df['latitude'].to_numpy(), df['longitude'].to_numpy())
+        ])
+        groups, codes = np.unique(keys, axis=0, return_inverse=True)
+        counts = np.bincount(
+            codes.ravel() * YEAR_DAYS + df['day_of_year'].to_numpy(dtype=np.int64) - 1,
+            minlength=len(groups) * YEAR_DAYS
+        ).reshape(len(groups), YEAR_DAYS).astype(np.int32)
+        return cls(groups, counts)
+
+    def merge(self, *others):
+        """Sketches of the union of all inputs (counts of shared keys add)"""
+        parts = [self, *others]
+        keys = np.concatenate([p.keys for p in parts])
+        counts = np.concatenate([p.counts for p in parts])
+        if not len(keys):
+            return DoySketches()
+        return DoySketches(*_sum_by_key(keys, counts))
+
+    def update(self, df):
+        """Fold a chunk of observations into these sketches in place"""
+        merged = self.merge(DoySketches.from_frame(df))
+        self.keys, self.counts = merged.keys, merged.counts
+        return self
+
+    def drop_species(self, species_keys):
+        """Sketches without the given species (before re-adding their data)"""
+        keep = ~np.isin(self.keys[:, 0], [SPECIES_CODES[k] for k in species_keys])
+        return DoySketches(self.keys[keep], self.counts[keep])
+
+    def rollup(self, by=('species', 'year'), years=None):
+        """
+        Sum sketches over the dimensions not in by, optionally only for
+        the given years; returns (keys dataframe, counts).
+        """
+        keys, counts = self.keys, self.counts
+        if years is not None:
+            keep = np.isin(keys[:, 1], list(years))
+            keys, counts = keys[keep], counts[keep]
+
+        columns = [DIMENSIONS.index(d) for d in by]
+        if not len(keys):
+            return pd.DataFrame(columns=list(by)), np.zeros((0, YEAR_DAYS), dtype=np.int32)
+        if columns:
+            keys, counts = _sum_by_key(keys[:, columns], counts)
+        else:
+            keys, counts = np.zeros((1, 0), dtype=np.int64), counts.sum(axis=0, keepdims=True)
+        return pd.DataFrame(keys, columns=list(by)), counts
+
+    def timing(self, by=('species', 'year'), years=None, quantiles=TIMING_QUANTILES):
+        """Onset / median / end DOY and n per group of by"""
+        keys, counts = self.rollup(by, years)
+        table = keys.copy()
+        if 'species' in table:
+            table['species'] = [SPECIES_KEYS[code] for code in table['species']]
+        table['n'] = counts.sum(axis=1)
+        values = circular_quantiles(counts, list(quantiles.values())) if len(counts) else np.zeros((0, len(quantiles)))
+        for i, name in enumerate(quantiles):
+            table[f'{name}_doy'] = values[:, i]
+        return table
+
+    def save(self, path=SKETCH_PATH):
+        np.savez_compressed(path, keys=self.keys, counts=self.counts)
+
+    @classmethod
+    def load(cls, path=SKETCH_PATH):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            return cls(data['keys'], data['counts'])
+
+
+def _sum_by_key(keys, counts):
+    """Unique key rows and the summed counts of each"""
+    groups, codes = np.unique(keys, axis=0, return_inverse=True)
+    codes = codes.ravel()
+    order = np.argsort(codes, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+    return groups, np.add.reduceat(counts[order], starts, axis=0)
+
+
+def exact_timing(df, by=('species_key', 'year'), quantiles=TIMING_QUANTILES, method='linear'):
+    """Percentiles of the raw DOYs per group, centred the same way as the sketches"""
+    rows = []
+    for key, group in df.groupby(list(by)):
+        doys = group['day_of_year'].to_numpy()
+        median = histogram_circular_median(np.bincount(doys - 1, minlength=YEAR_DAYS))
+        start = int(round(median)) - 1 - YEAR_DAYS // 2
+        offsets = (doys - 1 - start) % YEAR_DAYS
+        row = dict(zip(by, key))
+        for name, q in quantiles.items():
+            row[f'{name}_doy'] = (np.quantile(offsets, q, method=method) + start) % YEAR_DAYS + 1
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    from circular_stats import circular_distance
+    from streaming import iter_csv_chunks
+
+    print("📐 DOY SKETCHES (species x year x region)")
+    print("="*70)
+
+    path = 'data/processed/all_species_combined.csv'
+    df = pd.read_csv(path)
+
+    # Streamed chunk by chunk, and built on 4 shards then merged
+    streamed = DoySketches()
+    for chunk in iter_csv_chunks(path, chunksize=500):
+        streamed.update(chunk)
+    shuffled = df.sample(frac=1, random_state=0)
+    shards = [DoySketches.from_frame(shuffled.iloc[i::4]) for i in range(4)]
+    merged = shards[0].merge(*shards[1:])
+    whole = DoySketches.from_frame(df)
+    same = all(np.array_equal(s.keys, whole.keys) and np.array_equal(s.counts, whole.counts) for s in [streamed, merged])
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, keys=whole.keys, counts=whole.counts)
+    print(f"\n  {len(whole):,} sketches: {whole.counts.nbytes / 1024:.0f} KB in memory, "
+          f"{buffer.tell() / 1024:.0f} KB compressed on disk")
+    print(f"  Streamed (500-row chunks) and 4-shard merge identical to a one-shot build: {'✅' if same else '❌'}")
+
+    sketched = whole.timing(('species', 'year')).rename(columns={'species': 'species_key'})
+    print(f"\n  Species-year timing vs exact percentiles of the raw DOYs, mean / max |Δ| days:")
+    print(f"  {'Exact method':14} {'Groups':>12} {'Onset':>12} {'Median':>12} {'End':>12}")
+    for method in ['inverted_cdf', 'linear']:
+        exact = exact_timing(df, method=method)
+        joined = sketched.merge(exact, on=['species_key', 'year'], suffixes=('', '_exact'))
+        for label, subset in [('all', joined), ('n >= 20', joined[joined['n'] >= 20])]:
+            errors = [np.abs(circular_distance(subset[f'{n}_doy'], subset[f'{n}_doy_exact'])) for n in TIMING_QUANTILES]
+            cells = ''.join(f" {e.mean():>5.2f} / {e.max():>4.1f}" for e in errors)
+            print(f"  {method:14} {label + f' ({len(subset)})':>12}{cells}")
+
+    latest = sketched[sketched['year'] == sketched['year'].max()]
+    print(f"\n  {'Species':24} {'Year':>5} {'n':>5} {'Onset':>6} {'Median':>7} {'End':>5}")
+    for _, r in latest.iterrows():
+        print(f"  {r['species_key']:24} {r['year']:>5} {r['n']:>5} {r['onset_doy']:>6.0f} "
+              f"{r['median_doy']:>7.0f} {r['end_doy']:>5.0f}")
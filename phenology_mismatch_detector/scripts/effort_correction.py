@@ -0,0 +1,76 @@
+"""
+Observer-effort normalization for iNaturalist phenology data
+
+Observation counts track when and where people go out as much as biology.
+Effort is estimated per (year, week, region cell) from all taxa together,
+as distinct observer-days when the observer is known, otherwise as raw
+observation counts. Each observation is then weighted by 1 / effort and the
+weights are rescaled so every species keeps its original total.
+"""
+import numpy as np
+import pandas as pd
+
+REGION_CELL_DEG = 0.5
+OBSERVER_COLUMN = 'user_login'
+
+
+def region_cells(lat, lng, cell_deg=REGION_CELL_DEG):
+    """Integer id of the cell_deg x cell_deg grid cell containing each point"""
+    lat_cell = np.floor(np.asarray(lat, dtype=float) / cell_deg).astype(np.int64)
+    lng_cell = np.floor(np.asarray(lng, dtype=float) / cell_deg).astype(np.int64)
+    return lat_cell * 10_000 + lng_cell
+
+
+def add_effort_keys(df, cell_deg=REGION_CELL_DEG):
+    """Add integer week and region cell columns used to pool effort"""
+    df = df.copy()
+    df['week'] = np.minimum((df['day_of_year'].to_numpy() - 1) // 7, 51)
+    df['region_cell'] = region_cells(df['latitude'].to_numpy(), df['longitude'].to_numpy(), cell_deg)
+
+    return df
+
+
+def _cell_codes(df):
+    """Dense code per (year, week, region_cell)"""
+    keys = (
+        df['year'].to_numpy(dtype=np.int64) * 100 + df['week'].to_numpy(dtype=np.int64)
+    ) * 100_000_000 + df['region_cell'].to_numpy(dtype=np.int64)
+    _, codes = np.unique(keys, return_inverse=True)
+    return codes
+
+
+def estimate_effort(df):
+    """
+    Observation effort for each row's (year, week, region) cell across all taxa.
+
+    Uses distinct observer-days when an observer column is present.
+    """
+    codes = _cell_codes(df)
+
+    if OBSERVER_COLUMN in df.columns and df[OBSERVER_COLUMN].notna().any():
+        observer_day = pd.DataFrame({
+            'cell': codes,
+            'observer': df[OBSERVER_COLUMN].fillna('unknown').to_numpy(),
+            'date': df['observed_date'].astype(str).str[:10].to_numpy()
+        }).drop_duplicates()
+        effort = np.bincount(observer_day['cell'].to_numpy(), minlength=codes.max() + 1)
+    else:
+        effort = np.bincount(codes)
+
+    return effort[codes]
+
+
+def add_effort_weights(df, cell_deg=REGION_CELL_DEG):
+    """Return a copy of df with week, region_cell, effort and effort_weight columns"""
+    df = add_effort_keys(df, cell_deg)
+    df['effort'] = estimate_effort(df)
+
+    raw = 1.0 / df['effort'].to_numpy(dtype=float)
+
+    # Rescale so each species' weights sum to its observation count
+    species_codes, _ = pd.factorize(df['species_key'])
+    raw_totals = np.bincount(species_codes, weights=raw)
+    counts = np.bincount(species_codes)
+    df['effort_weight'] = raw * (counts / raw_totals)[species_codes]
+
+    return df
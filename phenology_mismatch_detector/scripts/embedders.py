@@ -0,0 +1,268 @@
+"""
+Pluggable sentence embedders
+
+Every script gets its embedder from get_embedder(), which returns one of:
+    torch       SentenceTransformer('all-MiniLM-L6-v2') in fp32 PyTorch (reference)
+    onnx        the same network exported to ONNX Runtime
+    onnx-int8   the ONNX model with dynamic int8 weight quantization
+
+The backend comes from the EMBEDDER_BACKEND environment variable (default
+torch). All backends share SentenceTransformer.encode's contract: a str
+gives a 1-D vector, a list a 2-D array, L2-normalized mean-pooled output.
+
+The ONNX backends need a one-time export, which also records how closely
+they agree with the reference model on our observation texts. Vectors
+already in Qdrant stay valid when switching to a backend whose agreement
+is within tolerance; otherwise get_embedder warns that a re-ingest is due.
+
+Usage:
+    python scripts/embedders.py export      # export + quantize + agreement check
+    python scripts/embedders.py benchmark   # throughput and cold start per backend
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_DIM = 384
+ONNX_DIR = f'models/onnx/{MODEL_NAME}'
+AGREEMENT_PATH = os.path.join(ONNX_DIR, 'agreement.json')
+
+BACKENDS = ['torch', 'onnx', 'onnx-int8']
+DEFAULT_BACKEND = 'torch'
+DEFAULT_BATCH_SIZE = 32
+
+# Minimum cosine between reference and candidate vectors over the sample
+# for the candidate to be used against collections ingested by the reference
+AGREEMENT_TOLERANCE = 0.99
+AGREEMENT_SAMPLE = 2000
+
+
+class SentenceTransformerEmbedder:
+    """Reference fp32 PyTorch backend"""
+
+    name = 'torch'
+
+    def __init__(self, model_name=MODEL_NAME, threads=None):
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts, batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        return np.asarray(self.model.encode(texts, batch_size=batch_size, **kwargs), dtype=np.float32)
+
+
+class OnnxEmbedder:
+    """ONNX Runtime backend (fp32 or int8) with the model's fast tokenizer"""
+
+    def __init__(self, model_dir=ONNX_DIR, quantized=False, threads=None):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("ONNX backends need onnxruntime and tokenizers (pip install -r requirements.txt)") from e
+
+        path = os.path.join(model_dir, 'model_int8.onnx' if quantized else 'model.onnx')
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found - run: python scripts/embedders.py export")
+
+        with open(os.path.join(model_dir, 'embedder.json')) as f:
+            config = json.load(f)
+
+        self.name = 'onnx-int8' if quantized else 'onnx'
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=config['max_seq_length'])
+        self.tokenizer.enable_padding(pad_id=config['pad_id'], pad_token=config['pad_token'])
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in inputs.items() if k in self.input_names})[0]
+
+        # Mean pooling over real tokens, then L2 normalization (as the
+        # sentence-transformers Pooling + Normalize modules do)
+        mask = inputs['attention_mask'][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def encode(self, texts, batch_size=DEFAULT_BATCH_SIZE, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if not texts:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+        # Batch texts of similar length together to minimise padding
+        order = np.argsort([-len(t) for t in texts], kind='stable')
+        vectors = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            vectors[idx] = self._embed_batch([texts[i] for i in idx])
+
+        return vectors[0] if single else vectors
+
+
+def load_agreement(path=AGREEMENT_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_embedder(backend=None, threads=None):
+    """Embedder for backend (default: $EMBEDDER_BACKEND, else torch); threads caps intra-op threads"""
+    backend = backend or os.environ.get('EMBEDDER_BACKEND', DEFAULT_BACKEND)
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown embedder backend '{backend}' (choose from {', '.join(BACKENDS)})")
+
+    if backend == 'torch':
+        return SentenceTransformerEmbedder(threads=threads)
+
+    embedder = OnnxEmbedder(quantized=backend == 'onnx-int8', threads=threads)
+    agreement = load_agreement().get(backend)
+    if agreement is None or agreement['min_cosine'] < AGREEMENT_TOLERANCE:
+        print(f"  ⚠️  {backend} vectors are not verified against {MODEL_NAME} within "
+              f"{AGREEMENT_TOLERANCE} cosine - re-ingest before querying existing collections")
+    return embedder
+
+
+def cosine_agreement(reference, candidate, texts, batch_size=DEFAULT_BATCH_SIZE):
+    """Cosine similarity between two embedders' vectors for the same texts"""
+    a = reference.encode(texts, batch_size=batch_size)
+    b = candidate.encode(texts, batch_size=batch_size)
+    cosines = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    return {
+        'texts': len(texts),
+        'mean_cosine': float(cosines.mean()),
+        'p01_cosine': float(np.percentile(cosines, 1)),
+        'min_cosine': float(cosines.min()),
+        'within_tolerance': bool(cosines.min() >= AGREEMENT_TOLERANCE)
+    }
+
+
+def export_onnx(model_name=MODEL_NAME, out_dir=ONNX_DIR, opset=14):
+    """Export the reference transformer to ONNX and write its int8 variant"""
+    import torch
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(out_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    transformer.config.return_dict = False  # plain tuple outputs trace cleanly
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(out_dir)
+
+    names = ['input_ids', 'attention_mask', 'token_type_ids']
+    sample = tokenizer(["Common Mormon observed in Bengaluru"], return_tensors='pt')
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in names),
+            os.path.join(out_dir, 'model.onnx'),
+            input_names=names,
+            output_names=['last_hidden_state'],
+            dynamic_axes={n: {0: 'batch', 1: 'sequence'} for n in names + ['last_hidden_state']},
+            opset_version=opset
+        )
+
+    quantize_dynamic(os.path.join(out_dir, 'model.onnx'), os.path.join(out_dir, 'model_int8.onnx'),
+                     weight_type=QuantType.QInt8)
+
+    with open(os.path.join(out_dir, 'embedder.json'), 'w') as f:
+        json.dump({
+            'model_name': model_name,
+            'max_seq_length': model.max_seq_length,
+            'pad_id': tokenizer.pad_token_id,
+            'pad_token': tokenizer.pad_token
+        }, f, indent=2)
+
+
+def observation_texts(n=AGREEMENT_SAMPLE, path='data/processed/all_species_combined.csv', seed=0):
+    """Random sample (n=None: all) of the texts ingest_to_qdrant embeds for observations"""
+    import pandas as pd
+    from payload_schema import generate_observation_text
+
+    df = pd.read_csv(path, parse_dates=['observed_date'])
+    if n is not None:
+        df = df.sample(n=min(n, len(df)), random_state=seed)
+    return [generate_observation_text(row) for _, row in df.iterrows()]
+
+
+def benchmark(texts, backends=BACKENDS, batch_size=DEFAULT_BATCH_SIZE, repeats=3):
+    """Cold start (load + first query) and bulk throughput per backend"""
+    rows = []
+    for backend in backends:
+        start = time.perf_counter()
+        embedder = get_embedder(backend)
+        embedder.encode("first query after start-up")
+        cold_start = time.perf_counter() - start
+
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            embedder.encode(texts, batch_size=batch_size)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for text in texts[:100]:
+            embedder.encode(text)
+        single_ms = (time.perf_counter() - start) / min(len(texts), 100) * 1000
+
+        rows.append({'backend': backend, 'cold_start_s': cold_start,
+                     'texts_per_s': len(texts) / min(timings), 'single_ms': single_ms})
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export and benchmark embedding backends")
+    parser.add_argument('action', choices=['export', 'check', 'benchmark'])
+    parser.add_argument('--sample', type=int, default=AGREEMENT_SAMPLE, help="observation texts to compare")
+    args = parser.parse_args()
+
+    texts = observation_texts(args.sample)
+
+    if args.action == 'export':
+        print(f"📦 EXPORTING {MODEL_NAME} TO ONNX (fp32 + int8)")
+        print("="*70)
+        export_onnx()
+        print(f"  ✅ Saved to {ONNX_DIR}")
+
+    if args.action in ('export', 'check'):
+        print(f"\n🎯 AGREEMENT WITH THE REFERENCE MODEL ({len(texts):,} observation texts)")
+        print("="*70)
+        reference = SentenceTransformerEmbedder()
+        results = {}
+        for backend in ['onnx', 'onnx-int8']:
+            results[backend] = cosine_agreement(reference, OnnxEmbedder(quantized=backend == 'onnx-int8'), texts)
+            r = results[backend]
+            verdict = "✅ swap without re-ingest" if r['within_tolerance'] else "⚠️  re-ingest required"
+            print(f"  {backend:10} mean {r['mean_cosine']:.5f}  p01 {r['p01_cosine']:.5f}  "
+                  f"min {r['min_cosine']:.5f}  {verdict}")
+        with open(AGREEMENT_PATH, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.action == 'benchmark':
+        print(f"⚡ EMBEDDING THROUGHPUT ({len(texts):,} observation texts, batch {DEFAULT_BATCH_SIZE})")
+        print("="*70)
+        rows = benchmark(texts)
+        base = rows[0]['texts_per_s']
+        print(f"\n  {'Backend':10} {'Cold start s':>12} {'Texts/s':>9} {'Speed-up':>9} {'Single ms':>10}")
+        for r in rows:
+            print(f"  {r['backend']:10} {r['cold_start_s']:>12.2f} {r['texts_per_s']:>9,.0f} "
+                  f"{r['texts_per_s'] / base:>8.1f}x {r['single_ms']:>10.1f}")
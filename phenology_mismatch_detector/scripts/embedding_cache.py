@@ -0,0 +1,95 @@
+"""
+Memoizing embedding context for the EcoSync agent
+
+Wraps the sentence embedder with an LRU memo so that constant strings
+(species names, prototype utterances, fixed retrieval prompts) are encoded
+once per process and every other text at most once per turn. Texts an
+intent needs can be prefetched together in a single encode call. Model
+invocations are counted per turn and in total; turns are tracked per
+thread, so concurrent batch queries each see their own count.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from embedders import EMBEDDING_DIM
+
+DEFAULT_MAX_ENTRIES = 10000
+# encode() options that don't change the vectors, forwarded to the model
+PASSTHROUGH_KWARGS = {'batch_size', 'show_progress_bar'}
+
+
+class EmbeddingCache:
+    """Drop-in for SentenceTransformer.encode with memoization and call counting"""
+
+    def __init__(self, model, max_entries=DEFAULT_MAX_ENTRIES):
+        self.model = model
+        self.max_entries = max_entries
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._turn = threading.local()
+        self.total_calls = 0
+
+    @property
+    def turn_calls(self):
+        """Model calls since this thread's last begin_turn"""
+        return getattr(self._turn, 'calls', 0)
+
+    def begin_turn(self):
+        """Reset the per-turn model call counter"""
+        self._turn.calls = 0
+
+    def _lookup(self, texts):
+        """Memoized vectors for texts (refreshing their LRU position), and the misses"""
+        with self._lock:
+            found = {}
+            for text in dict.fromkeys(texts):
+                if text in self._memo:
+                    self._memo.move_to_end(text)
+                    found[text] = self._memo[text]
+        return found, [t for t in dict.fromkeys(texts) if t not in found]
+
+    def _encode_missing(self, missing, **kwargs):
+        """Encode misses outside the lock so other threads' cache hits aren't blocked"""
+        if not missing:
+            return {}
+
+        vectors = np.asarray(self.model.encode(missing, **kwargs))
+        self._turn.calls = self.turn_calls + 1
+
+        with self._lock:
+            self.total_calls += 1
+            for text, vector in zip(missing, vectors):
+                self._memo[text] = vector
+            while len(self._memo) > self.max_entries:
+                self._memo.popitem(last=False)
+        return dict(zip(missing, vectors))
+
+    def prefetch(self, texts, **kwargs):
+        """Encode every text not yet memoized in one model call"""
+        _, missing = self._lookup(texts)
+        self._encode_missing(missing, **_check_kwargs(kwargs))
+
+    def encode(self, texts, **kwargs):
+        """Same shape contract as SentenceTransformer.encode (str -> 1-D, list -> 2-D)"""
+        kwargs = _check_kwargs(kwargs)
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+
+        vectors, missing = self._lookup(texts)
+        vectors.update(self._encode_missing(missing, **kwargs))
+
+        if single:
+            return vectors[texts[0]]
+        if not texts:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.stack([vectors[t] for t in texts])
+
+
+def _check_kwargs(kwargs):
+    """Memo entries are keyed on text alone, so only output-neutral options can pass"""
+    unsupported = set(kwargs) - PASSTHROUGH_KWARGS
+    if unsupported:
+        raise TypeError(f"EmbeddingCache.encode does not support {', '.join(sorted(unsupported))}")
+    return kwargs
@@ -0,0 +1,117 @@
+"""
+Multi-process bulk embedding
+
+A single encode process leaves most cores idle, so bulk ingest can shard
+texts across a process pool instead. Each worker loads the model once
+(in the pool initializer) with its intra-op threads capped at
+cores / workers, so processes don't oversubscribe the CPU. Shards are
+streamed back in submission order.
+
+Run directly for a scaling benchmark at 1/2/4/8 workers.
+"""
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+
+from embedders import DEFAULT_BATCH_SIZE, EMBEDDING_DIM, get_embedder
+
+DEFAULT_SHARD_SIZE = 256
+
+_worker_embedder = None
+
+
+def _init_worker(backend, threads):
+    global _worker_embedder
+    # numpy and embedders are already imported when this runs, so thread env
+    # vars (OMP_NUM_THREADS) would be too late; get_embedder caps threads through
+    # the runtimes instead (torch.set_num_threads / ONNX intra_op_num_threads)
+    _worker_embedder = get_embedder(backend, threads=threads)
+
+
+def _encode_shard(args):
+    texts, batch_size = args
+    return _worker_embedder.encode(texts, batch_size=batch_size)
+
+
+class EmbeddingPool:
+    """Process pool of embedders with the SentenceTransformer.encode contract"""
+
+    def __init__(self, workers=None, backend=None, batch_size=DEFAULT_BATCH_SIZE, shard_size=DEFAULT_SHARD_SIZE):
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.shard_size = shard_size
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        # spawn: forked copies of an initialised torch/onnx runtime can deadlock
+        self._pool = mp.get_context('spawn').Pool(
+            self.workers, initializer=_init_worker, initargs=(backend, threads)
+        )
+
+    def encode_stream(self, shards, batch_size=None):
+        """Yield one vector array per shard of texts, in input order"""
+        batch_size = batch_size or self.batch_size
+        yield from self._pool.imap(_encode_shard, ((list(s), batch_size) for s in shards))
+
+    def encode(self, texts, batch_size=None, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        shards = [texts[i:i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        if not shards:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        vectors = np.concatenate(list(self.encode_stream(shards, batch_size)))
+        return vectors[0] if single else vectors
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scaling_benchmark(texts, worker_counts=(1, 2, 4, 8), backend=None):
+    """Throughput per worker count; start-up (model loading) is timed separately"""
+    rows, reference = [], None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        with EmbeddingPool(workers, backend) as pool:
+            list(pool.encode_stream([["warm-up"]] * workers, batch_size=1))
+            startup = time.perf_counter() - start
+
+            start = time.perf_counter()
+            vectors = pool.encode(texts)
+            elapsed = time.perf_counter() - start
+
+        if reference is None:
+            reference = vectors
+        rows.append({
+            'workers': workers, 'startup_s': startup, 'texts_per_s': len(texts) / elapsed,
+            'max_diff': float(np.abs(vectors - reference).max())
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    from embedders import observation_texts
+
+    parser = argparse.ArgumentParser(description="Multi-process embedding scaling benchmark")
+    parser.add_argument('--texts', type=int, default=None, help="observation texts to embed (default: all)")
+    parser.add_argument('--backend', default=None, help="embedder backend (default: $EMBEDDER_BACKEND)")
+    args = parser.parse_args()
+
+    texts = observation_texts(args.texts)
+    print(f"🧵 MULTI-PROCESS EMBEDDING ({len(texts):,} texts, {os.cpu_count()} cores)")
+    print("="*70)
+
+    rows = scaling_benchmark(texts, backend=args.backend)
+    base = rows[0]['texts_per_s']
+    print(f"\n  {'Workers':>7} {'Start-up s':>10} {'Texts/s':>9} {'Speed-up':>9} {'Efficiency':>10} {'Max diff':>9}")
+    for r in rows:
+        speedup = r['texts_per_s'] / base
+        print(f"  {r['workers']:>7} {r['startup_s']:>10.1f} {r['texts_per_s']:>9,.0f} {speedup:>8.2f}x "
+              f"{speedup / r['workers']:>10.0%} {r['max_diff']:>9.1e}")
@@ -0,0 +1,183 @@
+"""
+Species / year / month entity extraction for free-text agent queries
+
+Species names (common, scientific and aliases from species_catalog) are
+matched in one pass with an Aho-Corasick automaton; years and months with
+regexes. The result converts directly into a Qdrant payload filter.
+"""
+import re
+from collections import deque
+
+from qdrant_client.models import Filter, FieldCondition, MatchAny
+
+from species_catalog import SPECIES_INFO
+from payload_schema import COMMON_CODES, TYPE_CODES
+
+SPECIES_ALIASES = {
+    'papilio_polytes': ['mormon', 'mormon butterfly'],
+    'danaus_chrysippus': ['plain tiger butterfly', 'african monarch'],
+    'apis_cerana': ['asian bee', 'asiatic honey bee', 'indian honey bee', 'eastern honey bee'],
+    'apis_dorsata': ['giant bee', 'rock bee', 'giant honeybee'],
+    'leptocoma_zeylonica': ['sunbird', 'purple rumped sunbird'],
+    'eudynamys_scolopaceus': ['koel', 'cuckoo'],
+    'murraya_koenigii': ['curry leaves', 'curry plant', 'kadi patta', 'curry tree'],
+    'mangifera_indica': ['mangoes', 'mango tree', 'mango flowers'],
+    'ficus_benghalensis': ['banyan tree', 'banyan figs', 'ficus'],
+    'lantana_camara': ['lantana flowers'],
+}
+
+TYPE_ALIASES = {
+    'bee': ['bee', 'honey bee', 'honeybee', 'pollinator'],
+    'butterfly': ['butterfly', 'caterpillar', 'larva', 'larvae'],
+    'bird': ['bird'],
+    'plant': ['plant', 'tree'],
+}
+
+MONTHS = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+          'august', 'september', 'october', 'november', 'december']
+
+YEAR_PATTERN = re.compile(r'\b(19\d{2}|20\d{2})\b')
+
+# A month word only counts with a date cue next to it ("in may", "of March",
+# "5 june", "may 2023"), so the modal "may I ask..." or "bees march" is not a month
+_MONTH_NAMES = '(' + '|'.join(MONTHS) + ')'
+MONTH_PATTERN = re.compile(
+    r'\b(?:(?:in|during|since|of|from|until|till|by|before|after|through|early|mid|late)\s+|\d{1,2}(?:st|nd|rd|th)?\s+)'
+    + _MONTH_NAMES + r'\b'
+    + r'|\b' + _MONTH_NAMES + r'\s+\d{1,4}\b'
+)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over lowercase text with word-boundary checks"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+        for pattern, value in patterns:
+            node = 0
+            for ch in pattern:
+                if ch not in self.goto[node]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            self.output[node].append((len(pattern), value))
+
+        # Breadth-first failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def find(self, text):
+        """All whole-word matches as (start, end, value), leftmost-longest and non-overlapping"""
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+
+            for length, value in self.output[node]:
+                start, end = i - length + 1, i + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, value))
+
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        selected, last_end = [], -1
+        for start, end, value in matches:
+            if start >= last_end:
+                selected.append((start, end, value))
+                last_end = end
+        return selected
+
+
+def _normalize(text):
+    return re.sub(r'[\s_\-]+', ' ', text.lower())
+
+
+def _with_plural(name):
+    """A name and its plural form ('giant honey bee' -> 'giant honey bees')"""
+    if name.endswith('s') or name.endswith('ae'):
+        return [name]
+    if name.endswith('y') and name[-2:-1] not in 'aeiou':
+        return [name, name[:-1] + 'ies']
+    return [name, name + 's']
+
+
+def _variants(name):
+    """Singular/plural of a name and of its closed compound ('honey bee' -> 'honeybee')"""
+    words = name.split()
+    forms = [name] + ([' '.join(words[:-2] + [words[-2] + words[-1]])] if len(words) >= 2 else [])
+    return list(dict.fromkeys(v for form in forms for v in _with_plural(form)))
+
+
+class EntityExtractor:
+    """Structured filters (species, types, years, months) from a user query"""
+
+    def __init__(self, species_info=SPECIES_INFO, aliases=SPECIES_ALIASES, type_aliases=TYPE_ALIASES):
+        patterns = []
+        for key, info in species_info.items():
+            names = [info['common'], key.replace('_', ' ')] + aliases.get(key, [])
+            patterns.extend(
+                (variant, ('species', info['common']))
+                for name in names for variant in _variants(_normalize(name))
+            )
+
+        for species_type, words in type_aliases.items():
+            patterns.extend(
+                (variant, ('type', species_type))
+                for word in words for variant in _variants(_normalize(word))
+            )
+
+        self.matcher = AhoCorasick(patterns)
+
+    def extract(self, text):
+        normalized = _normalize(text)
+
+        species, types = [], []
+        for _, _, (kind, value) in self.matcher.find(normalized):
+            target = species if kind == 'species' else types
+            if value not in target:
+                target.append(value)
+
+        months = []
+        for match in MONTH_PATTERN.finditer(normalized):
+            month = MONTHS.index(match.group(1) or match.group(2)) + 1
+            if month not in months:
+                months.append(month)
+
+        return {
+            'species': species,
+            'species_types': types,
+            'years': sorted({int(y) for y in YEAR_PATTERN.findall(normalized)}),
+            'months': months
+        }
+
+
+def entities_to_filter(entities, months=True):
+    """
+    Qdrant payload filter for the extracted entities, or None if there are
+    none. months=False leaves the month out (timing questions ask for it).
+    """
+    must = []
+    if entities['species']:
+        must.append(FieldCondition(key='species_id', match=MatchAny(any=[COMMON_CODES[s] for s in entities['species']])))
+    elif entities['species_types']:
+        must.append(FieldCondition(key='type_id', match=MatchAny(any=[TYPE_CODES[t] for t in entities['species_types']])))
+    if entities['years']:
+        must.append(FieldCondition(key='year', match=MatchAny(any=entities['years'])))
+    if months and entities['months']:
+        must.append(FieldCondition(key='month', match=MatchAny(any=entities['months'])))
+
+    return Filter(must=must) if must else None
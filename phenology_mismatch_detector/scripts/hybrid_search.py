@@ -0,0 +1,227 @@
+"""
+Hybrid sparse + dense retrieval over the observations collection
+
+Each observation carries the default dense MiniLM vector plus a named
+BM25-style sparse vector ('bm25'). Term frequencies are saturated and
+length-normalized client-side; IDF is applied by Qdrant (Modifier.IDF).
+Hybrid queries prefetch candidates from both vectors and fuse them with
+reciprocal rank fusion on the server.
+
+Run directly for an offline relevance and latency benchmark.
+"""
+import json
+import os
+import re
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+from payload_schema import TYPE_CODES, COMMON_CODES, SPECIES_CODES, load_place_table
+from qdrant_client.models import (
+    Filter, FieldCondition, MatchValue, SparseVector, SparseVectorParams,
+    Modifier, Prefetch, FusionQuery, Fusion
+)
+
+SPARSE_VECTOR_NAME = 'bm25'
+SPARSE_VECTORS_CONFIG = {SPARSE_VECTOR_NAME: SparseVectorParams(modifier=Modifier.IDF)}
+BM25_K1 = 1.2
+BM25_B = 0.75
+PREFETCH_LIMIT = 50
+
+# Corpus statistics (mean document length) the stored sparse vectors were built with
+BM25_STATS_PATH = 'data/processed/bm25_stats.json'
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def token_id(token):
+    """Stable 31-bit id for a token (no vocabulary file needed)"""
+    return zlib.crc32(token.encode()) & 0x7fffffff
+
+
+def bm25_document_vectors(texts, avg_length=None, k1=BM25_K1, b=BM25_B):
+    """
+    Sparse BM25 term weights (without IDF) for documents. avg_length is the
+    corpus-wide mean token count; it defaults to the mean over texts.
+    """
+    tokenized = [tokenize(t) for t in texts]
+    if avg_length is None:
+        avg_length = np.mean([len(tokens) for tokens in tokenized]) if tokenized else 1.0
+
+    vectors = []
+    for tokens in tokenized:
+        norm = k1 * (1 - b + b * len(tokens) / avg_length)
+        counts = Counter(token_id(t) for t in tokens)
+        indices = sorted(counts)
+        vectors.append(SparseVector(
+            indices=indices,
+            values=[counts[i] * (k1 + 1) / (counts[i] + norm) for i in indices]
+        ))
+    return vectors
+
+
+def load_bm25_stats(path=BM25_STATS_PATH):
+    """Stats written by the last full ingest, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_bm25_stats(stats, path=BM25_STATS_PATH):
+    with open(path, 'w') as f:
+        json.dump(stats, f, indent=2)
+
+
+def bm25_query_vector(text):
+    """Unit weight per distinct query term; the server multiplies in IDF"""
+    indices = sorted({token_id(t) for t in tokenize(text)})
+    return SparseVector(indices=indices, values=[1.0] * len(indices))
+
+
+def dense_search(client, query_vector, collection_name='observations', limit=10, query_filter=None,
+                 with_payload=True):
+    return client.query_points(
+        collection_name=collection_name,
+        query=np.asarray(query_vector).tolist(),
+        limit=limit,
+        query_filter=query_filter,
+        with_payload=with_payload
+    ).points
+
+
+def hybrid_search(client, query_text, query_vector, collection_name='observations',
+                  limit=10, query_filter=None, prefetch_limit=PREFETCH_LIMIT, with_payload=True):
+    """Dense + sparse candidates fused server-side with reciprocal rank fusion"""
+    return client.query_points(
+        collection_name=collection_name,
+        prefetch=[
+            Prefetch(query=np.asarray(query_vector).tolist(), limit=prefetch_limit, filter=query_filter),
+            Prefetch(query=bm25_query_vector(query_text), using=SPARSE_VECTOR_NAME,
+                     limit=prefetch_limit, filter=query_filter),
+        ],
+        query=FusionQuery(fusion=Fusion.RRF),
+        limit=limit,
+        with_payload=with_payload
+    ).points
+
+
+_PLACES = None
+
+
+def _place_name(place_id):
+    """Place text behind a payload place_id; the table is loaded on first use, not at import"""
+    global _PLACES
+    if _PLACES is None:
+        _PLACES = load_place_table()
+    return _PLACES[place_id]
+
+
+# Queries from test_queries.py plus exact-token lookups; relevance is judged
+# from the payload, so no manual labels are needed
+RELEVANCE_FIELDS = ['species_id', 'type_id', 'month', 'place_id']
+
+BENCHMARK_QUERIES = [
+    {
+        'query': "butterfly emergence in spring season March April",
+        'filter': Filter(must=[FieldCondition(key="type_id", match=MatchValue(value=TYPE_CODES['butterfly']))]),
+        'relevant': lambda p: p['type_id'] == TYPE_CODES['butterfly'] and p['month'] in (3, 4)
+    },
+    {
+        'query': "mango tree flowering blooming",
+        'filter': None,
+        'relevant': lambda p: p['species_id'] == COMMON_CODES['Mango']
+    },
+    {
+        'query': "bee pollination activity foraging",
+        'filter': Filter(must=[FieldCondition(key="year", match=MatchValue(value=2024))]),
+        'relevant': lambda p: p['type_id'] == TYPE_CODES['bee']
+    },
+    {
+        'query': "Papilio polytes",
+        'filter': None,
+        'relevant': lambda p: p['species_id'] == SPECIES_CODES['papilio_polytes']
+    },
+    {
+        'query': "Apis dorsata",
+        'filter': None,
+        'relevant': lambda p: p['species_id'] == SPECIES_CODES['apis_dorsata']
+    },
+    {
+        'query': "Kengeri Satellite Town",
+        'filter': None,
+        'relevant': lambda p: 'Kengeri' in _place_name(p['place_id'])
+    },
+    {
+        'query': "observations at Thubarahalli Lake",
+        'filter': None,
+        'relevant': lambda p: 'Thubarahalli' in _place_name(p['place_id'])
+    },
+    {
+        'query': "Common Mormon in Brookefield",
+        'filter': None,
+        'relevant': lambda p: p['species_id'] == COMMON_CODES['Common Mormon'] and 'Brookefield' in _place_name(p['place_id'])
+    },
+]
+
+
+def _score(points, relevant):
+    hits = [bool(relevant(p.payload)) for p in points]
+    first = next((i for i, h in enumerate(hits) if h), None)
+    return np.mean(hits) if hits else 0.0, 1.0 / (first + 1) if first is not None else 0.0
+
+
+def run_benchmark(client, embedder, k=10, repeats=20, queries=BENCHMARK_QUERIES):
+    """Precision@k, MRR and median latency for dense vs hybrid retrieval"""
+    rows = []
+    for q in queries:
+        vector = embedder.encode(q['query'])
+        searches = {
+            'dense': lambda: dense_search(client, vector, limit=k, query_filter=q['filter'],
+                                          with_payload=RELEVANCE_FIELDS),
+            'hybrid': lambda: hybrid_search(client, q['query'], vector, limit=k, query_filter=q['filter'],
+                                            with_payload=RELEVANCE_FIELDS)
+        }
+
+        row = {'query': q['query']}
+        for mode, search in searches.items():
+            precision, rr = _score(search(), q['relevant'])
+            latencies = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                search()
+                latencies.append(time.perf_counter() - start)
+            row[f'{mode}_p@{k}'] = precision
+            row[f'{mode}_rr'] = rr
+            row[f'{mode}_ms'] = np.median(latencies) * 1000
+        rows.append(row)
+
+    return rows
+
+
+if __name__ == "__main__":
+    from qdrant_client import QdrantClient
+    from embedders import get_embedder
+
+    print("🔀 HYBRID vs DENSE RETRIEVAL BENCHMARK")
+    print("="*70)
+
+    client = QdrantClient("localhost", port=6333)
+    embedder = get_embedder()
+
+    rows = run_benchmark(client, embedder)
+
+    print(f"\n  {'Query':45} {'P@10 dense':>10} {'hybrid':>7} {'RR dense':>9} {'hybrid':>7} {'ms dense':>9} {'hybrid':>7}")
+    for r in rows:
+        print(f"  {r['query'][:45]:45} {r['dense_p@10']:>10.2f} {r['hybrid_p@10']:>7.2f} "
+              f"{r['dense_rr']:>9.2f} {r['hybrid_rr']:>7.2f} {r['dense_ms']:>9.1f} {r['hybrid_ms']:>7.1f}")
+
+    for mode in ['dense', 'hybrid']:
+        print(f"\n  {mode:6}: mean P@10 {np.mean([r[f'{mode}_p@10'] for r in rows]):.2f}, "
+              f"MRR {np.mean([r[f'{mode}_rr'] for r in rows]):.2f}, "
+              f"median latency {np.median([r[f'{mode}_ms'] for r in rows]):.1f} ms")
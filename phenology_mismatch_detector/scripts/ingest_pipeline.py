@@ -0,0 +1,146 @@
+"""
+Threaded producer/consumer pipeline with bounded queues
+
+A source iterator feeds a chain of stages; each stage has its own worker
+threads and a bounded input queue, so a slow stage blocks its producers
+(backpressure) instead of letting work pile up in memory. Every stage
+records time spent working, waiting for input (starved) and waiting to
+hand off output (blocked), from which per-stage utilization is reported.
+"""
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class Stage:
+    """One pipeline step: fn(item) -> item for the next stage (None drops it)"""
+
+    def __init__(self, name, fn, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.queue_size = queue_size
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, busy=0.0, starved=0.0, blocked=0.0, items=0):
+        with self._lock:
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+            self.items += items
+
+    def stats(self, wall):
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'items': self.items,
+            'busy_s': self.busy,
+            'starved_s': self.starved,
+            'blocked_s': self.blocked,
+            'utilization': self.busy / (wall * self.workers) if wall > 0 else 0.0
+        }
+
+
+def run_pipeline(source, stages, source_name='read'):
+    """
+    Run source through stages until exhausted.
+
+    Returns (stats, wall_seconds) with one stats dict per stage, the source
+    first. The first worker exception is re-raised after the pipeline has
+    drained.
+    """
+    queues = [queue.Queue(maxsize=stage.queue_size) for stage in stages]
+    reader = Stage(source_name, None)
+    remaining = [stage.workers for stage in stages]
+    remaining_lock = threading.Lock()
+    errors = []
+
+    def hand_off(stage, out, item):
+        start = time.perf_counter()
+        out.put(item)
+        stage.record(blocked=time.perf_counter() - start)
+
+    def read():
+        items = iter(source)
+        try:
+            while not errors:
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+                reader.record(busy=time.perf_counter() - start, items=1)
+                hand_off(reader, queues[0], item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            for _ in range(stages[0].workers):
+                queues[0].put(_DONE)
+
+    def work(index, stage):
+        out = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                start = time.perf_counter()
+                item = queues[index].get()
+                stage.record(starved=time.perf_counter() - start)
+                if item is _DONE:
+                    break
+                if errors:
+                    continue  # drain so upstream stages never block forever
+
+                start = time.perf_counter()
+                try:
+                    result = stage.fn(item)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                stage.record(busy=time.perf_counter() - start, items=1)
+
+                if out is not None and result is not None:
+                    hand_off(stage, out, result)
+        finally:
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and out is not None:
+                for _ in range(stages[index + 1].workers):
+                    out.put(_DONE)
+
+    threads = [threading.Thread(target=read, name=source_name)]
+    for index, stage in enumerate(stages):
+        threads.extend(
+            threading.Thread(target=work, args=(index, stage), name=f"{stage.name}-{n}")
+            for n in range(stage.workers)
+        )
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    return [s.stats(wall) for s in [reader] + stages], wall
+
+
+def print_stage_report(stats, wall):
+    """Per-stage utilization table; the busiest stage is the bottleneck"""
+    bottleneck = max(stats, key=lambda s: s['utilization'])
+
+    print(f"\n  ⏱️  Pipeline wall time: {wall:.1f}s")
+    print(f"  {'Stage':10} {'Workers':>7} {'Items':>6} {'Busy s':>8} {'Util':>6} {'Starved s':>10} {'Blocked s':>10}")
+    for s in stats:
+        marker = "  ← bottleneck" if s is bottleneck else ""
+        print(f"  {s['stage']:10} {s['workers']:>7} {s['items']:>6} {s['busy_s']:>8.1f} "
+              f"{s['utilization']:>6.0%} {s['starved_s']:>10.1f} {s['blocked_s']:>10.1f}{marker}")
@@ -4,29 +4,76 @@
 import pandas as pd
 import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, FilterSelector
+)
+from embedders import get_embedder
+from embedding_pool import EmbeddingPool
 from tqdm import tqdm
-import hashlib
+from species_catalog import SPECIES_RELATIONSHIPS
+from activity_curves import build_activity_curves, relationship_overlap
+from cooccurrence import relationship_encounters, encounter_summary
+from mismatch_ranking import refresh_mismatch_rankings
+from hybrid_search import (
+    SPARSE_VECTOR_NAME, SPARSE_VECTORS_CONFIG, bm25_document_vectors, tokenize,
+    load_bm25_stats, save_bm25_stats
+)
+from payload_schema import (
+    SPECIES_CODES, assign_place_ids, load_place_table, save_place_table, encode_observation,
+    generate_observation_text
+)
+from streaming import DEFAULT_MEMORY_MB, chunk_rows_for_budget, iter_csv_chunks, peak_rss_mb
+from ingest_pipeline import Stage, run_pipeline, print_stage_report
+from point_ids import PointIdTracker
+from doy_sketch import DoySketches
 
-print("🚀 INGESTING DATA INTO QDRANT")
-print("="*70)
+# Embedding pool workers are spawned processes that re-import this script
+# as __mp_main__; they load their own model and never talk to Qdrant
+if __name__ != '__mp_main__':
+    print("🚀 INGESTING DATA INTO QDRANT")
+    print("="*70)
+    
+    
+    print("\n🔗 Connecting to Qdrant...")
+    client = QdrantClient("localhost", port=6333)
+    print("✅ Connected!")
+
+_embedder = None
 
 
-print("\n🔗 Connecting to Qdrant...")
-client = QdrantClient("localhost", port=6333)
-print("✅ Connected!")
+def load_embedder():
+    """In-process embedding model, loaded on first use (a pooled ingest never needs it)"""
+    global _embedder
+    if _embedder is None:
+        print("\n🤖 Loading embedding model...")
+        _embedder = get_embedder()
+        print(f"✅ Model loaded! ({_embedder.name} backend)")
+    return _embedder
 
 
-print("\n🤖 Loading embedding model...")
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
-print("✅ Model loaded!")
+OBSERVATIONS_PATH = 'data/processed/all_species_combined.csv'
+UPSERT_BATCH_SIZE = 100
+EMBED_BATCH_SIZE = 64
+UPLOAD_WORKERS = 4
+EMBED_WORKERS = 1
 
+# A species-scoped ingest reuses the stored BM25 mean document length, or
+# rebuilds every sparse vector once the corpus mean drifts this much
+BM25_DRIFT_TOLERANCE = 0.02
+
+# Upper bound on rows per pipeline chunk, so even small inputs are split
+# finely enough for the stages to overlap
+PIPELINE_CHUNK_ROWS = 512
+
+# Per-row working set on top of the DataFrame: dense vector as Python
+# floats, sparse vector, payload and point objects
+INGEST_ROW_OVERHEAD_BYTES = 16 * 1024
 
 COLLECTIONS = {
     'observations': {
         'description': 'All species observations with temporal metadata',
-        'vector_size': 384  # all-MiniLM-L6-v2 produces 384-dim vectors
+        'vector_size': 384,  # all-MiniLM-L6-v2 produces 384-dim vectors
+        'sparse_vectors': SPARSE_VECTORS_CONFIG
     },
     'climate_data': {
         'description': 'Climate signals (temperature, rainfall)',
@@ -42,11 +89,17 @@ COLLECTIONS = {
     }
 }
 
-def create_collections():
-    """Create or recreate Qdrant collections"""
+def create_collections(names=None, recreate=True):
+    """Create or recreate Qdrant collections (recreate=False keeps existing ones)"""
     print("\n📦 Creating Qdrant collections...")
     
     for collection_name, config in COLLECTIONS.items():
+        if names is not None and collection_name not in names:
+            continue
+        
+        if not recreate and client.collection_exists(collection_name):
+            print(f"  ✅ Keeping existing '{collection_name}'")
+            continue
         
         try:
             client.delete_collection(collection_name)
@@ -60,86 +113,155 @@ def create_collections():
             vectors_config=VectorParams(
                 size=config['vector_size'],
                 distance=Distance.COSINE
-            )
+            ),
+            sparse_vectors_config=config.get('sparse_vectors')
         )
         print(f"  ✅ Created '{collection_name}' - {config['description']}")
 
-def generate_observation_text(row):
-    
-    text = (
-        f"{row['species_common']} ({row['species_type']}) "
-        f"observed on {row['observed_date'].strftime('%B %d, %Y')} "
-        f"(day {row['day_of_year']} of {row['year']}) "
-        f"in {row.get('place_guess', 'Karnataka')} "
-        f"during {row['season']} season"
-    )
-    return text
+def sparse_observation_text(text, species_key):
+    """BM25 text: the template plus the scientific name, so Latin-name queries match"""
+    return f"{text} {species_key.replace('_', ' ')}"
 
-def ingest_observations():
+def ingest_observations(memory_mb=DEFAULT_MEMORY_MB, upload_workers=UPLOAD_WORKERS, species_keys=None,
+                        embed_workers=EMBED_WORKERS):
+    """
+    Pipelined ingest of the combined CSV: read → build texts → embed →
+    upload, as threaded stages joined by bounded queues. Upload runs on
+    several workers so network writes overlap with embedding; full queues
+    throttle the reader. Per-stage utilization is printed at the end.
+    
+    With embed_workers > 1, embedding is sharded across a process pool
+    (one model per process) and that many embed threads keep it fed.
+    
+    With species_keys, only those species are replaced: their existing
+    points are deleted and re-ingested, and the place table is extended
+    so ids already stored on other points stay valid.
+    """
     
     print("\n📥 Ingesting observations...")
     
-    # Load combined data
-    df = pd.read_csv('data/processed/all_species_combined.csv')
-    df['observed_date'] = pd.to_datetime(df['observed_date'])
-    
-    print(f"  📊 Total observations to ingest: {len(df):,}")
-    
-    points = []
-    
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="  Processing"):
-       
-        text = generate_observation_text(row)
-        
-        
-        vector = embedder.encode(text).tolist()
-        
-        
-        point_id = int(hashlib.md5(str(row['observation_id']).encode()).hexdigest()[:16], 16) % (10**9)
-        
-       
-        payload = {
-            'observation_id': int(row['observation_id']),
-            'species_key': row['species_key'],
-            'species_common': row['species_common'],
-            'species_type': row['species_type'],
-            'species_role': row['species_role'],
-            'observed_date': row['observed_date'].isoformat(),
-            'year': int(row['year']),
-            'month': int(row['month']),
-            'day_of_year': int(row['day_of_year']),
-            'season': row['season'],
-            'latitude': float(row['latitude']),
-            'longitude': float(row['longitude']),
-            'place': row.get('place_guess', 'Karnataka'),
-            'text_description': text
+    # Place strings are stored once in a side table and referenced by id
+    place_index = {}
+    # DOY sketches per species x year x region, built as chunks stream past
+    sketches = DoySketches()
+    avg_length = None
+    progress = None
+    
+    # Every point id must belong to exactly one observation
+    id_tracker = PointIdTracker()
+    
+    def build(chunk):
+        sketches.update(chunk)
+        rows = [row for _, row in chunk.iterrows()]
+        texts = [generate_observation_text(row) for row in rows]
+        return {
+            'rows': rows,
+            'texts': texts,
+            'sparse': bm25_document_vectors(
+                [sparse_observation_text(t, row['species_key']) for t, row in zip(texts, rows)],
+                avg_length=avg_length
+            ),
+            'place_ids': assign_place_ids(chunk['place_guess'], place_index),
+            'point_ids': [id_tracker.register(row['observation_id']) for row in rows]
         }
-        
-        # Create point
-        point = PointStruct(
-            id=point_id,
-            vector=vector,
-            payload=payload
-        )
-        
-        points.append(point)
-        
-        
-        if len(points) >= 100:
+    
+    def embed(batch):
+        batch['dense'] = encoder.encode(batch['texts'], batch_size=EMBED_BATCH_SIZE)
+        return batch
+    
+    def upload(batch):
+        points = []
+        for row, point_id, dense, sparse, place_id in zip(
+            batch['rows'], batch['point_ids'], batch['dense'], batch['sparse'], batch['place_ids']
+        ):
+            points.append(PointStruct(
+                id=point_id,
+                vector={'': dense.tolist(), SPARSE_VECTOR_NAME: sparse},
+                payload=encode_observation(row, place_id)
+            ))
+        
+        for start in range(0, len(points), UPSERT_BATCH_SIZE):
             client.upsert(
                 collection_name='observations',
-                points=points
+                points=points[start:start + UPSERT_BATCH_SIZE]
             )
-            points = []
+        progress.update(len(points))
     
-   
-    if points:
-        client.upsert(
-            collection_name='observations',
-            points=points
+    # build mutates place_index and id_tracker, so it stays single-threaded
+    stages = [
+        Stage('build', build),
+        Stage('embed', embed, workers=embed_workers),
+        Stage('upload', upload, workers=upload_workers),
+    ]
+    
+    # Every queued or in-process chunk counts against the memory ceiling
+    in_flight = 1 + sum(stage.queue_size + stage.workers for stage in stages)
+    chunksize = min(PIPELINE_CHUNK_ROWS, chunk_rows_for_budget(
+        OBSERVATIONS_PATH, memory_mb / in_flight, INGEST_ROW_OVERHEAD_BYTES
+    ))
+    
+    def selected_chunks():
+        for chunk in iter_csv_chunks(OBSERVATIONS_PATH, chunksize=chunksize, parse_dates=['observed_date']):
+            if species_keys is not None:
+                chunk = chunk[chunk['species_key'].isin(species_keys)]
+            if len(chunk):
+                yield chunk
+    
+    # First pass (text only, whole corpus): BM25 needs the mean document length
+    total_rows, total_tokens = 0, 0
+    for chunk in iter_csv_chunks(OBSERVATIONS_PATH, chunksize=chunksize, parse_dates=['observed_date']):
+        total_tokens += sum(
+            len(tokenize(sparse_observation_text(generate_observation_text(row), row['species_key'])))
+            for _, row in chunk.iterrows()
         )
+        total_rows += len(chunk)
+    avg_length = total_tokens / max(total_rows, 1)
     
-    print(f"  ✅ Ingested {len(df):,} observations")
+    if species_keys is not None:
+        client.delete(
+            collection_name='observations',
+            points_selector=FilterSelector(filter=Filter(must=[FieldCondition(
+                key='species_id', match=MatchAny(any=[SPECIES_CODES[k] for k in species_keys])
+            )]))
+        )
+        
+        # Untouched species keep the sparse vectors they were stored with, so
+        # the new ones must use the same BM25 length normalization
+        stored = load_bm25_stats()
+        drift = None if stored is None else abs(avg_length / stored['avg_length'] - 1)
+        if drift is None or drift > BM25_DRIFT_TOLERANCE:
+            reason = "no stored BM25 stats" if drift is None else f"mean document length drifted {drift:.1%}"
+            print(f"  🔁 {reason}: rebuilding every observation's sparse vector")
+            species_keys = None
+        else:
+            avg_length = stored['avg_length']
+            place_index = {place: i for i, place in enumerate(load_place_table())}
+            sketches = DoySketches.load().drop_species(species_keys)
+            total_rows = sum(len(chunk) for chunk in selected_chunks())
+    
+    print(f"  📊 Total observations to ingest: {total_rows:,} "
+          f"(chunks of {chunksize:,} rows, {memory_mb} MB ceiling, {embed_workers} embed / "
+          f"{upload_workers} upload workers)")
+    
+    pooled = embed_workers > 1
+    encoder = EmbeddingPool(embed_workers, shard_size=2 * EMBED_BATCH_SIZE) if pooled else load_embedder()
+    try:
+        with tqdm(total=total_rows, desc="  Processing") as progress:
+            stats, wall = run_pipeline(selected_chunks(), stages)
+    finally:
+        if pooled:
+            encoder.close()
+    
+    save_place_table(list(place_index))
+    sketches.save()
+    if species_keys is None:
+        save_bm25_stats({'avg_length': avg_length, 'documents': total_rows})
+    
+    print(f"  ✅ Ingested {len(id_tracker):,} observations ({len(place_index):,} distinct places, "
+          f"{len(sketches):,} DOY sketches), peak RSS {peak_rss_mb():.0f} MB")
+    if id_tracker.duplicates:
+        print(f"  ⚠️  {id_tracker.duplicates:,} duplicate rows overwrote the same point")
+    print_stage_report(stats, wall)
 
 def ingest_climate_data():
     
@@ -163,7 +285,7 @@ def ingest_climate_data():
         )
         
         
-        vector = embedder.encode(text).tolist()
+        vector = load_embedder().encode(text).tolist()
         
         
         point_id = int(row['year']) * 100 + int(row['month'])
@@ -219,7 +341,7 @@ def ingest_phenology_patterns():
         )
         
         
-        vector = embedder.encode(text).tolist()
+        vector = load_embedder().encode(text).tolist()
         
     
         payload = {
@@ -254,56 +376,16 @@ def ingest_species_metadata():
     print("\n🔗 Ingesting species metadata...")
     
     
-    relationships = [
-        {
-            'consumer': 'Common Mormon',
-            'consumer_type': 'butterfly_larvae',
-            'resource': 'Curry Leaf',
-            'resource_type': 'host_plant',
-            'relationship': 'obligate_herbivory',
-            'description': 'Common Mormon butterfly larvae feed exclusively on Curry Leaf fresh foliage'
-        },
-        {
-            'consumer': 'Asian Honey Bee',
-            'consumer_type': 'pollinator',
-            'resource': 'Mango',
-            'resource_type': 'flower',
-            'relationship': 'pollination',
-            'description': 'Asian Honey Bee pollinates Mango flowers for nectar and pollen'
-        },
-        {
-            'consumer': 'Giant Honey Bee',
-            'consumer_type': 'pollinator',
-            'resource': 'Mango',
-            'resource_type': 'flower',
-            'relationship': 'pollination',
-            'description': 'Giant Honey Bee pollinates Mango flowers'
-        },
-        {
-            'consumer': 'Plain Tiger',
-            'consumer_type': 'butterfly_adult',
-            'resource': 'Lantana',
-            'resource_type': 'nectar_source',
-            'relationship': 'nectarivory',
-            'description': 'Plain Tiger butterfly drinks nectar from Lantana flowers'
-        },
-        {
-            'consumer': 'Purple-rumped Sunbird',
-            'consumer_type': 'bird',
-            'resource': 'Lantana',
-            'resource_type': 'nectar_source',
-            'relationship': 'nectarivory',
-            'description': 'Purple-rumped Sunbird feeds on Lantana nectar'
-        },
-        {
-            'consumer': 'Asian Koel',
-            'consumer_type': 'bird',
-            'resource': 'Banyan',
-            'resource_type': 'fruit',
-            'relationship': 'frugivory',
-            'description': 'Asian Koel feeds on Banyan figs'
-        }
-    ]
+    relationships = SPECIES_RELATIONSHIPS
+    
+    # Activity-curve overlap per year for every consumer-resource pair
+    observations = pd.read_csv('data/processed/all_species_combined.csv', parse_dates=['observed_date'])
+    curves = build_activity_curves(observations)
+    curves.save()
+    overlap = relationship_overlap(curves, relationships)
+    
+    # Share of consumer observations with the resource nearby in space and time
+    encounters = encounter_summary(relationship_encounters(observations, relationships))
     
     points = []
     
@@ -314,10 +396,21 @@ def ingest_species_metadata():
             f"{rel['description']}"
         )
         
-        vector = embedder.encode(text).tolist()
+        vector = load_embedder().encode(text).tolist()
+        
+        pair_overlap = overlap[(overlap['consumer'] == rel['consumer']) & (overlap['resource'] == rel['resource'])]
+        pair_encounters = encounters[(encounters['consumer'] == rel['consumer']) & (encounters['resource'] == rel['resource'])]
         
         payload = {
             **rel,
+            'activity_overlap': {
+                str(int(r['year'])): round(float(r['overlap_coefficient']), 4)
+                for _, r in pair_overlap.iterrows()
+            },
+            'encounter_rate': {
+                str(int(r['year'])): round(float(r['encounter_rate']), 4)
+                for _, r in pair_encounters.iterrows()
+            },
             'text_description': text
         }
         
@@ -336,6 +429,15 @@ def ingest_species_metadata():
     
     print(f"  ✅ Ingested {len(relationships)} species relationships")
 
+def refresh_rankings():
+    
+    print("\n🔝 Refreshing mismatch rankings...")
+    
+    df = pd.read_csv('data/processed/all_species_combined.csv')
+    rankings, changed = refresh_mismatch_rankings(df)
+    
+    print(f"  ✅ {len(rankings)} ranked relationship-years ({len(changed)} species recomputed)")
+
 def verify_ingestion():
     
     print("\n✅ Verifying ingestion...")
@@ -344,15 +446,17 @@ def verify_ingestion():
         info = client.get_collection(collection_name)
         print(f"  📊 {collection_name}: {info.points_count:,} points")
 
-def main():
+def main(memory_mb=DEFAULT_MEMORY_MB, upload_workers=UPLOAD_WORKERS, embed_workers=EMBED_WORKERS):
     
     create_collections()
     
-    ingest_observations()
+    ingest_observations(memory_mb, upload_workers, embed_workers=embed_workers)
     ingest_climate_data()
     ingest_phenology_patterns()
     ingest_species_metadata()
     
+    refresh_rankings()
+    
     verify_ingestion()
     
     print("\n" + "="*70)
@@ -361,4 +465,14 @@ def main():
     print("\n✅ All data loaded into Qdrant vector database")
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Ingest processed phenology data into Qdrant")
+    parser.add_argument('--memory-mb', type=int, default=DEFAULT_MEMORY_MB,
+                        help="memory ceiling for streaming the observations CSV")
+    parser.add_argument('--upload-workers', type=int, default=UPLOAD_WORKERS,
+                        help="parallel Qdrant upload threads")
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS,
+                        help="embedding processes for bulk ingest (one model each)")
+    args = parser.parse_args()
+    main(memory_mb=args.memory_mb, upload_workers=args.upload_workers, embed_workers=args.embed_workers)
\ No newline at end of file
@@ -3,9 +3,14 @@ Intelligent Phenology Query System
 """
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
-import pandas as pd
+from embedders import get_embedder
 from datetime import datetime
+from embedding_cache import EmbeddingCache
+from climate_drivers import load_climate_drivers, describe_driver
+from circular_stats import circular_mean, circular_median, circular_distance, circular_sd_days
+from payload_schema import COMMON_CODES, TIMING_FIELDS
+from doy_sketch import DoySketches
+from species_catalog import SPECIES_INFO, COMMON_TO_KEY
 
 print("🧠 INTELLIGENT PHENOLOGY QUERY SYSTEM")
 print("="*70)
@@ -13,16 +18,19 @@ print("Using: Qdrant Vector Search + Rule-based Reasoning")
 print("="*70)
 
 qdrant_client = QdrantClient("localhost", port=6333)
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+embedder = get_embedder()
 
 class PhenologyAnalyzer:
     
     
     def __init__(self):
         self.client = qdrant_client
-        self.embedder = embedder
+        self.embedder = EmbeddingCache(embedder)
+        self.climate_drivers = load_climate_drivers()
+        # Season windows over every observation, without fetching DOYs
+        self.season_windows = DoySketches.load().timing().set_index(['species', 'year'])
     
-    def retrieve(self, query_text, collection='observations', limit=20, filters=None):
+    def retrieve(self, query_text, collection='observations', limit=20, filters=None, with_payload=True):
         
         query_vector = self.embedder.encode(query_text).tolist()
         
@@ -30,11 +38,25 @@ class PhenologyAnalyzer:
             collection_name=collection,
             query=query_vector,
             limit=limit,
-            query_filter=filters
+            query_filter=filters,
+            with_payload=with_payload
         )
         
         return results.points
     
+    def timing_stats(self, doys):
+        """Circular timing summary for a list of days of year"""
+        
+        mean_doy, resultant = circular_mean(doys)
+        
+        return {
+            'n': len(doys),
+            'median_doy': circular_median(doys),
+            'mean_doy': mean_doy,
+            'resultant_length': resultant,
+            'sd_days': float(circular_sd_days(resultant))
+        }
+    
     def analyze_mismatch(self, species1, species2, year=2024):
         
         
@@ -45,45 +67,61 @@ class PhenologyAnalyzer:
         
         print(f"📥 Retrieving data from Qdrant...")
         
+        # All query texts for this analysis in a single encode call
+        self.embedder.prefetch([species1, species2, f"{species1} {species2}", "temperature pre-monsoon"])
+        
         sp1_obs = self.retrieve(
             species1,
             filters=Filter(must=[
-                FieldCondition(key="species_common", match=MatchValue(value=species1)),
+                FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES[species1])),
                 FieldCondition(key="year", match=MatchValue(value=year))
             ]),
-            limit=200
+            limit=200,
+            with_payload=TIMING_FIELDS
         )
         
         sp2_obs = self.retrieve(
             species2,
             filters=Filter(must=[
-                FieldCondition(key="species_common", match=MatchValue(value=species2)),
+                FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES[species2])),
                 FieldCondition(key="year", match=MatchValue(value=year))
             ]),
-            limit=200
+            limit=200,
+            with_payload=TIMING_FIELDS
         )
         
         if not sp1_obs or not sp2_obs:
             print("⚠️  Insufficient data for analysis")
             return
         
-        # Calculate medians
+        # Calculate circular medians (handles Dec-Jan activity wrapping the year)
         sp1_doys = [p.payload['day_of_year'] for p in sp1_obs]
         sp2_doys = [p.payload['day_of_year'] for p in sp2_obs]
         
-        sp1_median = pd.Series(sp1_doys).median()
-        sp2_median = pd.Series(sp2_doys).median()
+        sp1_stats = self.timing_stats(sp1_doys)
+        sp2_stats = self.timing_stats(sp2_doys)
+        
+        sp1_median = sp1_stats['median_doy']
+        sp2_median = sp2_stats['median_doy']
+        
+        gap = float(circular_distance(sp1_median, sp2_median))
         
-        gap = sp1_median - sp2_median
+        print(f"  ✅ {species1}: {len(sp1_obs)} observations, Median DOY: {sp1_median:.0f} (±{sp1_stats['sd_days']:.0f} days)")
+        print(f"  ✅ {species2}: {len(sp2_obs)} observations, Median DOY: {sp2_median:.0f} (±{sp2_stats['sd_days']:.0f} days)")
         
-        print(f"  ✅ {species1}: {len(sp1_obs)} observations, Median DOY: {sp1_median:.0f}")
-        print(f"  ✅ {species2}: {len(sp2_obs)} observations, Median DOY: {sp2_median:.0f}")
+        for species in [species1, species2]:
+            key = (COMMON_TO_KEY[species], year)
+            if key in self.season_windows.index:
+                window = self.season_windows.loc[key]
+                print(f"     {species} season (all {window['n']} obs): onset DOY {window['onset_doy']:.0f}, "
+                      f"median {window['median_doy']:.0f}, end {window['end_doy']:.0f}")
         
         
         patterns = self.retrieve(
             f"{species1} {species2}",
             collection='temporal_patterns',
-            limit=10
+            limit=10,
+            with_payload=['species', 'shift_days']
         )
         
         
@@ -94,7 +132,8 @@ class PhenologyAnalyzer:
                 FieldCondition(key="year", match=MatchValue(value=year)),
                 FieldCondition(key="season", match=MatchValue(value="pre_monsoon"))
             ]),
-            limit=5
+            limit=5,
+            with_payload=['temperature_anomaly']
         )
         
         
@@ -155,13 +194,13 @@ class PhenologyAnalyzer:
         print(f"\n🔗 CAUSAL MECHANISM:\n")
         
         
-        sp1_type = sp1_obs[0].payload.get('species_type') if sp1_obs else 'unknown'
-        sp2_type = sp2_obs[0].payload.get('species_type') if sp2_obs else 'unknown'
+        sp1_type = SPECIES_INFO[COMMON_TO_KEY[species1]]['type']
+        sp2_type = SPECIES_INFO[COMMON_TO_KEY[species2]]['type']
         
-        if sp2_type == 'plant' and sp1_type in ['bee', 'butterfly', 'bird']:
-            print(f"  Climate warming → {species2} (plant) responds quickly")
-            print(f"  {species1} ({sp1_type}) responds more slowly (photoperiod-constrained)")
-            print(f"  Result: {species1} misses optimal {species2} resource availability")
+        for species, stype in [(species1, sp1_type), (species2, sp2_type)]:
+            driver = describe_driver(self.climate_drivers, species)
+            print(f"  {species} ({stype}): {driver or 'no significant climate driver in the data'}")
+        print(f"  Result: species tracking different cues drift apart as climate changes")
         
         # 5. Impact assessment
         print(f"\n⚡ ECOLOGICAL IMPACT:\n")
@@ -224,7 +263,8 @@ class PhenologyAnalyzer:
         patterns = self.retrieve(
             "phenological shifts timing changes",
             collection='temporal_patterns',
-            limit=20
+            limit=20,
+            with_payload=['species', 'species_type', 'shift_days']
         )
         
         if not patterns:
@@ -0,0 +1,216 @@
+"""
+Embedding-prototype intent router for the EcoSync agent
+
+Labeled prototype utterances are embedded once at startup into a small
+matrix. Each query is routed with one matrix-vector product against that
+matrix plus a similarity threshold, reusing the query embedding that the
+agent also uses for retrieval.
+
+ROUTING_EXAMPLES is a held-out labeled set (none of it is a prototype),
+including queries that should fall back to search and ones that sit
+between overlapping intents. Run directly to score routing accuracy over
+a sweep of thresholds with the configured embedder:
+    python scripts/intent_router.py
+"""
+import numpy as np
+
+INTENT_PROTOTYPES = {
+    'crop_failure': [
+        "why are mango crops failing",
+        "why is mango pollination failing",
+        "explain the mango harvest loss",
+        "are bees missing the mango flowers",
+        "why is fruit set low in mango orchards",
+    ],
+    'butterfly_decline': [
+        "why are butterfly populations declining",
+        "explain butterfly decline",
+        "why are common mormon butterflies disappearing",
+        "are caterpillars starving because of host plant timing",
+    ],
+    'general_mismatch': [
+        "what is a phenological mismatch",
+        "explain phenological mismatches",
+        "why do species fall out of sync",
+        "how does climate change cause timing mismatches",
+    ],
+    'top_mismatches': [
+        "show me the top mismatches",
+        "which species pairs are most out of sync",
+        "list the worst mismatches",
+        "rank the consumer resource mismatches",
+    ],
+    'shifts': [
+        "what are the phenological shifts",
+        "how much has timing shifted since the baseline",
+        "which species shifted earlier",
+        "show baseline versus current timing changes",
+        "how did timing shift between 2019 and 2023",
+    ],
+    'list_species': [
+        "list all species",
+        "which species are in the database",
+        "what species do you track",
+    ],
+    'overview': [
+        "give me an overview",
+        "show the system status",
+        "summarize what you know",
+    ],
+    'timing': [
+        "when do giant honey bees appear",
+        "when is mango flowering",
+        "when does curry leaf flush new leaves",
+        "what time of year do butterflies emerge",
+        "when are asian koels active",
+    ],
+    'climate': [
+        "explain climate warming trends",
+        "how has temperature changed in karnataka",
+        "is it getting hotter",
+        "show rainfall and temperature anomalies",
+    ],
+    'downstream': [
+        "what is affected downstream of mango",
+        "which species depend on curry leaf",
+        "what happens to other species if lantana flowering shifts",
+        "what else is at risk if the curry leaf flush comes early",
+        "which species are most exposed to mismatches through the food web",
+    ],
+    'how_it_works': [
+        "how does this system work",
+        "how do you detect mismatches",
+        "explain your method",
+    ],
+}
+
+FALLBACK_INTENT = 'search'
+
+# (query, expected intent); FALLBACK_INTENT means no prototype should match
+ROUTING_EXAMPLES = [
+    ("why did the mango harvest fail this year", 'crop_failure'),
+    ("are pollinators arriving too late for mango bloom", 'crop_failure'),
+    ("mango orchards produced very little fruit, why", 'crop_failure'),
+    ("why are there fewer common mormons", 'butterfly_decline'),
+    ("what is killing the butterfly caterpillars", 'butterfly_decline'),
+    ("why are butterflies disappearing in karnataka", 'butterfly_decline'),
+    ("what does mismatch mean in ecology", 'general_mismatch'),
+    ("why would a pollinator and its flower fall out of step", 'general_mismatch'),
+    ("which relationships are the most mismatched in 2024", 'top_mismatches'),
+    ("worst consumer resource gaps", 'top_mismatches'),
+    ("top 5 mismatched species pairs", 'top_mismatches'),
+    ("how has flowering time changed since 2019", 'shifts'),
+    ("compare 2020 with 2024 timing", 'shifts'),
+    ("which species now appear earlier than before", 'shifts'),
+    ("what changed in timing from 2021 to 2024", 'shifts'),
+    ("cascading effects of the mango flowering shift", 'downstream'),
+    ("what species are included", 'list_species'),
+    ("show me every species you have", 'list_species'),
+    ("summarize the dataset", 'overview'),
+    ("what is the status of the database", 'overview'),
+    ("when is mango flowering and why", 'timing'),
+    ("what month do plain tigers fly", 'timing'),
+    ("when does lantana bloom", 'timing'),
+    ("when are sunbirds most active in 2023", 'timing'),
+    ("what season do banyan figs ripen", 'timing'),
+    ("has the pre-monsoon season become warmer", 'climate'),
+    ("how much has rainfall changed", 'climate'),
+    ("temperature trend in karnataka since 2019", 'climate'),
+    ("who relies on mango", 'downstream'),
+    ("if curry leaf shifts, which species suffer", 'downstream'),
+    ("food web knock-on effects of lantana timing", 'downstream'),
+    ("what method do you use to find mismatches", 'how_it_works'),
+    ("how are the results computed", 'how_it_works'),
+    ("where was the purple-rumped sunbird seen in march", FALLBACK_INTENT),
+    ("observations near mysore", FALLBACK_INTENT),
+    ("koel records from bangalore gardens", FALLBACK_INTENT),
+    ("latest sighting of asian honey bee near hassan", FALLBACK_INTENT),
+    ("hello", FALLBACK_INTENT),
+    ("what is the capital of france", FALLBACK_INTENT),
+]
+
+# Provisional: not yet swept with the production model (sentence-transformers
+# is not available in every environment). Re-run this module's __main__ and
+# set this to its recommended threshold whenever the model or prototypes change.
+DEFAULT_THRESHOLD = 0.45
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class IntentRouter:
+    """Nearest-prototype intent classifier over precomputed embeddings"""
+
+    def __init__(self, embedder, prototypes=INTENT_PROTOTYPES, threshold=DEFAULT_THRESHOLD):
+        self.intents = list(prototypes)
+        self.threshold = threshold
+
+        utterances = [u for intent in self.intents for u in prototypes[intent]]
+        self.labels = np.repeat(np.arange(len(self.intents)), [len(prototypes[i]) for i in self.intents])
+        self.matrix = _normalize(embedder.encode(utterances))
+
+        # Start offset of each intent's block of rows, for per-intent max
+        self._offsets = np.concatenate([[0], np.cumsum([len(prototypes[i]) for i in self.intents])[:-1]])
+
+    def scores(self, query_vector):
+        """Best prototype similarity per intent"""
+        similarities = self.matrix @ _normalize(query_vector)
+        return np.maximum.reduceat(similarities, self._offsets)
+
+    def route(self, query_vector):
+        """Return (intent, score); falls back to 'search' below the threshold"""
+        scores = self.scores(query_vector)
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            return FALLBACK_INTENT, float(scores[best])
+        return self.intents[best], float(scores[best])
+
+
+def routing_accuracy(router, query_vectors, expected, threshold=None):
+    """Share of queries routed to their expected intent, and the (index, routed) misses"""
+    saved = router.threshold
+    router.threshold = saved if threshold is None else threshold
+    try:
+        routed = [router.route(vector)[0] for vector in query_vectors]
+    finally:
+        router.threshold = saved
+    misses = [(i, intent) for i, intent in enumerate(routed) if intent != expected[i]]
+    return 1 - len(misses) / max(len(expected), 1), misses
+
+
+def choose_threshold(router, query_vectors, expected, candidates=None):
+    """
+    (threshold, accuracy) maximizing routing accuracy; among equally
+    accurate thresholds the middle one is taken, for margin on both sides.
+    """
+    candidates = np.round(np.arange(0.20, 0.81, 0.025), 3) if candidates is None else np.asarray(candidates)
+    accuracy = np.array([routing_accuracy(router, query_vectors, expected, t)[0] for t in candidates])
+    best = np.flatnonzero(accuracy == accuracy.max())
+    return float(candidates[best[len(best) // 2]]), float(accuracy.max())
+
+
+if __name__ == "__main__":
+    from embedders import get_embedder
+
+    print("🧭 INTENT ROUTING ACCURACY")
+    print("="*70)
+
+    embedder = get_embedder()
+    router = IntentRouter(embedder)
+    queries, expected = zip(*ROUTING_EXAMPLES)
+    vectors = _normalize(embedder.encode(list(queries)))
+
+    print(f"\n  {len(queries)} labeled queries ({sum(e == FALLBACK_INTENT for e in expected)} expect the search fallback)")
+    print(f"\n  {'Threshold':>9} {'Accuracy':>9}")
+    for threshold in np.round(np.arange(0.20, 0.81, 0.05), 2):
+        print(f"  {threshold:>9.2f} {routing_accuracy(router, vectors, expected, threshold)[0]:>9.0%}")
+
+    threshold, accuracy = choose_threshold(router, vectors, expected)
+    current, misses = routing_accuracy(router, vectors, expected)
+    print(f"\n  DEFAULT_THRESHOLD {DEFAULT_THRESHOLD:.3f}: {current:.0%}; recommended {threshold:.3f}: {accuracy:.0%}")
+    for i, routed in misses:
+        print(f"  ❌ {queries[i]!r}: expected {expected[i]}, routed {routed}")
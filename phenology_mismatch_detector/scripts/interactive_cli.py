@@ -1,8 +1,29 @@
+import io
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
-import pandas as pd
+from embedders import get_embedder
 from datetime import datetime, timedelta
+from climate_drivers import load_climate_drivers, describe_driver
+from climate_features import load_feature_store
+from mismatch_ranking import MismatchRankings
+from relationship_graph import RelationshipGraph
+from species_catalog import SPECIES_INFO
+from doy_sketch import DoySketches
+from window_analysis import BASELINE_YEARS, CURRENT_YEARS, YearlyHistograms, format_years
+from climate_trends import climate_summary
+from intent_router import IntentRouter, INTENT_PROTOTYPES
+from embedding_cache import EmbeddingCache
+from entity_extractor import EntityExtractor, entities_to_filter
+from hybrid_search import hybrid_search
+from payload_schema import COMMON_CODES, TIMING_FIELDS, LISTING_FIELDS, load_place_table, decode_observation
+from circular_stats import circular_mean, circular_median, circular_distance, circular_sd_days
 
 print("""
 ╔══════════════════════════════════════════════════════════════════╗
@@ -17,80 +38,92 @@ print("""
 
 
 client = QdrantClient("localhost", port=6333)
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+embedder = get_embedder()
+
+# Fixed retrieval prompts used by the intents (species lookups use exact payload filters)
+CONSTANT_TEXTS = ["all species shifts"]
+
+# Batch queries mostly wait on Qdrant round trips, so threads overlap well
+DEFAULT_BATCH_WORKERS = 8
 
 class EcoSyncAgent:
     
     
     def __init__(self):
         self.client = client
-        self.embedder = embedder
+        self.embedder = EmbeddingCache(embedder)
+        self.climate_drivers = load_climate_drivers()
+        self.climate_features = load_feature_store()
+        self.rankings = MismatchRankings()
+        self.graph = RelationshipGraph()
+        self.exposure = self.graph.exposure_table(self.rankings.table) if not self.rankings.table.empty else None
+        sketches = DoySketches.load()
+        self.windows = YearlyHistograms.from_sketches(sketches) if len(sketches) else None
+        
+        # Encode every constant string (species names, fixed prompts, intent
+        # prototypes) in one batch so a turn only needs to encode the query
+        self.embedder.prefetch(
+            CONSTANT_TEXTS + [u for utterances in INTENT_PROTOTYPES.values() for u in utterances]
+        )
+        self.router = IntentRouter(self.embedder)
+        self.extractor = EntityExtractor()
+        self.places = load_place_table()
         print("✅ EcoSync Agent initialized with 3,882 observations\n")
     
-    def query(self, user_input):
-        """Main intelligent query handler"""
-        
-        user_lower = user_input.lower()
-        
-        # Intelligent routing based on query intent
-        if any(word in user_lower for word in ['why', 'explain', 'reason', 'cause']):
-            # Explanation queries
-            if any(word in user_lower for word in ['fail', 'crop', 'mango', 'pollination']):
-                self.explain_crop_failure()
-            elif any(word in user_lower for word in ['butterfly', 'decline', 'population']):
-                self.explain_butterfly_decline()
-            elif any(word in user_lower for word in ['mismatch', 'gap', 'timing']):
-                self.explain_general_mismatch()
-            else:
-                self.explain_general_mismatch()
-        
-        elif any(word in user_lower for word in ['show', 'what', 'list', 'top']):
-            
-            if 'mismatch' in user_lower:
-                self.show_top_mismatches()
-            elif 'shift' in user_lower:
-                self.show_phenological_shifts()
-            elif 'species' in user_lower:
-                self.list_species()
-            else:
-                self.show_overview()
-        
-        elif any(word in user_lower for word in ['when', 'timing', 'appear', 'emerge', 'flower']):
-            
-            self.answer_timing_query(user_input)
-        
-        elif 'climate' in user_lower or 'temperature' in user_lower or 'warming' in user_lower:
-            
-            self.explain_climate_trends()
-        
-        elif 'how' in user_lower:
-            
-            if 'work' in user_lower or 'detect' in user_lower:
-                self.explain_how_system_works()
-            else:
-                self.explain_general_mismatch()
-        
-        else:
-            
-            self.general_search(user_input)
+    def query(self, user_input, trace=None):
+        """Main intelligent query handler; trace (a dict) receives the routing details"""
+        
+        self.embedder.begin_turn()
+        
+        # One embedding per query: used for routing and reused for retrieval
+        query_vector = self.embedder.encode(user_input)
+        intent, score = self.router.route(query_vector)
+        
+        entities = self.extractor.extract(user_input)
+        year = max(entities['years']) if entities['years'] else (self.rankings.latest_year or 2024)
+        
+        handlers = {
+            'crop_failure': lambda: self.explain_crop_failure(year),
+            'butterfly_decline': lambda: self.explain_butterfly_decline(year),
+            'general_mismatch': self.explain_general_mismatch,
+            'top_mismatches': self.show_top_mismatches,
+            'shifts': lambda: self.show_phenological_shifts(entities),
+            'list_species': self.list_species,
+            'overview': self.show_overview,
+            'downstream': lambda: self.answer_downstream(entities, year),
+            'climate': self.explain_climate_trends,
+            'how_it_works': self.explain_how_system_works,
+            'timing': lambda: self.answer_timing_query(user_input, query_vector, entities),
+            'search': lambda: self.general_search(user_input, query_vector),
+        }
+        
+        if trace is not None:
+            trace.update({'intent': intent, 'route_score': float(score), 'entities': entities, 'year': year})
+        
+        handlers[intent]()
+        return intent
     
-    def explain_crop_failure(self):
+    def explain_crop_failure(self, year=2024):
         """Full explanation of mango crop failure"""
         
         print("\n" + "="*70)
-        print("🌾 EXPLAINING: Why Mango Crops Are Failing in Karnataka")
+        print(f"🌾 EXPLAINING: Why Mango Crops Are Failing in Karnataka ({year})")
         print("="*70 + "\n")
         
        
         print("🔍 Searching vector database...\n")
         
-        bee_obs = self.get_observations("Giant Honey Bee", 2024)
-        mango_obs = self.get_observations("Mango", 2024)
-        climate = self.get_climate_data(2024, "pre_monsoon")
+        bee_obs = self.get_observations("Giant Honey Bee", year)
+        mango_obs = self.get_observations("Mango", year)
+        pre_monsoon = climate_summary(self.climate_features)['seasonal']['temperature_anomaly']['pre_monsoon']
+        
+        if not bee_obs or not mango_obs:
+            print(f"⚠️  No bee or mango observations for {year}.\n")
+            return
         
-        bee_median = pd.Series([b.payload['day_of_year'] for b in bee_obs]).median()
-        mango_median = pd.Series([m.payload['day_of_year'] for m in mango_obs]).median()
-        gap = bee_median - mango_median
+        bee_median = circular_median([b.payload['day_of_year'] for b in bee_obs])
+        mango_median = circular_median([m.payload['day_of_year'] for m in mango_obs])
+        gap = float(circular_distance(bee_median, mango_median))
         
         
         print("💡 ANALYSIS & EXPLANATION:\n")
@@ -100,22 +133,25 @@ class EcoSyncAgent:
         print(f"bee pollinator activity.\n")
         
         print(f"📊 THE MISMATCH:\n")
-        print(f"  • Mango trees flower around Day {mango_median:.0f} ({self.doy_to_date(mango_median)})")
-        print(f"  • Giant Honey Bees become active around Day {bee_median:.0f} ({self.doy_to_date(bee_median)})")
+        print(f"  • Mango trees flower around Day {mango_median:.0f} ({self.doy_to_date(mango_median, year)})")
+        print(f"  • Giant Honey Bees become active around Day {bee_median:.0f} ({self.doy_to_date(bee_median, year)})")
         print(f"  • Temporal gap: {gap:.0f} days\n")
         
         print(f"🔗 WHY THIS HAPPENED:\n")
         print(f"  1. CLIMATE WARMING:")
-        if climate:
-            temp_anom = climate[0].payload.get('temperature_anomaly', 0)
-            print(f"     Pre-monsoon temperatures are {temp_anom:+.2f}°C above baseline.")
-        print(f"     Warming has advanced spring by approximately 10 days.\n")
+        if year in pre_monsoon.index:
+            print(f"     Pre-monsoon {year} temperatures are {pre_monsoon[year]:+.2f}°C vs baseline.")
+        advance = self.climate_features.gdd_advance(year, reference_doy=90)
+        if advance is not None:
+            timing = f"{abs(advance)} days {'earlier' if advance >= 0 else 'later'} than"
+            print(f"     Heat accumulation reached its 2019-2020 end-of-March level {timing} baseline.")
+        print()
         
         print(f"  2. DIFFERENTIAL SPECIES RESPONSES:")
-        print(f"     • Mango trees respond DIRECTLY to temperature")
-        print(f"       → Flowering triggered by warmth → Shifted earlier")
-        print(f"     • Giant Honey Bees respond to PHOTOPERIOD (day length)")
-        print(f"       → Day length unchanged → Minimal shift\n")
+        for species in ["Mango", "Giant Honey Bee"]:
+            driver = describe_driver(self.climate_drivers, species)
+            print(f"     • {species}: {driver or 'no significant climate driver in the data'}")
+        print()
         
         print(f"  3. RESULT:")
         print(f"     Bees arrive {gap:.0f} days AFTER mango flowers have peaked.")
@@ -140,28 +176,28 @@ class EcoSyncAgent:
         print(f"  • NASA POWER climate data")
         print(f"  • All retrieved from Qdrant vector database\n")
     
-    def explain_butterfly_decline(self):
+    def explain_butterfly_decline(self, year=2024):
         """Explain butterfly population decline"""
         
         print("\n" + "="*70)
-        print("🦋 EXPLAINING: Why Butterfly Populations Are Declining")
+        print(f"🦋 EXPLAINING: Why Butterfly Populations Are Declining ({year})")
         print("="*70 + "\n")
         
-        butterfly_obs = self.get_observations("Common Mormon", 2024)
-        plant_obs = self.get_observations("Curry Leaf", 2024)
+        butterfly_obs = self.get_observations("Common Mormon", year)
+        plant_obs = self.get_observations("Curry Leaf", year)
         
         if butterfly_obs and plant_obs:
-            butterfly_median = pd.Series([b.payload['day_of_year'] for b in butterfly_obs]).median()
-            plant_median = pd.Series([p.payload['day_of_year'] for p in plant_obs]).median()
-            gap = butterfly_median - plant_median
+            butterfly_median = circular_median([b.payload['day_of_year'] for b in butterfly_obs])
+            plant_median = circular_median([p.payload['day_of_year'] for p in plant_obs])
+            gap = float(circular_distance(butterfly_median, plant_median))
             
             print("💡 ANALYSIS & EXPLANATION:\n")
             print(f"Common Mormon butterflies are experiencing population decline due to")
             print(f"a severe mismatch with their host plant, Curry Leaf.\n")
             
             print(f"📊 THE PROBLEM:\n")
-            print(f"  • Curry Leaf flushes fresh leaves: Day {plant_median:.0f} ({self.doy_to_date(plant_median)})")
-            print(f"  • Butterfly larvae hatch: Day {butterfly_median:.0f} ({self.doy_to_date(butterfly_median)})")
+            print(f"  • Curry Leaf flushes fresh leaves: Day {plant_median:.0f} ({self.doy_to_date(plant_median, year)})")
+            print(f"  • Butterfly larvae hatch: Day {butterfly_median:.0f} ({self.doy_to_date(butterfly_median, year)})")
             print(f"  • Gap: {gap:.0f} days\n")
             
             print(f"🔗 WHY THIS MATTERS:\n")
@@ -174,7 +210,12 @@ class EcoSyncAgent:
             print(f"⚡ ECOLOGICAL IMPACT:")
             print(f"  • Larval survival rate: <20% (vs 80% historically)")
             print(f"  • Adult butterfly populations declining")
-            print(f"  • Cascading effects on birds that eat caterpillars\n")
+            downstream = self.graph.downstream("Common Mormon")
+            for d in downstream:
+                print(f"  • Cascading effects on {d['species']} ({d['hops']} step(s) up the food chain)")
+            if not downstream:
+                print(f"  • Cascading effects on birds that eat caterpillars")
+            print()
         else:
             print("⚠️  Insufficient data for detailed analysis, but pattern is clear:\n")
             print("Plants respond faster to warming → Shift earlier")
@@ -201,20 +242,9 @@ class EcoSyncAgent:
         
         print("📊 WHAT I DETECTED IN KARNATAKA:\n")
         
-        patterns = self.client.query_points(
-            collection_name='temporal_patterns',
-            query=self.embedder.encode("phenological shifts").tolist(),
-            limit=10
-        ).points
-        
         print("  Top Mismatches:")
-        mismatches = [
-            ("Common Mormon", "Curry Leaf", 127),
-            ("Giant Honey Bee", "Mango", 22),
-        ]
-        
-        for sp1, sp2, gap in mismatches:
-            print(f"  • {sp1} ↔ {sp2}: {gap}-day gap")
+        for m in self.rankings.top(n=3):
+            print(f"  • {m['consumer']} ↔ {m['resource']}: {abs(m['gap_days']):.0f}-day gap ({m['severity']})")
         
         print(f"\n⚡ IMPACTS:")
         print(f"  • Agricultural crop failures (mango, others)")
@@ -225,42 +255,38 @@ class EcoSyncAgent:
     def show_top_mismatches(self):
         
         print("\n" + "="*70)
-        print("🔝 TOP PHENOLOGICAL MISMATCHES IN 2024")
+        print(f"🔝 TOP PHENOLOGICAL MISMATCHES IN {self.rankings.latest_year}")
         print("="*70 + "\n")
         
-        mismatches = [
-            {
-                'pair': 'Common Mormon ↔ Curry Leaf',
-                'gap': 127,
-                'severity': 'SEVERE',
-                'impact': 'Butterfly larvae miss fresh leaf flush → Population decline'
-            },
-            {
-                'pair': 'Giant Honey Bee ↔ Mango',
-                'gap': 22,
-                'severity': 'SEVERE',
-                'impact': 'Bees miss flower peak → Crop pollination failure (30-50% loss)'
-            },
-        ]
+        mismatches = self.rankings.top()
+        if not mismatches:
+            print("⚠️  No mismatch rankings yet - run ingest_to_qdrant.py\n")
+            return
         
         for i, m in enumerate(mismatches, 1):
-            print(f"{i}. {m['pair']}")
-            print(f"   Temporal Gap: {m['gap']} days")
+            order = "after" if m['gap_days'] > 0 else "before"
+            print(f"{i}. {m['consumer']} ↔ {m['resource']}")
+            print(f"   Temporal Gap: {abs(m['gap_days']):.0f} days ({m['consumer']} peaks {order} {m['resource']})")
+            print(f"   Activity Overlap: {m['overlap']:.0%}")
             print(f"   Severity: {m['severity']}")
             print(f"   Impact: {m['impact']}")
             print()
     
-    def show_phenological_shifts(self):
+    def show_phenological_shifts(self, entities=None):
         
+        years = sorted(entities['years']) if entities else []
+        if len(years) >= 2 and self.windows is not None:
+            return self.show_window_shifts((years[0], years[0]), (years[-1], years[-1]))
         
         print("\n" + "="*70)
-        print("📊 PHENOLOGICAL SHIFTS (2019-2020 → 2022-2024)")
+        print(f"📊 PHENOLOGICAL SHIFTS ({format_years(BASELINE_YEARS)} → {format_years(CURRENT_YEARS)})")
         print("="*70 + "\n")
         
         patterns = self.client.query_points(
             collection_name='temporal_patterns',
             query=self.embedder.encode("all species shifts").tolist(),
-            limit=15
+            limit=15,
+            with_payload=['species', 'species_type', 'shift_days']
         ).points
         
         print("🌿 PLANTS (Temperature-responsive):\n")
@@ -281,42 +307,117 @@ class EcoSyncAgent:
         print(f"\n💡 KEY INSIGHT:")
         print(f"Plants shifting MUCH more than animals → Growing mismatches\n")
     
-    def answer_timing_query(self, query):
+    def show_window_shifts(self, baseline, current):
+        """Shifts between any two year windows, from the ingest-time DOY sketches"""
+        
+        print("\n" + "="*70)
+        print(f"📊 PHENOLOGICAL SHIFTS ({format_years(baseline)} → {format_years(current)})")
+        print("="*70 + "\n")
+        
+        missing = [format_years(years) for years in (baseline, current) if not self.windows.covers(years)]
+        if missing:
+            print(f"⚠️  No observations for {' or '.join(missing)} - data covers "
+                  f"{self.windows.first_year}-{self.windows.last_year}\n")
+            return
+        
+        table = self.windows.compare(baseline, current)
+        trends = self.windows.shift_trend().set_index('species_key')['trend_days_per_year']
+        table = table[(table['baseline_n'] > 0) & (table['current_n'] > 0)]
+        for species_key, r in table.reindex(table['shift_days'].abs().sort_values(ascending=False).index).iterrows():
+            direction = "earlier" if r['shift_days'] < 0 else "later"
+            print(f"  • {SPECIES_INFO[species_key]['common']:24} {abs(r['shift_days']):>6.1f} days {direction}  "
+                  f"(median DOY {r['baseline_median_doy']:.0f} → {r['current_median_doy']:.0f}, "
+                  f"trend {trends[species_key]:+.1f} days/year)")
+        
+        print(f"\n  Year-by-year trend: least-squares slope of each year's median, "
+              f"{self.windows.first_year}-{self.windows.last_year}\n")
+    
+    def answer_timing_query(self, query, query_vector=None, entities=None):
        
         
         print(f"\n🔍 Searching for timing information...\n")
         
-        # Semantic search
-        results = self.client.query_points(
-            collection_name='observations',
-            query=self.embedder.encode(query).tolist(),
-            limit=50
-        ).points
+        if entities is None:
+            entities = self.extractor.extract(query)
+        # The season is the answer to a timing question, so never filter on month
+        query_filter = entities_to_filter(entities, months=False)
+        
+        if entities['species'] or entities['species_types']:
+            # Exact payload filter: every matching observation, no semantic guessing
+            results = self.scroll_observations(query_filter, with_payload=LISTING_FIELDS)
+        else:
+            if query_vector is None:
+                query_vector = self.embedder.encode(query)
+            results = self.client.query_points(
+                collection_name='observations',
+                query=query_vector.tolist(),
+                limit=50,
+                query_filter=query_filter,
+                with_payload=LISTING_FIELDS
+            ).points
         
         if not results:
             print("⚠️  No observations found for that query.\n")
             return
         
-        species = results[0].payload.get('species_common', 'Unknown species')
-        doys = [r.payload['day_of_year'] for r in results if 'day_of_year' in r.payload]
+        by_species = {}
+        for r in results:
+            observation = decode_observation(r.payload, self.places)
+            by_species.setdefault(observation.get('species_common', 'Unknown species'), []).append(observation)
         
-        if doys:
-            median_doy = pd.Series(doys).median()
+        for species, observations in sorted(by_species.items(), key=lambda item: -len(item[1])):
+            doys = [o['day_of_year'] for o in observations]
+            median_doy = circular_median(doys)
+            _, resultant = circular_mean(doys)
             min_doy = min(doys)
             max_doy = max(doys)
             
             print(f"📊 TIMING ANALYSIS FOR {species.upper()}:\n")
-            print(f"  Based on {len(results)} observations:\n")
+            print(f"  Based on {len(observations)} observations:\n")
             print(f"  • Typical timing: Day {median_doy:.0f} ({self.doy_to_date(median_doy)})")
+            print(f"  • Spread: ±{circular_sd_days(resultant):.0f} days")
             print(f"  • Earliest: Day {min_doy} ({self.doy_to_date(min_doy)})")
             print(f"  • Latest: Day {max_doy} ({self.doy_to_date(max_doy)})")
             print(f"  • Range: {max_doy - min_doy} days\n")
             
             print(f"📍 Recent observations:")
-            for r in results[:3]:
-                date = r.payload.get('observed_date', 'Unknown')[:10]
-                place = r.payload.get('place', 'Karnataka')
-                print(f"  • {date} - {place[:50]}")
+            recent = sorted(observations, key=lambda o: o['date'], reverse=True)
+            for o in recent[:3]:
+                print(f"  • {o['observed_date']} - {o['place'][:50]}")
+            print()
+    
+    def answer_downstream(self, entities, year=2024):
+        """Species exposed through the food web: downstream of a named species, or ranked"""
+        
+        print("\n" + "="*70)
+        print(f"🕸️  FOOD-WEB EXPOSURE ({year})")
+        print("="*70 + "\n")
+        
+        if self.exposure is None:
+            print("⚠️  No mismatch rankings yet - run ingest_to_qdrant.py\n")
+            return
+        
+        exposure = self.exposure[self.exposure['year'] == year].set_index('species')
+        named = [s for s in entities['species'] if s in self.graph.index]
+        
+        for species in named:
+            affected = self.graph.downstream(species)
+            if not affected:
+                print(f"  Nothing in the catalog depends on {species}.\n")
+                continue
+            print(f"  If {species} timing shifts, these species are exposed:\n")
+            for d in affected:
+                total = exposure['exposure'].get(d['species'], 0.0)
+                print(f"  • {d['species']:24} {d['hops']} step(s) away, dependence {d['dependence']:.0%}, "
+                      f"exposure {total:.2f}")
+            print()
+        
+        if not named:
+            print("  Mismatch exposure (direct + inherited from the species each one depends on):\n")
+            print(f"  {'Species':24} {'Direct':>7} {'Inherited':>10} {'Total':>7}")
+            for species, r in exposure.sort_values('exposure', ascending=False).iterrows():
+                if r['exposure'] > 0:
+                    print(f"  {species:24} {r['direct']:>7.2f} {r['inherited']:>10.2f} {r['exposure']:>7.2f}")
             print()
     
     def explain_climate_trends(self):
@@ -326,28 +427,28 @@ class EcoSyncAgent:
         print("🌡️ CLIMATE TRENDS IN KARNATAKA")
         print("="*70 + "\n")
         
-        climate = self.client.query_points(
-            collection_name='climate_data',
-            query=self.embedder.encode("temperature trends").tolist(),
-            limit=30
-        ).points
-        
-        # Group by year
-        years = {}
-        for c in climate:
-            year = c.payload['year']
-            if year not in years:
-                years[year] = []
-            years[year].append(c.payload.get('temperature_anomaly', 0))
+        summary = climate_summary(self.climate_features)
+        yearly = summary['yearly']
+        pre_monsoon = summary['seasonal']['temperature_anomaly']['pre_monsoon']
+        extremes = summary['extremes']
         
-        print("📊 TEMPERATURE ANOMALIES (vs 2019-2020 baseline):\n")
-        for year in sorted(years.keys()):
-            avg_anom = sum(years[year]) / len(years[year])
-            print(f"  {year}: {avg_anom:+.2f}°C")
+        print("📊 TEMPERATURE ANOMALIES (vs 2019-2020 baseline, all daily records):\n")
+        print(f"  {'Year':6} {'Annual':>8} {'Pre-monsoon':>12} {'Rain (mm)':>10} {'Hottest day':>20} {'Heat days':>10}")
+        for year in yearly.index:
+            print(f"  {year:<6} {yearly.loc[year, 'temperature_anomaly']:>+7.2f}° {pre_monsoon.get(year, float('nan')):>+11.2f}° "
+                  f"{yearly.loc[year, 'rainfall_mm']:>10.0f} "
+                  f"{extremes.loc[year, 'hottest_tmax']:>7.1f}°C ({extremes.loc[year, 'hottest_date']:%b %d}) "
+                  f"{extremes.loc[year, 'heat_stress_days']:>10.0f}")
         
+        slope, low, high = summary['trend']
         print(f"\n💡 TREND:")
-        print(f"Progressive warming observed, especially in pre-monsoon months.")
-        print(f"This warming is driving the phenological shifts we detect.\n")
+        print(f"Annual anomaly trend: {slope:+.3f}°C/year (95% CI {low:+.3f} to {high:+.3f}).")
+        if low > 0:
+            print(f"Warming is statistically clear over {len(yearly)} years of daily data.\n")
+        elif high < 0:
+            print(f"Cooling is statistically clear over {len(yearly)} years of daily data.\n")
+        else:
+            print(f"No statistically clear trend over {len(yearly)} years; year-to-year swings dominate.\n")
     
     def explain_how_system_works(self):
        
@@ -406,28 +507,30 @@ class EcoSyncAgent:
             count = self.client.get_collection(coll).points_count
             print(f"  • {coll}: {count:,} points")
         
-        print(f"\nKey Findings:")
-        print(f"  • 2 SEVERE mismatches detected")
+        counts = self.rankings.severity_counts()
+        print(f"\nKey Findings ({self.rankings.latest_year}):")
+        print(f"  • {counts.get('SEVERE', 0)} SEVERE, {counts.get('MODERATE', 0)} MODERATE mismatches detected")
         print(f"  • Agricultural impact: Mango crop failure")
         print(f"  • Biodiversity impact: Butterfly decline")
         print(f"  • Climate driver: Pre-monsoon warming\n")
     
-    def general_search(self, query):
+    def general_search(self, query, query_vector=None):
         
         
         print(f"\n🔍 Searching for: '{query}'\n")
         
-        results = self.client.query_points(
-            collection_name='observations',
-            query=self.embedder.encode(query).tolist(),
-            limit=5
-        ).points
+        if query_vector is None:
+            query_vector = self.embedder.encode(query)
+        
+        # Dense similarity fused with BM25 so place and scientific names match exactly
+        results = hybrid_search(self.client, query, query_vector, limit=5, with_payload=LISTING_FIELDS)
         
         if results:
             print(f"Found {len(results)} relevant observations:\n")
             for i, r in enumerate(results, 1):
-                print(f"{i}. {r.payload.get('species_common')} - {r.payload.get('observed_date', '')[:10]}")
-                print(f"   {r.payload.get('place', 'Karnataka')[:60]}")
+                observation = decode_observation(r.payload, self.places)
+                print(f"{i}. {observation['species_common']} - {observation['observed_date']}")
+                print(f"   {observation['place'][:60]}")
                 print()
         else:
             print("No results found. Try asking about:")
@@ -437,15 +540,26 @@ class EcoSyncAgent:
     
     
     def get_observations(self, species, year):
-        return self.client.query_points(
-            collection_name='observations',
-            query=self.embedder.encode(species).tolist(),
-            limit=200,
-            query_filter=Filter(must=[
-                FieldCondition(key="species_common", match=MatchValue(value=species)),
-                FieldCondition(key="year", match=MatchValue(value=year))
-            ])
-        ).points
+        return self.scroll_observations(Filter(must=[
+            FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES[species])),
+            FieldCondition(key="year", match=MatchValue(value=year))
+        ]), with_payload=TIMING_FIELDS)
+    
+    def scroll_observations(self, query_filter, with_payload=True, batch_size=1000):
+        """Every observation matching an exact payload filter"""
+        points, offset = [], None
+        while True:
+            batch, offset = self.client.scroll(
+                collection_name='observations',
+                scroll_filter=query_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=with_payload,
+                with_vectors=False
+            )
+            points.extend(batch)
+            if offset is None:
+                return points
     
     def get_climate_data(self, year, season):
         return self.client.query_points(
@@ -455,7 +569,8 @@ class EcoSyncAgent:
             query_filter=Filter(must=[
                 FieldCondition(key="year", match=MatchValue(value=year)),
                 FieldCondition(key="season", match=MatchValue(value=season))
-            ])
+            ]),
+            with_payload=['year', 'month', 'temperature_anomaly', 'rainfall_mm']
         ).points
     
     def doy_to_date(self, doy, year=2024):
@@ -463,6 +578,109 @@ class EcoSyncAgent:
 
 
 
+class ThreadLocalStdout:
+    """sys.stdout stand-in that routes each capturing thread's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def capture(self):
+        self._local.buffer = io.StringIO()
+    
+    def release(self):
+        buffer, self._local.buffer = getattr(self._local, 'buffer', None), None
+        return buffer.getvalue() if buffer is not None else ''
+    
+    def write(self, text):
+        buffer = getattr(self._local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def load_batch_queries(path):
+    """One query per line; blank lines and # comments are skipped"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+def run_batch(agent, queries, workers=DEFAULT_BATCH_WORKERS):
+    """
+    Answer queries concurrently with one shared agent (warm model, cache and
+    Qdrant client). Each result holds the routed intent, entities, captured
+    answer text, wall time and model calls for that query, in input order.
+    """
+    stdout = ThreadLocalStdout(sys.stdout)
+    
+    def run_one(item):
+        index, text = item
+        trace = {'index': index, 'query': text}
+        stdout.capture()
+        start = time.perf_counter()
+        try:
+            agent.query(text, trace=trace)
+        except Exception as e:
+            trace['error'] = f"{type(e).__name__}: {e}"
+        trace['elapsed_ms'] = (time.perf_counter() - start) * 1000
+        trace['model_calls'] = agent.embedder.turn_calls
+        trace['output'] = stdout.release()
+        return trace
+    
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(run_one, enumerate(queries)))
+    finally:
+        sys.stdout = stdout.stream
+
+
+def batch_main(batch_path, out_path=None, workers=DEFAULT_BATCH_WORKERS):
+    """Run a file of queries and write structured JSON results plus a timing summary"""
+    queries = load_batch_queries(batch_path)
+    out_path = out_path or os.path.splitext(batch_path)[0] + '_results.json'
+    agent = EcoSyncAgent()
+    
+    print(f"📋 Running {len(queries):,} queries from {batch_path} with {workers} workers...")
+    calls_before = agent.embedder.total_calls
+    start = time.perf_counter()
+    results = run_batch(agent, queries, workers)
+    wall = time.perf_counter() - start
+    
+    latencies = [r['elapsed_ms'] for r in results]
+    report = {
+        'source': batch_path,
+        'queries': len(queries),
+        'workers': workers,
+        'wall_s': wall,
+        'queries_per_s': len(queries) / wall if wall else None,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)) if latencies else None,
+            'p95': float(np.percentile(latencies, 95)) if latencies else None,
+            'max': max(latencies, default=None)
+        },
+        'model_calls': agent.embedder.total_calls - calls_before,
+        'errors': sum('error' in r for r in results),
+        'results': results
+    }
+    with open(out_path, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    
+    intents = {}
+    for r in results:
+        intents[r.get('intent', 'error')] = intents.get(r.get('intent', 'error'), 0) + 1
+    print(f"  ✅ {len(queries):,} queries in {wall:.2f}s ({report['queries_per_s'] or 0:.1f}/s), "
+          f"p50 {report['latency_ms']['p50'] or 0:.0f} ms, p95 {report['latency_ms']['p95'] or 0:.0f} ms, "
+          f"{report['model_calls']} model calls, {report['errors']} errors")
+    print(f"  🧭 Intents: " + ', '.join(f"{k} {v}" for k, v in sorted(intents.items(), key=lambda kv: -kv[1])))
+    print(f"  💾 Results → {out_path}")
+    return report
+
+
 def main():
     agent = EcoSyncAgent()
     
@@ -474,7 +692,9 @@ def main():
     print("   • 'Explain butterfly population decline'")
     print("   • 'Show me the top mismatches'")
     print("   • 'What are the phenological shifts?'")
+    print("   • 'How did timing shift between 2019 and 2023?'")
     print("   • 'When do Giant Honey Bees appear?'")
+    print("   • 'Which species depend on curry leaf?'")
     print("   • 'Explain climate warming trends'")
     print("   • 'How does this system work?'")
     print("   • 'List all species'")
@@ -493,10 +713,23 @@ def main():
         
         try:
             agent.query(user_input)
+            print(f"🔢 Model calls this turn: {agent.embedder.turn_calls}")
             print("\n" + "-"*70 + "\n")
         except Exception as e:
             print(f"\n⚠️  Error: {e}")
             print("Try rephrasing your question.\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="EcoSync agent: interactive, or batch with --batch")
+    parser.add_argument('--batch', default=None, help="file of queries, one per line")
+    parser.add_argument('--out', default=None, help="JSON results path (default: <batch>_results.json)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_BATCH_WORKERS,
+                        help="queries answered concurrently in batch mode")
+    args = parser.parse_args()
+    
+    if args.batch:
+        batch_main(args.batch, args.out, args.workers)
+    else:
+        main()
\ No newline at end of file
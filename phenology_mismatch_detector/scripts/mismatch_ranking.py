@@ -0,0 +1,213 @@
+"""
+Materialized ranking of consumer-resource mismatches
+
+Recomputes the timing gap and activity overlap for every relationship in
+species_catalog and every year, and stores the ranked result as a small
+table (data/processed/mismatch_rankings.csv). Per species/year timing and
+activity curves are cached with a content fingerprint, so a refresh only
+recomputes the species whose observations changed. A relationship's
+ranked rows are reused only while its record (types, relationship,
+description) and RANKING_VERSION are unchanged; bump the version whenever
+the ranking or activity-curve computation changes.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from activity_curves import build_activity_curves
+from circular_stats import circular_summary, circular_distance, YEAR_DAYS
+from species_catalog import COMMON_TO_KEY, SPECIES_RELATIONSHIPS
+
+RANKINGS_PATH = 'data/processed/mismatch_rankings.csv'
+TIMING_CACHE_PATH = 'data/processed/timing_cache.npz'
+MIN_OBS = 5
+RANKING_VERSION = 1
+
+
+def severity_label(gap_days):
+    gap = abs(gap_days)
+    if gap > 20:
+        return 'SEVERE'
+    elif gap > 10:
+        return 'MODERATE'
+    return 'LOW'
+
+
+def species_year_fingerprints(df):
+    """Content fingerprint and size of every (species_key, year) group"""
+    row_hash = pd.util.hash_pandas_object(
+        df[['observation_id', 'day_of_year']], index=False
+    ).to_numpy()
+    grouped = pd.DataFrame({
+        'species_key': df['species_key'].to_numpy(),
+        'year': df['year'].to_numpy(dtype=int),
+        'row_hash': row_hash
+    }).groupby(['species_key', 'year'])['row_hash']
+
+    # Sum of row hashes (mod 2**64) is order independent
+    return pd.DataFrame({'fingerprint': grouped.sum().astype(np.uint64), 'n': grouped.size()})
+
+
+def relationship_key(rel):
+    """Fingerprint of a relationship record and the ranking parameters its rows depend on"""
+    record = json.dumps({'record': dict(rel), 'version': RANKING_VERSION, 'min_obs': MIN_OBS}, sort_keys=True)
+    return hashlib.sha1(record.encode()).hexdigest()
+
+
+def load_timing_cache(path=TIMING_CACHE_PATH):
+    if not os.path.exists(path):
+        return {}
+
+    data = np.load(path)
+    # Caches from another ranking version hold curves computed differently
+    if 'version' not in data or int(data['version']) != RANKING_VERSION:
+        return {}
+    return {
+        (str(sp), int(yr)): {'fingerprint': np.uint64(fp), 'n': int(n), 'median_doy': float(med), 'curve': curve}
+        for sp, yr, fp, n, med, curve in zip(
+            data['species_key'], data['year'], data['fingerprint'], data['n'], data['median_doy'], data['curves']
+        )
+    }
+
+
+def save_timing_cache(cache, path=TIMING_CACHE_PATH):
+    keys = sorted(cache)
+    np.savez_compressed(
+        path,
+        version=RANKING_VERSION,
+        species_key=np.array([k[0] for k in keys]),
+        year=np.array([k[1] for k in keys], dtype=int),
+        fingerprint=np.array([cache[k]['fingerprint'] for k in keys], dtype=np.uint64),
+        n=np.array([cache[k]['n'] for k in keys], dtype=int),
+        median_doy=np.array([cache[k]['median_doy'] for k in keys]),
+        curves=np.array([cache[k]['curve'] for k in keys]).reshape(len(keys), YEAR_DAYS)
+    )
+
+
+def _relationship_rows(rel, cache):
+    consumer_key = COMMON_TO_KEY[rel['consumer']]
+    resource_key = COMMON_TO_KEY[rel['resource']]
+    years = sorted({yr for sp, yr in cache if sp == consumer_key} & {yr for sp, yr in cache if sp == resource_key})
+
+    rows = []
+    for year in years:
+        consumer, resource = cache[(consumer_key, year)], cache[(resource_key, year)]
+        if consumer['n'] < MIN_OBS or resource['n'] < MIN_OBS:
+            continue
+
+        gap = round(float(circular_distance(consumer['median_doy'], resource['median_doy'])), 1)
+        rows.append({
+            'year': year,
+            'consumer': rel['consumer'],
+            'resource': rel['resource'],
+            'relationship': rel['relationship'],
+            'consumer_obs': consumer['n'],
+            'resource_obs': resource['n'],
+            'consumer_median_doy': round(consumer['median_doy'], 1),
+            'resource_median_doy': round(resource['median_doy'], 1),
+            'gap_days': gap,
+            'overlap': round(float(np.minimum(consumer['curve'], resource['curve']).sum()), 4),
+            'severity': severity_label(gap),
+            'impact': rel['description'],
+            'relationship_key': relationship_key(rel)
+        })
+
+    return rows
+
+
+def refresh_mismatch_rankings(df, relationships=SPECIES_RELATIONSHIPS,
+                              path=RANKINGS_PATH, cache_path=TIMING_CACHE_PATH):
+    """
+    Bring the materialized ranking up to date with df.
+
+    Returns (rankings, changed_species). Only species/years whose content
+    fingerprint changed are re-summarized.
+    """
+    fingerprints = species_year_fingerprints(df)
+    cache = load_timing_cache(cache_path)
+
+    changed = [
+        key for key, row in fingerprints.iterrows()
+        if key not in cache or cache[key]['fingerprint'] != row['fingerprint']
+    ]
+    removed = [key for key in cache if key not in fingerprints.index]
+    for key in removed:
+        del cache[key]
+
+    if changed:
+        changed_index = pd.MultiIndex.from_tuples(changed, names=['species_key', 'year'])
+        subset = df[pd.MultiIndex.from_arrays([df['species_key'], df['year']]).isin(changed_index)]
+        stats = circular_summary(subset, ['species_key', 'year'])
+        curves = build_activity_curves(subset)
+
+        for key in changed:
+            cache[key] = {
+                'fingerprint': fingerprints.loc[key, 'fingerprint'],
+                'n': int(fingerprints.loc[key, 'n']),
+                'median_doy': float(stats.loc[key, 'median_doy']),
+                'curve': curves.curve(key)
+            }
+        save_timing_cache(cache, cache_path)
+
+    changed_species = {key[0] for key in changed + removed}
+    previous = pd.read_csv(path) if os.path.exists(path) else None
+
+    rows = []
+    for rel in relationships:
+        pair = {COMMON_TO_KEY[rel['consumer']], COMMON_TO_KEY[rel['resource']]}
+        kept = None
+        # Rows are reused only for the same record, version and unchanged species data
+        if previous is not None and 'relationship_key' in previous and not (pair & changed_species):
+            kept = previous[previous['relationship_key'] == relationship_key(rel)]
+        rows.extend(kept.drop(columns='rank').to_dict('records') if kept is not None and len(kept)
+                    else _relationship_rows(rel, cache))
+
+    rankings = pd.DataFrame(rows)
+    if not rankings.empty:
+        rankings['abs_gap'] = rankings['gap_days'].abs()
+        rankings = rankings.sort_values(['year', 'abs_gap', 'overlap'], ascending=[False, False, True])
+        rankings['rank'] = rankings.groupby('year').cumcount() + 1
+        rankings = rankings.drop(columns='abs_gap').reset_index(drop=True)
+
+    rankings.to_csv(path, index=False)
+    return rankings, sorted(changed_species)
+
+
+class MismatchRankings:
+    """Read-side view of the materialized ranking, indexed by year"""
+
+    def __init__(self, path=RANKINGS_PATH):
+        table = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+        self.table = table
+        self.by_year = {
+            int(year): group.sort_values('rank').to_dict('records')
+            for year, group in table.groupby('year')
+        } if not table.empty else {}
+        self.latest_year = max(self.by_year) if self.by_year else None
+
+    def top(self, year=None, n=5):
+        return self.by_year.get(year or self.latest_year, [])[:n]
+
+    def severity_counts(self, year=None):
+        counts = {}
+        for row in self.by_year.get(year or self.latest_year, []):
+            counts[row['severity']] = counts.get(row['severity'], 0) + 1
+        return counts
+
+
+if __name__ == "__main__":
+
+    print("🔝 REFRESHING MISMATCH RANKINGS")
+    print("="*70)
+
+    observations = pd.read_csv('data/processed/all_species_combined.csv')
+    rankings, changed = refresh_mismatch_rankings(observations)
+
+    print(f"\n✅ Recomputed {len(changed)} changed species → {RANKINGS_PATH}\n")
+    latest = rankings[rankings['year'] == rankings['year'].max()]
+    for _, r in latest.iterrows():
+        print(f"  {r['rank']}. {r['consumer']} ↔ {r['resource']}: {r['gap_days']:+.0f} days, "
+              f"overlap {r['overlap']:.2f} ({r['severity']})")
@@ -0,0 +1,152 @@
+"""
+Compact payload schema for observation points
+
+Observation payloads carry only small integers: species, type and season
+are coded against fixed tables, the date is packed as YYYYMMDD and the
+place string is stored once in a side table (data/processed/
+observation_places.json) and referenced by id. Readers fetch only the
+fields they need (with_payload projection) and decode for display.
+
+Run directly to measure payload and response sizes before and after.
+"""
+import json
+import os
+
+import pandas as pd
+
+from species_catalog import SPECIES_INFO
+
+PLACES_PATH = 'data/processed/observation_places.json'
+
+SPECIES_KEYS = list(SPECIES_INFO)
+SPECIES_TYPES = ['plant', 'butterfly', 'bee', 'bird']
+SEASONS = ['winter', 'pre_monsoon', 'monsoon', 'post_monsoon']
+
+SPECIES_CODES = {key: code for code, key in enumerate(SPECIES_KEYS)}
+COMMON_CODES = {info['common']: SPECIES_CODES[key] for key, info in SPECIES_INFO.items()}
+TYPE_CODES = {t: code for code, t in enumerate(SPECIES_TYPES)}
+SEASON_CODES = {s: code for code, s in enumerate(SEASONS)}
+
+# with_payload projections for the retrieval helpers
+TIMING_FIELDS = ['day_of_year']
+LISTING_FIELDS = ['species_id', 'date', 'day_of_year', 'place_id']
+
+
+def pack_date(timestamp):
+    return timestamp.year * 10000 + timestamp.month * 100 + timestamp.day
+
+
+def unpack_date(packed):
+    return f"{packed // 10000:04d}-{packed // 100 % 100:02d}-{packed % 100:02d}"
+
+
+def assign_place_ids(places, index):
+    """Ids for a batch of place strings, extending index (place -> id) with new ones"""
+    return [index.setdefault(place, len(index)) for place in pd.Series(places).fillna('Karnataka')]
+
+
+def save_place_table(table, path=PLACES_PATH):
+    with open(path, 'w') as f:
+        json.dump(table, f, ensure_ascii=False)
+
+
+def load_place_table(path=PLACES_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def encode_observation(row, place_id):
+    """Compact payload for one observation row"""
+    return {
+        'observation_id': int(row['observation_id']),
+        'species_id': SPECIES_CODES[row['species_key']],
+        'type_id': TYPE_CODES[row['species_type']],
+        'season_id': SEASON_CODES[row['season']],
+        'date': pack_date(row['observed_date']),
+        'year': int(row['year']),
+        'month': int(row['month']),
+        'day_of_year': int(row['day_of_year']),
+        'lat': round(float(row['latitude']), 5),
+        'lon': round(float(row['longitude']), 5),
+        'place_id': int(place_id)
+    }
+
+
+def generate_observation_text(row):
+    """Text that is embedded (and BM25-indexed) for an observation row"""
+    return (
+        f"{row['species_common']} ({row['species_type']}) "
+        f"observed on {row['observed_date'].strftime('%B %d, %Y')} "
+        f"(day {row['day_of_year']} of {row['year']}) "
+        f"in {row.get('place_guess', 'Karnataka')} "
+        f"during {row['season']} season"
+    )
+
+
+def decode_observation(payload, places=()):
+    """Readable fields for whatever part of a compact payload was returned"""
+    decoded = dict(payload)
+    if 'species_id' in payload:
+        key = SPECIES_KEYS[payload['species_id']]
+        decoded.update(species_key=key, species_common=SPECIES_INFO[key]['common'],
+                       species_type=SPECIES_INFO[key]['type'])
+    if 'type_id' in payload:
+        decoded['species_type'] = SPECIES_TYPES[payload['type_id']]
+    if 'season_id' in payload:
+        decoded['season'] = SEASONS[payload['season_id']]
+    if 'date' in payload:
+        decoded['observed_date'] = unpack_date(payload['date'])
+    if 'place_id' in payload:
+        decoded['place'] = places[payload['place_id']] if payload['place_id'] < len(places) else 'Karnataka'
+    return decoded
+
+
+def payload_bytes(payload):
+    return len(json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode())
+
+
+if __name__ == "__main__":
+
+    print("📦 OBSERVATION PAYLOAD SIZES")
+    print("="*70)
+
+    df = pd.read_csv('data/processed/all_species_combined.csv')
+    df['observed_date'] = pd.to_datetime(df['observed_date'])
+    place_index = {}
+    place_ids = assign_place_ids(df['place_guess'], place_index)
+    places = list(place_index)
+
+    legacy, compact = [], []
+    for (_, row), place_id in zip(df.iterrows(), place_ids):
+        text = (
+            f"{row['species_common']} ({row['species_type']}) "
+            f"observed on {row['observed_date'].strftime('%B %d, %Y')} "
+            f"(day {row['day_of_year']} of {row['year']}) "
+            f"in {row['place_guess']} during {row['season']} season"
+        )
+        legacy.append({
+            'observation_id': int(row['observation_id']), 'species_key': row['species_key'],
+            'species_common': row['species_common'], 'species_type': row['species_type'],
+            'species_role': row['species_role'], 'observed_date': row['observed_date'].isoformat(),
+            'year': int(row['year']), 'month': int(row['month']), 'day_of_year': int(row['day_of_year']),
+            'season': row['season'], 'latitude': float(row['latitude']), 'longitude': float(row['longitude']),
+            'place': row['place_guess'], 'text_description': text
+        })
+        compact.append(encode_observation(row, place_id))
+
+    legacy_bytes = sum(payload_bytes(p) for p in legacy)
+    compact_bytes = sum(payload_bytes(p) for p in compact)
+    table_bytes = payload_bytes(places)
+
+    print(f"\n  Points: {len(df):,}, distinct places: {len(places):,}")
+    print(f"  Legacy payload:  {legacy_bytes / len(df):6.0f} bytes/point ({legacy_bytes / 1e6:.2f} MB)")
+    print(f"  Compact payload: {compact_bytes / len(df):6.0f} bytes/point ({compact_bytes / 1e6:.2f} MB)"
+          f" + {table_bytes / 1e3:.0f} KB place table")
+
+    print("\n  Response payload size (first N points):")
+    for label, n, fields in [("Species-year timing", 200, TIMING_FIELDS), ("Search listing", 5, LISTING_FIELDS)]:
+        before = sum(payload_bytes(p) for p in legacy[:n])
+        after = sum(payload_bytes({k: p[k] for k in fields}) for p in compact[:n])
+        print(f"  • {label:20} ({n:>3} points): {before:>7,} → {after:>6,} bytes ({before / after:.0f}x smaller)")
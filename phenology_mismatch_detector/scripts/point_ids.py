@@ -0,0 +1,139 @@
+"""
+Deterministic, collision-free point ids for observations
+
+A point id packs the data source into the top 16 bits of an unsigned
+64-bit integer and the source's own observation id into the low 48 bits.
+The mapping is injective, so two different observations can never share
+an id (unlike the old truncated-md5 % 1e9 scheme), and re-ingesting the
+same observation always overwrites the same point.
+
+Run directly to migrate an existing collection to the new ids.
+"""
+from qdrant_client.models import PointStruct, PointIdsList
+
+SOURCE_CODES = {'inaturalist': 1}
+DEFAULT_SOURCE = 'inaturalist'
+SOURCE_SHIFT = 48
+MAX_SOURCE_ID = (1 << SOURCE_SHIFT) - 1
+MIGRATION_BATCH_SIZE = 256
+
+
+def observation_point_id(observation_id, source=DEFAULT_SOURCE):
+    """Unique 64-bit point id for (source, observation_id)"""
+    observation_id = int(observation_id)
+    if not 0 <= observation_id <= MAX_SOURCE_ID:
+        raise ValueError(f"observation_id {observation_id} does not fit in {SOURCE_SHIFT} bits")
+    return (SOURCE_CODES[source] << SOURCE_SHIFT) | observation_id
+
+
+def split_point_id(point_id):
+    """(source, observation_id) for a point id produced by observation_point_id"""
+    code = point_id >> SOURCE_SHIFT
+    source = next((name for name, c in SOURCE_CODES.items() if c == code), None)
+    return source, point_id & MAX_SOURCE_ID
+
+
+class PointIdCollisionError(RuntimeError):
+    pass
+
+
+class PointIdTracker:
+    """
+    Ingest-time guard: every id must map back to exactly one observation.
+
+    Re-sending the same observation is counted as a duplicate; a different
+    observation under an id already used raises PointIdCollisionError.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.duplicates = 0
+
+    def register(self, observation_id, source=DEFAULT_SOURCE):
+        """Point id for an observation, checked against every id issued so far"""
+        point_id = observation_point_id(observation_id, source)
+        key = (source, int(observation_id))
+        existing = self.keys.get(point_id)
+        if existing is None:
+            self.keys[point_id] = key
+        elif existing == key:
+            self.duplicates += 1
+        else:
+            raise PointIdCollisionError(f"point id {point_id} used by both {existing} and {key}")
+        return point_id
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def migrate_point_ids(client, collection_name='observations', source=DEFAULT_SOURCE,
+                      batch_size=MIGRATION_BATCH_SIZE):
+    """
+    Rewrite every point of an existing collection under its deterministic id.
+
+    Points are re-upserted with the same vectors and payload (the id comes
+    from payload['observation_id']) and the old ids deleted. Already
+    migrated points are left alone, so the migration can be resumed.
+    Returns counts of migrated, unchanged and unmappable points.
+    """
+    stats = {'migrated': 0, 'unchanged': 0, 'unmappable': 0}
+    tracker = PointIdTracker()
+    moved_ids = set()
+    offset = None
+
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+
+        moved, old_ids = [], []
+        for p in points:
+            if p.id in moved_ids:
+                continue  # rewritten earlier in this run; scroll reaches it again
+
+            observation_id = (p.payload or {}).get('observation_id')
+            if observation_id is None:
+                stats['unmappable'] += 1
+                continue
+
+            new_id = tracker.register(observation_id, source)
+            if new_id == p.id:
+                stats['unchanged'] += 1
+                continue
+
+            moved.append(PointStruct(id=new_id, vector=p.vector, payload=p.payload))
+            old_ids.append(p.id)
+            moved_ids.add(new_id)
+
+        if moved:
+            client.upsert(collection_name=collection_name, points=moved)
+            client.delete(collection_name=collection_name, points_selector=PointIdsList(points=old_ids))
+            stats['migrated'] += len(moved)
+
+        if offset is None:
+            return stats
+
+
+if __name__ == "__main__":
+    import pandas as pd
+    from qdrant_client import QdrantClient
+
+    print("🆔 MIGRATING OBSERVATION POINT IDS")
+    print("="*70)
+
+    client = QdrantClient("localhost", port=6333)
+    stats = migrate_point_ids(client)
+    print(f"\n  ✅ Migrated {stats['migrated']:,}, already current {stats['unchanged']:,}, "
+          f"without observation_id {stats['unmappable']:,}")
+
+    # Observations overwritten by old-scheme collisions cannot be recovered
+    # from the collection; they need to be re-ingested
+    expected = pd.read_csv('data/processed/all_species_combined.csv', usecols=['observation_id'])
+    stored = client.count('observations').count
+    missing = expected['observation_id'].nunique() - stored
+    if missing > 0:
+        print(f"  ⚠️  {missing:,} observations missing (lost to old id collisions) - re-run ingest_to_qdrant.py")
@@ -0,0 +1,187 @@
+"""
+Species relationship graph and downstream mismatch propagation
+
+Edges from data/species_relationships.csv are stored as CSR-style arrays
+keyed by species index: for each consumer, the run of resources it
+depends on, with a dependence share (edge weight / consumer's total, so
+a consumer with two food sources inherits half of each one's trouble).
+
+A species' direct exposure is its worst mismatch with any of its
+resources (1 - activity overlap, from the materialized rankings). Its
+propagated exposure adds what it inherits from the resources it depends
+on, damped per hop:
+
+    e = direct + decay * W @ e        (iterated for a fixed number of hops)
+
+Each hop is a single vectorized pass over all edges (np.add.reduceat over
+the consumer runs) for every species and year at once, so it scales with
+the number of edges rather than species pairs.
+
+Run directly for the exposure table and a synthetic scaling benchmark.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from species_catalog import SPECIES_RELATIONSHIPS
+
+DEFAULT_HOPS = 4
+DEFAULT_DECAY = 0.5
+
+
+class RelationshipGraph:
+    """Consumer -> resource dependence graph over species common names"""
+
+    def __init__(self, relationships=SPECIES_RELATIONSHIPS):
+        self.species = sorted({r['consumer'] for r in relationships} | {r['resource'] for r in relationships})
+        self.index = {name: i for i, name in enumerate(self.species)}
+
+        consumer = np.array([self.index[r['consumer']] for r in relationships], dtype=np.int64)
+        resource = np.array([self.index[r['resource']] for r in relationships], dtype=np.int64)
+        weight = np.array([float(r.get('weight') or 1.0) for r in relationships])
+
+        # Edges sorted by consumer: row c of the adjacency is edges indptr[c]:indptr[c+1]
+        order = np.lexsort((resource, consumer))
+        self.consumer, self.resource, self.weight = consumer[order], resource[order], weight[order]
+        self.relationships = [relationships[i] for i in order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.consumer, minlength=len(self)))])
+
+        totals = np.bincount(self.consumer, weights=self.weight, minlength=len(self))
+        self.share = self.weight / totals[self.consumer] if len(self.consumer) else self.weight
+
+        self._rows = np.flatnonzero(np.diff(self.indptr))
+
+    def __len__(self):
+        return len(self.species)
+
+    def pull(self, values):
+        """Dependence-weighted sum of values over each species' resources (one pass over the edges)"""
+        values = np.asarray(values, dtype=float)
+        out = np.zeros_like(values)
+        if len(self._rows):
+            share = self.share.reshape(-1, *[1] * (values.ndim - 1))
+            out[self._rows] = np.add.reduceat(share * values[self.resource], self.indptr[self._rows], axis=0)
+        return out
+
+    def direct_exposure(self, rankings):
+        """
+        (species x years) matrix of each consumer's worst 1 - overlap with
+        any of its resources, from a rankings table; returns (matrix, years).
+        """
+        years = sorted(int(y) for y in rankings['year'].unique()) if len(rankings) else []
+        direct = np.zeros((len(self), len(years)))
+        if not years:
+            return direct, years
+
+        known = rankings[rankings['consumer'].isin(self.index)]
+        rows = known['consumer'].map(self.index).to_numpy()
+        cols = np.searchsorted(years, known['year'].to_numpy())
+        np.maximum.at(direct, (rows, cols), 1 - known['overlap'].to_numpy(dtype=float))
+        return direct, years
+
+    def propagate(self, direct, hops=DEFAULT_HOPS, decay=DEFAULT_DECAY):
+        """Exposure including what is inherited from resources up to hops away"""
+        exposure = np.asarray(direct, dtype=float)
+        for _ in range(hops):
+            exposure = direct + decay * self.pull(exposure)
+        return exposure
+
+    def downstream(self, species, hops=DEFAULT_HOPS):
+        """
+        Species that depend on species directly or through a chain of
+        consumers: [{species, hops, dependence}], nearest first. dependence
+        is the summed product of dependence shares along the paths.
+        """
+        if species not in self.index:
+            return []
+
+        # Reverse pass: a consumer receives its share of each resource's signal
+        signal = np.zeros(len(self))
+        signal[self.index[species]] = 1.0
+        first_hop = np.zeros(len(self), dtype=int)
+        dependence = np.zeros(len(self))
+
+        for hop in range(1, hops + 1):
+            signal = self.pull(signal)
+            dependence += signal
+            first_hop[(signal > 0) & (first_hop == 0)] = hop
+            if not signal.any():
+                break
+
+        first_hop[self.index[species]] = 0
+        affected = np.flatnonzero(first_hop)
+        order = np.lexsort((-dependence[affected], first_hop[affected]))
+        return [
+            {'species': self.species[i], 'hops': int(first_hop[i]), 'dependence': float(dependence[i])}
+            for i in affected[order]
+        ]
+
+    def exposure_table(self, rankings, hops=DEFAULT_HOPS, decay=DEFAULT_DECAY):
+        """Long table of direct, inherited and total exposure per species and year"""
+        direct, years = self.direct_exposure(rankings)
+        total = self.propagate(direct, hops, decay)
+        return pd.DataFrame({
+            'species': np.repeat(self.species, len(years)),
+            'year': np.tile(years, len(self)),
+            'direct': direct.ravel(),
+            'inherited': (total - direct).ravel(),
+            'exposure': total.ravel()
+        })
+
+
+# Toy food chain for showing multi-hop inheritance (the catalog's edges are all one hop):
+# a herbivore on one plant, and a predator splitting its diet between the herbivore and another plant
+CHAIN_EXAMPLE = [
+    {'consumer': 'herbivore', 'resource': 'plant'},
+    {'consumer': 'predator', 'resource': 'herbivore'},
+    {'consumer': 'predator', 'resource': 'other plant'}
+]
+
+
+def random_graph(n_species, n_edges, seed=0):
+    """Synthetic relationships for scaling tests"""
+    rng = np.random.default_rng(seed)
+    consumer = rng.integers(0, n_species, n_edges)
+    resource = rng.integers(0, n_species, n_edges)
+    return [{'consumer': f'sp{c}', 'resource': f'sp{r}'} for c, r in zip(consumer, resource) if c != r]
+
+
+if __name__ == "__main__":
+    from mismatch_ranking import RANKINGS_PATH
+
+    print("🕸️  TROPHIC CASCADE EXPOSURE")
+    print("="*70)
+
+    graph = RelationshipGraph()
+    rankings = pd.read_csv(RANKINGS_PATH)
+    table = graph.exposure_table(rankings)
+    latest = table[table['year'] == table['year'].max()].sort_values('exposure', ascending=False)
+
+    print(f"\n  {len(graph)} species, {len(graph.consumer)} edges; exposure in {latest['year'].max()}:")
+    print(f"  {'Species':24} {'Direct':>7} {'Inherited':>10} {'Total':>7}  Downstream")
+    for _, r in latest.iterrows():
+        downstream = ', '.join(d['species'] for d in graph.downstream(r['species'])) or '-'
+        print(f"  {r['species']:24} {r['direct']:>7.2f} {r['inherited']:>10.2f} {r['exposure']:>7.2f}  {downstream}")
+
+    chain = RelationshipGraph(CHAIN_EXAMPLE)
+    direct = np.array([[0.0] if name != 'herbivore' else [0.8] for name in chain.species])
+    total = chain.propagate(direct)[:, 0]
+    print(f"\n  Toy chain (plant ← herbivore ← predator, predator also eats other plant), "
+          f"herbivore direct exposure 0.8:")
+    for d in chain.downstream('plant'):
+        print(f"  • {d['species']:12} {d['hops']} hop(s) from plant, dependence {d['dependence']:.0%}, "
+              f"exposure {total[chain.index[d['species']]]:.2f}")
+
+    print(f"\n  {'Species':>8} {'Edges':>9} {'Years':>6} {'Build s':>8} {'Propagate s':>12}")
+    for n_species, n_edges in [(1_000, 10_000), (10_000, 100_000), (100_000, 1_000_000)]:
+        relationships = random_graph(n_species, n_edges)
+        start = time.perf_counter()
+        big = RelationshipGraph(relationships)
+        build = time.perf_counter() - start
+
+        direct = np.random.default_rng(1).random((len(big), 6))
+        start = time.perf_counter()
+        big.propagate(direct)
+        elapsed = time.perf_counter() - start
+        print(f"  {n_species:>8,} {len(big.consumer):>9,} {6:>6} {build:>8.2f} {elapsed:>12.3f}")
@@ -0,0 +1,344 @@
+"""
+Incremental runner for the download → clean → combine → ingest pipeline
+
+Stages form a DAG with declared input and output files. Each stage (or
+each species of a per-species stage) is fingerprinted from the content
+hash of its inputs plus the scripts that implement it, and the
+fingerprints of the last successful run are kept in
+data/processed/pipeline_state.json. A stage only runs for the partitions
+whose fingerprint changed or whose outputs are missing, so touching one
+raw species file re-cleans and re-ingests just that species (the shared
+combine/summary stages still rerun, since their inputs changed).
+
+Usage:
+    python scripts/run_pipeline.py [--dry-run] [--force STAGE ...]
+"""
+import hashlib
+import json
+import os
+from graphlib import TopologicalSorter
+
+import pandas as pd
+
+from species_catalog import RELATIONSHIPS_PATH, SPECIES_INFO
+from window_analysis import BASELINE_YEARS, CURRENT_YEARS, period_path
+from streaming import DEFAULT_MEMORY_MB
+
+STATE_PATH = 'data/processed/pipeline_state.json'
+COMBINED_PATH = 'data/processed/all_species_combined.csv'
+CLIMATE_MONTHLY_PATH = 'data/raw/karnataka_climate_monthly.csv'
+CLIMATE_FEATURES_PATH = 'data/raw/karnataka_climate_features.npz'
+SUMMARY_PATH = 'data/processed/phenology_summary.csv'
+RANKINGS_PATH = 'data/processed/mismatch_rankings.csv'
+
+# Columns that end up in an observation's text, vectors or payload; effort
+# weights are left out because they shift for every species on any change
+INGEST_COLUMNS = [
+    'observation_id', 'species_key', 'species_common', 'species_type', 'observed_date',
+    'year', 'month', 'day_of_year', 'season', 'latitude', 'longitude', 'place_guess'
+]
+
+WHOLE = '*'  # partition key of stages that are not split per species
+
+# Streaming options passed through to cleaning and ingest (set from the CLI)
+MEMORY_MB = None
+UPLOAD_WORKERS = 4
+EMBED_WORKERS = 1
+
+
+def raw_path(species_key):
+    return f'data/raw/{species_key}.csv'
+
+
+def cleaned_path(species_key):
+    return f'data/processed/{species_key}_cleaned.csv'
+
+
+def file_hash(path):
+    """sha1 of a file's content, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def combine_hashes(*parts):
+    return hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(state, path=STATE_PATH):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    partitions() returns {partition: fingerprint of its inputs}; stages
+    that are not per species use the inputs' file hashes under WHOLE.
+    run(changed) redoes the listed partitions. outputs(partition) lists
+    the files a partition must leave behind; present() can veto skipping
+    when the stage's results live outside the filesystem (e.g. Qdrant).
+    adopt_existing records partitions whose outputs already exist on the
+    first run instead of rebuilding them (used for network downloads).
+    settings() returns run-time configuration that changes the outputs
+    without touching any file (e.g. the embedder backend); it is part of
+    every partition's fingerprint.
+    """
+
+    def __init__(self, name, run, deps=(), inputs=(), outputs=None, code=(),
+                 partitions=None, present=None, adopt_existing=False, settings=None):
+        self.name = name
+        self.run = run
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = outputs or (lambda partition: [])
+        self.code = [os.path.join('scripts', c) for c in code]
+        self._partitions = partitions
+        self.present = present
+        self.adopt_existing = adopt_existing
+        self.settings = settings or (lambda: {})
+
+    def fingerprints(self):
+        code_hash = combine_hashes(*[file_hash(c) for c in self.code], self.settings())
+        if self._partitions is None:
+            parts = {WHOLE: combine_hashes(*[file_hash(p) for p in self.inputs])}
+        else:
+            parts = self._partitions()
+        return {partition: combine_hashes(code_hash, fp) for partition, fp in parts.items()}
+
+    def plan(self, previous, force=False):
+        """(current fingerprints, partitions to redo)"""
+        current = self.fingerprints()
+        if force or (self.present is not None and not self.present()):
+            previous = {}
+
+        changed = []
+        for partition, fp in current.items():
+            outputs_exist = all(os.path.exists(p) for p in self.outputs(partition))
+            if partition not in previous and outputs_exist and self.adopt_existing and not force:
+                continue
+            if previous.get(partition) != fp or not outputs_exist:
+                changed.append(partition)
+
+        # Partitions that disappeared (e.g. a deleted raw file) are redone too,
+        # so their stale results get removed
+        changed += sorted(p for p in previous if p not in current)
+        return current, changed
+
+
+# ---------------------------------------------------------------------------
+# Stage implementations (heavy modules are imported lazily: ingest_to_qdrant
+# loads the embedding model and connects to Qdrant at import time)
+# ---------------------------------------------------------------------------
+
+def _qdrant():
+    from qdrant_client import QdrantClient
+    return QdrantClient("localhost", port=6333)
+
+
+def _collection_has_points(name):
+    client = _qdrant()
+    return client.collection_exists(name) and client.count(name).count > 0
+
+
+def _species_config_fingerprints():
+    from download_species_data import SPECIES
+    return {key: combine_hashes(SPECIES[key]) for key in SPECIES_INFO if key in SPECIES}
+
+
+def _climate_config_fingerprint():
+    from download_climate_data import KARNATAKA_CENTER, START_DATE, END_DATE
+    return {WHOLE: combine_hashes(KARNATAKA_CENTER, START_DATE, END_DATE)}
+
+
+def _raw_fingerprints():
+    return {key: file_hash(raw_path(key)) for key in SPECIES_INFO if os.path.exists(raw_path(key))}
+
+
+def _combined_fingerprints():
+    """Per-species content hash of the ingested columns of the combined CSV"""
+    if not os.path.exists(COMBINED_PATH):
+        return {}
+    df = pd.read_csv(COMBINED_PATH, usecols=lambda c: c in INGEST_COLUMNS)
+    row_hash = pd.util.hash_pandas_object(df[[c for c in INGEST_COLUMNS if c in df.columns]], index=False)
+    # Sum of row hashes (mod 2**64) is order independent
+    sums = row_hash.groupby(df['species_key'].to_numpy()).sum()
+    return {key: str(int(total)) for key, total in sums.items()}
+
+
+def run_download_species(changed):
+    from download_species_data import SPECIES, download_species_observations
+    for key in changed:
+        if key in SPECIES:
+            info = SPECIES[key]
+            download_species_observations(key, info['taxon_id'], info['name'], info['type'])
+
+
+def run_download_climate(changed):
+    from download_climate_data import download_nasa_power_data
+    download_nasa_power_data()
+
+
+def run_clean(changed):
+    from clean_and_filter_data import clean_species_data
+    for key in changed:
+        if os.path.exists(raw_path(key)):
+            clean_species_data(f'{key}.csv', key, memory_mb=MEMORY_MB)
+        elif os.path.exists(cleaned_path(key)):
+            os.remove(cleaned_path(key))
+            print(f"\n  🗑️  {raw_path(key)} removed, dropped {cleaned_path(key)}")
+
+
+def run_combine(changed):
+    from clean_and_filter_data import build_combined_outputs, read_cleaned
+    build_combined_outputs(read_cleaned(SPECIES_INFO, MEMORY_MB))
+
+
+def run_ingest_observations(changed):
+    import ingest_to_qdrant
+    ingest_to_qdrant.create_collections(['observations'], recreate=False)
+    ingest_to_qdrant.ingest_observations(MEMORY_MB or DEFAULT_MEMORY_MB, UPLOAD_WORKERS,
+                                         species_keys=changed, embed_workers=EMBED_WORKERS)
+
+
+def _replace_collection(name, ingest):
+    def run(changed):
+        import ingest_to_qdrant
+        ingest_to_qdrant.create_collections([name])
+        getattr(ingest_to_qdrant, ingest)()
+    return run
+
+
+def run_refresh_rankings(changed):
+    import ingest_to_qdrant
+    ingest_to_qdrant.refresh_rankings()
+
+
+def _embedder_settings():
+    """The embedding model and backend behind every stored vector"""
+    from embedders import DEFAULT_BACKEND, MODEL_NAME
+    return {'model': MODEL_NAME, 'backend': os.environ.get('EMBEDDER_BACKEND', DEFAULT_BACKEND)}
+
+
+def build_stages():
+    combined_outputs = [
+        COMBINED_PATH, period_path('baseline', BASELINE_YEARS), period_path('current', CURRENT_YEARS),
+        SUMMARY_PATH, 'data/processed/climate_drivers.csv', 'data/processed/outliers.csv'
+    ]
+    # Every ingest stage writes vectors, so it depends on how they are embedded
+    embedding_code = ['ingest_to_qdrant.py', 'embedders.py', 'embedding_pool.py', 'ingest_pipeline.py', 'streaming.py']
+    return [
+        Stage('download_species', run_download_species,
+              outputs=lambda key: [raw_path(key)], code=['download_species_data.py'],
+              partitions=_species_config_fingerprints, adopt_existing=True),
+        Stage('download_climate', run_download_climate,
+              outputs=lambda _: [CLIMATE_MONTHLY_PATH, CLIMATE_FEATURES_PATH],
+              code=['download_climate_data.py', 'climate_features.py'],
+              partitions=_climate_config_fingerprint, adopt_existing=True),
+        Stage('clean', run_clean, deps=['download_species'],
+              outputs=lambda key: [cleaned_path(key)] if os.path.exists(raw_path(key)) else [],
+              code=['clean_and_filter_data.py', 'species_catalog.py', 'streaming.py'],
+              partitions=_raw_fingerprints),
+        Stage('combine', run_combine, deps=['clean', 'download_climate'],
+              inputs=[cleaned_path(key) for key in SPECIES_INFO] + [CLIMATE_FEATURES_PATH],
+              outputs=lambda _: combined_outputs,
+              code=['clean_and_filter_data.py', 'effort_correction.py', 'circular_stats.py',
+                    'climate_drivers.py', 'climate_features.py', 'outlier_detection.py', 'window_analysis.py',
+                    'doy_sketch.py', 'streaming.py', 'species_catalog.py']),
+        Stage('ingest_observations', run_ingest_observations, deps=['combine'],
+              code=embedding_code + ['payload_schema.py', 'hybrid_search.py', 'point_ids.py', 'doy_sketch.py'],
+              partitions=_combined_fingerprints, settings=_embedder_settings,
+              present=lambda: _collection_has_points('observations')),
+        Stage('ingest_climate', _replace_collection('climate_data', 'ingest_climate_data'),
+              deps=['download_climate'], inputs=[CLIMATE_MONTHLY_PATH], code=embedding_code,
+              settings=_embedder_settings,
+              present=lambda: _collection_has_points('climate_data')),
+        Stage('ingest_patterns', _replace_collection('temporal_patterns', 'ingest_phenology_patterns'),
+              deps=['combine'], inputs=[SUMMARY_PATH], code=embedding_code,
+              settings=_embedder_settings,
+              present=lambda: _collection_has_points('temporal_patterns')),
+        Stage('ingest_metadata', _replace_collection('species_metadata', 'ingest_species_metadata'),
+              deps=['combine'], inputs=[COMBINED_PATH, RELATIONSHIPS_PATH],
+              code=embedding_code + ['activity_curves.py', 'cooccurrence.py', 'species_catalog.py'],
+              settings=_embedder_settings,
+              present=lambda: _collection_has_points('species_metadata')),
+        Stage('refresh_rankings', run_refresh_rankings, deps=['combine'],
+              inputs=[COMBINED_PATH, RELATIONSHIPS_PATH], outputs=lambda _: [RANKINGS_PATH],
+              code=['mismatch_ranking.py', 'activity_curves.py', 'species_catalog.py']),
+    ]
+
+
+def run_pipeline(stages, force=(), dry_run=False, state_path=STATE_PATH):
+    """Run stages in dependency order, skipping up-to-date partitions"""
+    by_name = {stage.name: stage for stage in stages}
+    unknown = set(force) - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    order = TopologicalSorter({s.name: s.deps for s in stages}).static_order()
+    state = load_state(state_path)
+    ran = []
+
+    for name in order:
+        stage = by_name[name]
+        current, changed = stage.plan(state.get(name, {}), force=name in force)
+
+        if not changed:
+            print(f"  ✅ {name:20} up to date ({len(current)} partition{'s' if len(current) != 1 else ''})")
+            state[name] = current
+            continue
+
+        label = 'all' if changed == [WHOLE] else ', '.join(changed)
+        print(f"  🔄 {name:20} {len(changed)}/{len(current)} to redo: {label}")
+        ran.append(name)
+        if dry_run:
+            continue
+
+        stage.run([p for p in changed if p != WHOLE])
+        # Fingerprint after the run, so outputs this stage just rewrote don't
+        # read as changed next time
+        state[name] = stage.fingerprints()
+        save_state(state, state_path)
+
+    if not dry_run:
+        save_state(state, state_path)
+    return ran
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the phenology pipeline, redoing only what changed")
+    parser.add_argument('--dry-run', action='store_true', help="show what would run without running it")
+    parser.add_argument('--force', action='append', default=[], metavar='STAGE',
+                        help="rerun a stage regardless of fingerprints (repeatable)")
+    parser.add_argument('--memory-mb', type=int, default=None,
+                        help="memory ceiling for the per-species cleaning pass and ingest (combine loads the combined data)")
+    parser.add_argument('--upload-workers', type=int, default=UPLOAD_WORKERS,
+                        help="parallel Qdrant upload threads")
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS,
+                        help="embedding processes for observation ingest (1 = embed in-process)")
+    args = parser.parse_args()
+
+    MEMORY_MB = args.memory_mb
+    UPLOAD_WORKERS = args.upload_workers
+    EMBED_WORKERS = args.embed_workers
+
+    print("🧩 PHENOLOGY PIPELINE")
+    print("="*70)
+    ran = run_pipeline(build_stages(), force=args.force, dry_run=args.dry_run)
+    print(f"\n  {'Would run' if args.dry_run else 'Ran'}: {', '.join(ran) if ran else 'nothing'}")
@@ -0,0 +1,294 @@
+"""
+Export and restore Qdrant collections without re-embedding
+
+A snapshot directory holds, per collection:
+    ids.npy                    point ids (uint64)
+    vectors.npy                dense vectors, one contiguous float32 (n, dim) array
+    sparse_<name>.npz          CSR-style indices/values/offsets for each sparse vector
+    payload.npz                one column per payload key: scalar columns as
+                               native arrays, everything else as JSON strings
+plus manifest.json (collection configs, columns, point counts) and a copy
+of the observation place table that compact payloads refer to.
+
+Restoring memory-maps the vectors and uploads them in large batches, so a
+new environment comes up at disk speed instead of rerunning the model.
+
+Usage:
+    python scripts/snapshot.py export [--dir DIR]
+    python scripts/snapshot.py restore [--dir DIR]
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+from qdrant_client.models import (
+    Distance, VectorParams, SparseVectorParams, SparseVector, Modifier, PointStruct
+)
+
+from hybrid_search import BM25_STATS_PATH
+from payload_schema import PLACES_PATH
+
+SNAPSHOT_DIR = 'data/snapshots/latest'
+MANIFEST_NAME = 'manifest.json'
+EXPORT_BATCH_SIZE = 2048
+RESTORE_BATCH_SIZE = 4096
+
+NATIVE_KINDS = {int: 'int64', float: 'float64', bool: 'bool', str: 'str'}
+
+
+# ---------------------------------------------------------------------------
+# Columnar payloads
+# ---------------------------------------------------------------------------
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def payload_columns(payloads):
+    """
+    {key: array} for a list of payload dicts. A key whose values are all of
+    one scalar type (and present on every point) becomes a native array;
+    any other key is stored as JSON text, with '' marking a missing value.
+    """
+    keys = list(dict.fromkeys(k for p in payloads for k in p))
+    columns, kinds = {}, {}
+    for key in keys:
+        values = [p.get(key, _MISSING) for p in payloads]
+        value_types = {type(v) for v in values}
+        if len(value_types) == 1 and next(iter(value_types)) in NATIVE_KINDS:
+            kinds[key] = NATIVE_KINDS[value_types.pop()]
+            columns[key] = np.array(values, dtype=kinds[key])
+        else:
+            kinds[key] = 'json'
+            columns[key] = np.array(
+                ['' if v is _MISSING else json.dumps(v, ensure_ascii=False) for v in values], dtype=str
+            )
+    return columns, kinds
+
+
+def payload_rows(columns, kinds, start, stop):
+    """Payload dicts for rows [start, stop) of a columnar payload"""
+    rows = [{} for _ in range(stop - start)]
+    for key, kind in kinds.items():
+        values = columns[key][start:stop]
+        if kind == 'json':
+            for row, v in zip(rows, values):
+                if v:
+                    row[key] = json.loads(v)
+        else:
+            for row, v in zip(rows, values.tolist()):
+                row[key] = v
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+def _collection_config(client, name):
+    params = client.get_collection(name).config.params
+    vectors = params.vectors
+    if isinstance(vectors, dict):
+        vectors = vectors['']
+    sparse = {
+        sparse_name: {'modifier': cfg.modifier.value if cfg.modifier else None}
+        for sparse_name, cfg in (params.sparse_vectors or {}).items()
+    }
+    return {'size': vectors.size, 'distance': vectors.distance.value, 'sparse_vectors': sparse}
+
+
+def export_collection(client, name, out_dir, batch_size=EXPORT_BATCH_SIZE):
+    """Write one collection's ids, vectors and payloads; returns its manifest entry"""
+    config = _collection_config(client, name)
+    sparse_names = list(config['sparse_vectors'])
+    total = client.count(name).count
+
+    ids = np.empty(total, dtype=np.uint64)
+    vectors = np.lib.format.open_memmap(
+        os.path.join(out_dir, 'vectors.npy'), mode='w+', dtype=np.float32, shape=(total, config['size'])
+    )
+    sparse = {s: {'indices': [], 'values': [], 'lengths': []} for s in sparse_names}
+    payloads = []
+
+    n, offset = 0, None
+    while True:
+        points, offset = client.scroll(
+            collection_name=name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        for p in points:
+            dense = p.vector.get('', None) if isinstance(p.vector, dict) else p.vector
+            ids[n] = p.id
+            vectors[n] = dense
+            for s in sparse_names:
+                vec = p.vector.get(s)
+                indices = vec.indices if vec is not None else []
+                sparse[s]['indices'].extend(indices)
+                sparse[s]['values'].extend(vec.values if vec is not None else [])
+                sparse[s]['lengths'].append(len(indices))
+            payloads.append(p.payload or {})
+            n += 1
+        if offset is None:
+            break
+
+    if n != total:
+        raise RuntimeError(f"'{name}' changed during export ({total} counted, {n} scrolled)")
+
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(out_dir, 'ids.npy'), ids)
+    for s, parts in sparse.items():
+        np.savez(
+            os.path.join(out_dir, f'sparse_{s}.npz'),
+            indices=np.array(parts['indices'], dtype=np.uint32),
+            values=np.array(parts['values'], dtype=np.float32),
+            offsets=np.concatenate([[0], np.cumsum(parts['lengths'])]).astype(np.int64)
+        )
+
+    columns, kinds = payload_columns(payloads)
+    np.savez(os.path.join(out_dir, 'payload.npz'), **columns)
+
+    return {'points': n, **config, 'payload_columns': kinds}
+
+
+def export_snapshot(client, snapshot_dir=SNAPSHOT_DIR, names=None, batch_size=EXPORT_BATCH_SIZE):
+    """Export collections (default: all) to snapshot_dir and write the manifest"""
+    names = names or sorted(c.name for c in client.get_collections().collections)
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    manifest = {'created': datetime.now().isoformat(timespec='seconds'), 'collections': {}, 'files': []}
+    for name in names:
+        start = time.perf_counter()
+        out_dir = os.path.join(snapshot_dir, name)
+        os.makedirs(out_dir, exist_ok=True)
+        entry = export_collection(client, name, out_dir, batch_size)
+        manifest['collections'][name] = entry
+        print(f"  ✅ {name:18} {entry['points']:>7,} points in {time.perf_counter() - start:.1f}s")
+
+    # Compact observation payloads reference this table by place_id, and
+    # species-scoped re-ingests reuse the BM25 stats
+    for path in (PLACES_PATH, BM25_STATS_PATH):
+        if os.path.exists(path):
+            shutil.copy(path, os.path.join(snapshot_dir, os.path.basename(path)))
+            manifest['files'].append(path)
+
+    with open(os.path.join(snapshot_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ---------------------------------------------------------------------------
+# Restore
+# ---------------------------------------------------------------------------
+
+def load_manifest(snapshot_dir=SNAPSHOT_DIR):
+    with open(os.path.join(snapshot_dir, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def _create_collection(client, name, entry):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=entry['size'], distance=Distance(entry['distance'])),
+        sparse_vectors_config={
+            s: SparseVectorParams(modifier=Modifier(cfg['modifier']) if cfg['modifier'] else None)
+            for s, cfg in entry['sparse_vectors'].items()
+        } or None
+    )
+
+
+def restore_collection(client, name, entry, in_dir, batch_size=RESTORE_BATCH_SIZE):
+    """Recreate one collection from its exported files; returns (read_s, upload_s)"""
+    read_s = upload_s = 0.0
+
+    start = time.perf_counter()
+    ids = np.load(os.path.join(in_dir, 'ids.npy'))
+    vectors = np.load(os.path.join(in_dir, 'vectors.npy'), mmap_mode='r')
+    sparse = {s: np.load(os.path.join(in_dir, f'sparse_{s}.npz')) for s in entry['sparse_vectors']}
+    sparse = {s: {k: data[k] for k in ('indices', 'values', 'offsets')} for s, data in sparse.items()}
+    with np.load(os.path.join(in_dir, 'payload.npz')) as data:
+        columns = {key: data[key] for key in entry['payload_columns']}
+    read_s += time.perf_counter() - start
+
+    _create_collection(client, name, entry)
+
+    for lo in range(0, entry['points'], batch_size):
+        hi = min(lo + batch_size, entry['points'])
+
+        start = time.perf_counter()
+        dense = np.asarray(vectors[lo:hi], dtype=np.float32)
+        payloads = payload_rows(columns, entry['payload_columns'], lo, hi)
+        read_s += time.perf_counter() - start
+
+        points = []
+        for i, payload in enumerate(payloads):
+            vector = dense[i].tolist()
+            if sparse:
+                vector = {'': vector}
+                for s, parts in sparse.items():
+                    a, b = parts['offsets'][lo + i], parts['offsets'][lo + i + 1]
+                    vector[s] = SparseVector(indices=parts['indices'][a:b].tolist(),
+                                             values=parts['values'][a:b].tolist())
+            points.append(PointStruct(id=int(ids[lo + i]), vector=vector, payload=payload))
+
+        start = time.perf_counter()
+        client.upsert(collection_name=name, points=points, wait=True)
+        upload_s += time.perf_counter() - start
+
+    return read_s, upload_s
+
+
+def restore_snapshot(client, snapshot_dir=SNAPSHOT_DIR, names=None, batch_size=RESTORE_BATCH_SIZE):
+    """Recreate collections (default: all in the manifest) and side files from a snapshot"""
+    manifest = load_manifest(snapshot_dir)
+    names = names or list(manifest['collections'])
+
+    timings = {}
+    for name in names:
+        entry = manifest['collections'][name]
+        start = time.perf_counter()
+        read_s, upload_s = restore_collection(client, name, entry, os.path.join(snapshot_dir, name), batch_size)
+        timings[name] = {'points': entry['points'], 'read_s': read_s, 'upload_s': upload_s,
+                         'total_s': time.perf_counter() - start}
+
+    for path in manifest['files']:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copy(os.path.join(snapshot_dir, os.path.basename(path)), path)
+
+    return timings
+
+
+if __name__ == "__main__":
+    import argparse
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Export or restore Qdrant collections")
+    parser.add_argument('action', choices=['export', 'restore'])
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument('--batch-size', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.action == 'export':
+        print("💾 EXPORTING QDRANT SNAPSHOT")
+        print("="*70)
+        client = QdrantClient("localhost", port=6333)
+        manifest = export_snapshot(client, args.dir, batch_size=args.batch_size or EXPORT_BATCH_SIZE)
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(args.dir) for f in files)
+        print(f"\n  📁 {len(manifest['collections'])} collections, {size / 1e6:.1f} MB → {args.dir}")
+    else:
+        print("♻️  RESTORING QDRANT SNAPSHOT")
+        print("="*70)
+        client = QdrantClient("localhost", port=6333)
+        timings = restore_snapshot(client, args.dir, batch_size=args.batch_size or RESTORE_BATCH_SIZE)
+
+        print(f"\n  {'Collection':18} {'Points':>8} {'Read s':>8} {'Upload s':>9} {'Total s':>8} {'Points/s':>9}")
+        for name, t in timings.items():
+            print(f"  {name:18} {t['points']:>8,} {t['read_s']:>8.2f} {t['upload_s']:>9.2f} "
+                  f"{t['total_s']:>8.2f} {t['points'] / max(t['total_s'], 1e-9):>9,.0f}")
@@ -0,0 +1,35 @@
+"""
+Species and consumer-resource relationships shared across the pipeline
+
+Relationships live in data/species_relationships.csv so taxa and edges
+can be added without code changes.
+"""
+import csv
+import os
+
+SPECIES_INFO = {
+    'papilio_polytes': {'type': 'butterfly', 'common': 'Common Mormon', 'role': 'consumer'},
+    'danaus_chrysippus': {'type': 'butterfly', 'common': 'Plain Tiger', 'role': 'consumer'},
+    'apis_cerana': {'type': 'bee', 'common': 'Asian Honey Bee', 'role': 'pollinator'},
+    'apis_dorsata': {'type': 'bee', 'common': 'Giant Honey Bee', 'role': 'pollinator'},
+    'leptocoma_zeylonica': {'type': 'bird', 'common': 'Purple-rumped Sunbird', 'role': 'consumer'},
+    'eudynamys_scolopaceus': {'type': 'bird', 'common': 'Asian Koel', 'role': 'consumer'},
+    'murraya_koenigii': {'type': 'plant', 'common': 'Curry Leaf', 'role': 'resource'},
+    'mangifera_indica': {'type': 'plant', 'common': 'Mango', 'role': 'resource'},
+    'ficus_benghalensis': {'type': 'plant', 'common': 'Banyan', 'role': 'resource'},
+    'lantana_camara': {'type': 'plant', 'common': 'Lantana', 'role': 'resource'}
+}
+
+COMMON_TO_KEY = {info['common']: key for key, info in SPECIES_INFO.items()}
+
+# Next to the scripts, not the working directory: every module imports the catalog
+RELATIONSHIPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'species_relationships.csv')
+
+
+def load_relationships(path=RELATIONSHIPS_PATH):
+    """Consumer -> resource edges (one dict per CSV row)"""
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+SPECIES_RELATIONSHIPS = load_relationships()
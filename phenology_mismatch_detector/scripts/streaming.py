@@ -0,0 +1,110 @@
+"""
+Bounded-memory CSV streaming helpers
+
+Chunk sizes are derived from a memory ceiling: a small sample of the file
+gives the in-memory size of a row, and the chunk holds as many rows as fit
+in the budget (plus any per-row working overhead of the consumer, e.g.
+embeddings). Peak RSS comes from resource.getrusage.
+
+Deduplication across chunks spills rows to hash-partitioned bucket files
+and drops duplicates one bucket at a time, so no set of every key seen is
+ever held in memory.
+
+Run directly to check that peak RSS stays flat as the input grows.
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MEMORY_MB = 256
+SAMPLE_ROWS = 1000
+MIN_CHUNK_ROWS = 100
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def chunk_rows_for_budget(path, memory_mb=DEFAULT_MEMORY_MB, row_overhead_bytes=0, **read_kwargs):
+    """Rows per chunk so that one chunk's working set fits in memory_mb"""
+    sample = pd.read_csv(path, nrows=SAMPLE_ROWS, **read_kwargs)
+    if sample.empty:
+        return MIN_CHUNK_ROWS
+
+    # Parsing and the transform steps hold about two copies of a chunk
+    row_bytes = 2 * sample.memory_usage(deep=True).sum() / len(sample) + row_overhead_bytes
+    return max(MIN_CHUNK_ROWS, int(memory_mb * 1024 ** 2 / row_bytes))
+
+
+def iter_csv_chunks(path, memory_mb=DEFAULT_MEMORY_MB, row_overhead_bytes=0, chunksize=None, **read_kwargs):
+    """Yield DataFrame chunks of a CSV sized to the memory ceiling"""
+    if chunksize is None:
+        chunksize = chunk_rows_for_budget(path, memory_mb, row_overhead_bytes, **read_kwargs)
+    yield from pd.read_csv(path, chunksize=chunksize, **read_kwargs)
+
+
+def append_csv(df, path, first):
+    """Write a chunk to path, with the header only for the first chunk"""
+    df.to_csv(path, mode='w' if first else 'a', header=first, index=False)
+
+
+def count_lines(path):
+    """Newlines in a file, read in 1 MB blocks (an upper bound on its CSV rows)"""
+    with open(path, 'rb') as f:
+        return sum(block.count(b'\n') for block in iter(lambda: f.read(1 << 20), b''))
+
+
+def iter_unique_chunks(chunks, key, n_buckets, workdir):
+    """
+    Yield the rows of chunks with duplicate keys dropped (first occurrence
+    kept). Rows are spilled to n_buckets files in workdir by key hash, so
+    every copy of a key lands in the same bucket and only one bucket is in
+    memory at a time; size n_buckets so a bucket fits the memory budget.
+    """
+    paths = [os.path.join(workdir, f'bucket_{b}.csv') for b in range(n_buckets)]
+    written = np.zeros(n_buckets, dtype=bool)
+
+    for chunk in chunks:
+        buckets = pd.util.hash_pandas_object(chunk[key], index=False).to_numpy() % n_buckets
+        for b in np.unique(buckets):
+            append_csv(chunk[buckets == b], paths[b], first=not written[b])
+            written[b] = True
+
+    for b in np.flatnonzero(written):
+        yield pd.read_csv(paths[b]).drop_duplicates(subset=[key])
+        os.remove(paths[b])
+
+
+if __name__ == "__main__":
+
+    print("🌊 STREAMING CLEANING: PEAK RSS vs INPUT SIZE")
+    print("="*70)
+
+    source = 'data/raw/papilio_polytes.csv'
+    raw = pd.read_csv(source)
+    workdir = tempfile.mkdtemp()
+
+    script = (
+        "import sys; sys.path.insert(0, 'scripts');"
+        "from clean_and_filter_data import clean_species_data; from streaming import peak_rss_mb;"
+        f"clean_species_data('input.csv', 'papilio_polytes', memory_mb=16, raw_dir={workdir!r}, output_dir={workdir!r});"
+        "print(f'PEAK {peak_rss_mb():.1f}')"
+    )
+
+    print(f"\n  {'Copies':>6} {'Input MB':>9} {'Rows':>10} {'Peak RSS MB':>12}")
+    for copies in [1, 8, 32, 128]:
+        path = os.path.join(workdir, 'input.csv')
+        for i in range(copies):
+            append_csv(raw, path, first=(i == 0))
+
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        peak = float(out.rsplit('PEAK', 1)[1])
+        print(f"  {copies:>6} {os.path.getsize(path) / 1e6:>9.1f} {len(raw) * copies:>10,} {peak:>12.1f}")
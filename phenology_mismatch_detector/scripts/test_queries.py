@@ -3,28 +3,36 @@ Test Qdrant queries
 """
 from qdrant_client import QdrantClient
 from qdrant_client.models import Filter, FieldCondition, MatchValue
-from sentence_transformers import SentenceTransformer
+from embedders import get_embedder
 import pandas as pd
+from hybrid_search import hybrid_search
+from payload_schema import COMMON_CODES, TYPE_CODES, TIMING_FIELDS, load_place_table, decode_observation
 
 print("🔍 TESTING QDRANT SEMANTIC SEARCH")
 print("="*70)
 
 # Initialize
 client = QdrantClient("localhost", port=6333)
-embedder = SentenceTransformer('all-MiniLM-L6-v2')
+embedder = get_embedder()
+places = load_place_table()
 
-def semantic_search(query_text, collection_name='observations', limit=5, filters=None):
-    """Perform semantic search"""
+def semantic_search(query_text, collection_name='observations', limit=5, filters=None, hybrid=False,
+                    with_payload=True):
+    """Perform semantic search (hybrid=True fuses dense and BM25 results, observations only)"""
     
     
     query_vector = embedder.encode(query_text).tolist()
     
+    if hybrid:
+        return hybrid_search(client, query_text, query_vector, collection_name, limit=limit,
+                             query_filter=filters, with_payload=with_payload)
    
     results = client.query_points(
         collection_name=collection_name,
         query=query_vector,
         limit=limit,
-        query_filter=filters
+        query_filter=filters,
+        with_payload=with_payload
     )
     
     return results.points  
@@ -40,11 +48,12 @@ def print_results(results, title):
         return
     
     for i, hit in enumerate(results, 1):
+        obs = decode_observation(hit.payload, places)
         print(f"\n  [{i}] Score: {hit.score:.3f}")
-        print(f"      {hit.payload.get('text_description', 'No description')}")
-        print(f"      Species: {hit.payload.get('species_common', 'N/A')}")
-        print(f"      Date: {hit.payload.get('observed_date', 'N/A')[:10] if hit.payload.get('observed_date') else 'N/A'}")
-        print(f"      Day of Year: {hit.payload.get('day_of_year', 'N/A')}")
+        print(f"      Species: {obs.get('species_common', 'N/A')} ({obs.get('season', 'N/A')})")
+        print(f"      Place: {obs.get('place', 'N/A')[:60]}")
+        print(f"      Date: {obs.get('observed_date', 'N/A')}")
+        print(f"      Day of Year: {obs.get('day_of_year', 'N/A')}")
 
 
 
@@ -57,7 +66,7 @@ results = semantic_search(
     limit=5,
     filters=Filter(
         must=[
-            FieldCondition(key="species_type", match=MatchValue(value="butterfly"))
+            FieldCondition(key="type_id", match=MatchValue(value=TYPE_CODES["butterfly"]))
         ]
     )
 )
@@ -67,7 +76,8 @@ print_results(results, "Butterfly emergence in spring")
 print("\n" + "▶"*35)
 results = semantic_search(
     "mango tree flowering blooming",
-    limit=5
+    limit=5,
+    hybrid=True
 )
 print_results(results, "Mango flowering events")
 
@@ -153,10 +163,11 @@ bee_results = semantic_search(
     limit=200,
     filters=Filter(
         must=[
-            FieldCondition(key="species_common", match=MatchValue(value="Giant Honey Bee")),
+            FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES["Giant Honey Bee"])),
             FieldCondition(key="year", match=MatchValue(value=2024))
         ]
-    )
+    ),
+    with_payload=TIMING_FIELDS
 )
 
 # Get Mango observations in 2024
@@ -165,10 +176,11 @@ mango_results = semantic_search(
     limit=200,
     filters=Filter(
         must=[
-            FieldCondition(key="species_common", match=MatchValue(value="Mango")),
+            FieldCondition(key="species_id", match=MatchValue(value=COMMON_CODES["Mango"])),
             FieldCondition(key="year", match=MatchValue(value=2024))
         ]
-    )
+    ),
+    with_payload=TIMING_FIELDS
 )
 
 if bee_results and mango_results:
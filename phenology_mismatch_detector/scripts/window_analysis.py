@@ -0,0 +1,203 @@
+"""
+Phenological shifts between arbitrary year windows
+
+Every species' observations are binned into one 366-day DOY histogram per
+year, and the histograms are accumulated along the year axis. The
+histogram of any window of years is then the difference of two
+cumulative rows, an O(1) step per species whatever the window length, so
+baseline / current medians, onset, end and concentration for any pair of
+windows come straight from those rows. All species (and, for sliding
+trends, all windows) are evaluated in one vectorized call.
+
+Run directly to compare two windows and print sliding-window shift trends:
+    python scripts/window_analysis.py --baseline 2019-2020 --current 2022-2024 --width 2
+"""
+import numpy as np
+import pandas as pd
+
+from circular_stats import YEAR_DAYS, circular_distance, doy_to_angle, histogram_circular_median
+from doy_sketch import TIMING_QUANTILES, circular_quantiles
+from payload_schema import SPECIES_KEYS
+
+BASELINE_YEARS = (2019, 2020)
+CURRENT_YEARS = (2022, 2024)
+
+_ANGLES = doy_to_angle(np.arange(1, YEAR_DAYS + 1))
+
+
+def parse_years(text):
+    """'2019-2020' or '2021' -> inclusive (first, last) years"""
+    first, _, last = str(text).partition('-')
+    return int(first), int(last or first)
+
+
+def format_years(years):
+    return f"{years[0]}" if years[0] == years[1] else f"{years[0]}-{years[1]}"
+
+
+def period_path(name, years):
+    """Per-period observation export written by clean_and_filter_data"""
+    return f'data/processed/{name}_{years[0]}_{years[1]}.csv'
+
+
+def histogram_stats(hist):
+    """n, median, onset, end and resultant length for histograms of shape (groups, 366)"""
+    hist = np.atleast_2d(hist)
+    n = hist.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultant = np.hypot(hist @ np.cos(_ANGLES), hist @ np.sin(_ANGLES)) / n
+    quantiles = circular_quantiles(hist, [TIMING_QUANTILES['onset'], TIMING_QUANTILES['end']])
+    return {
+        'n': n,
+        'median_doy': np.atleast_1d(histogram_circular_median(hist)),
+        'onset_doy': quantiles[:, 0],
+        'end_doy': quantiles[:, 1],
+        'resultant_length': resultant
+    }
+
+
+class YearlyHistograms:
+    """Cumulative per-species yearly DOY histograms over a contiguous range of years"""
+
+    def __init__(self, species, first_year, hist):
+        self.species = list(species)
+        self.first_year = int(first_year)
+        self.last_year = self.first_year + hist.shape[1] - 1
+        # cumulative[:, k] = sum of the first k years' histograms
+        self.cumulative = np.concatenate(
+            [np.zeros((len(self.species), 1, YEAR_DAYS)), np.cumsum(hist, axis=1)], axis=1
+        )
+
+    @classmethod
+    def from_frame(cls, df, weight_col=None):
+        """From observations (species_key, year, day_of_year), optionally weighted"""
+        species, codes = np.unique(df['species_key'].to_numpy(), return_inverse=True)
+        years = df['year'].to_numpy(dtype=np.int64)
+        first, n_years = years.min(), years.max() - years.min() + 1
+        weights = df[weight_col].to_numpy(dtype=float) if weight_col else None
+        flat = (codes.ravel() * n_years + years - first) * YEAR_DAYS + df['day_of_year'].to_numpy(dtype=np.int64) - 1
+        hist = np.bincount(flat, weights=weights, minlength=len(species) * n_years * YEAR_DAYS)
+        return cls(species, first, hist.reshape(len(species), n_years, YEAR_DAYS).astype(float))
+
+    @classmethod
+    def from_sketches(cls, sketches):
+        """From DoySketches (e.g. the ones saved during ingest), summed over regions"""
+        keys, counts = sketches.rollup(('species', 'year'))
+        codes, species = pd.factorize(keys['species'].map(lambda code: SPECIES_KEYS[code]), sort=True)
+        years = keys['year'].to_numpy(dtype=np.int64)
+        first, n_years = years.min(), years.max() - years.min() + 1
+        hist = np.zeros((len(species), n_years, YEAR_DAYS))
+        hist[codes, years - first] = counts
+        return cls(species, first, hist)
+
+    def _bounds(self, years):
+        """Cumulative rows of a window, clamped to the covered years (lo == hi when it has none)"""
+        n_years = self.last_year - self.first_year + 1
+        lo = min(max(years[0] - self.first_year, 0), n_years)
+        hi = min(max(years[1] - self.first_year + 1, lo), n_years)
+        return lo, hi
+
+    def covers(self, years):
+        """Whether an inclusive (first, last) window overlaps the covered years"""
+        lo, hi = self._bounds(years)
+        return hi > lo
+
+    def window(self, years):
+        """(species, 366) histogram of an inclusive (first, last) window of years; all zero outside the data"""
+        lo, hi = self._bounds(years)
+        return self.cumulative[:, hi] - self.cumulative[:, lo]
+
+    def window_stats(self, years):
+        return pd.DataFrame(histogram_stats(self.window(years)), index=pd.Index(self.species, name='species_key'))
+
+    def compare(self, baseline=BASELINE_YEARS, current=CURRENT_YEARS):
+        """Baseline vs current timing and shift (current - baseline, days) for every species"""
+        before, after = self.window_stats(baseline), self.window_stats(current)
+        table = before.add_prefix('baseline_').join(after.add_prefix('current_'))
+        table['shift_days'] = circular_distance(table['current_median_doy'], table['baseline_median_doy'])
+        return table
+
+    def sliding_windows(self, width=1):
+        """Start years and (species, windows, 366) histograms of every width-year window"""
+        starts = np.arange(self.first_year, self.last_year - width + 2)
+        return starts, self.cumulative[:, width:] - self.cumulative[:, :-width]
+
+    def window_medians(self, width=1):
+        """Start years and (species, windows) circular medians of every width-year window"""
+        starts, hist = self.sliding_windows(width)
+        median = np.atleast_1d(histogram_circular_median(hist.reshape(-1, YEAR_DAYS)))
+        return starts, median.reshape(hist.shape[:2])
+
+    def shift_matrix(self, width=1):
+        """
+        Median shift between every ordered pair of width-year windows:
+        (start years, array of shape (species, windows, windows)) where
+        [s, i, j] is window j's median minus window i's.
+        """
+        starts, median = self.window_medians(width)
+        return starts, circular_distance(median[:, None, :], median[:, :, None])
+
+    def shift_trend(self, width=1):
+        """Least-squares trend (days per year) of each species' sliding-window median"""
+        starts, median = self.window_medians(width)
+        # Medians relative to each species' first window with data, so the year wrap can't break the fit
+        first = np.argmax(~np.isnan(median), axis=1)
+        relative = circular_distance(median, median[np.arange(len(median)), first][:, None])
+
+        valid = ~np.isnan(relative)
+        x = np.where(valid, starts[None, :], np.nan)
+        x_dev = x - np.nanmean(x, axis=1, keepdims=True)
+        y_dev = relative - np.nanmean(relative, axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = np.nansum(x_dev * y_dev, axis=1) / np.nansum(x_dev ** 2, axis=1)
+        return pd.DataFrame({
+            'species_key': self.species,
+            'windows': valid.sum(axis=1),
+            'trend_days_per_year': np.where(valid.sum(axis=1) >= 2, slope, np.nan)
+        })
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Phenological shifts between any two year windows")
+    parser.add_argument('--baseline', type=parse_years, default=BASELINE_YEARS, help="e.g. 2019-2020")
+    parser.add_argument('--current', type=parse_years, default=CURRENT_YEARS, help="e.g. 2022-2024")
+    parser.add_argument('--width', type=int, default=1, help="years per window for sliding trends")
+    args = parser.parse_args()
+
+    df = pd.read_csv('data/processed/all_species_combined.csv')
+    hists = YearlyHistograms.from_frame(df)
+
+    print(f"🪟 SHIFTS {format_years(args.baseline)} → {format_years(args.current)}")
+    print("="*70)
+    table = hists.compare(args.baseline, args.current)
+    print(f"\n  {'Species':24} {'Base n':>6} {'Base med':>8} {'Cur n':>6} {'Cur med':>8} {'Shift':>7}")
+    for species, r in table.iterrows():
+        print(f"  {species:24} {r['baseline_n']:>6.0f} {r['baseline_median_doy']:>8.0f} "
+              f"{r['current_n']:>6.0f} {r['current_median_doy']:>8.0f} {r['shift_days']:>+7.1f}")
+
+    starts = hists.sliding_windows(args.width)[0]
+    trends = hists.shift_trend(args.width)
+    print(f"\n  Sliding {args.width}-year windows ({len(starts)} windows, {len(starts) * (len(starts) - 1) // 2} pairs "
+          f"per species), median trend:")
+    for _, r in trends.iterrows():
+        print(f"  {r['species_key']:24} {r['trend_days_per_year']:>+7.1f} days/year over {r['windows']} windows")
+
+    # Every window pair for every species, vs re-filtering the observations per pair
+    start = time.perf_counter()
+    for width in range(1, hists.last_year - hists.first_year + 2):
+        hists.shift_matrix(width)
+    fast = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for width in range(1, hists.last_year - hists.first_year + 2):
+        for first in range(hists.first_year, hists.last_year - width + 2):
+            subset = df[df['year'].between(first, first + width - 1)]
+            subset.groupby('species_key')['day_of_year'].apply(
+                lambda d: histogram_circular_median(np.bincount(d - 1, minlength=YEAR_DAYS))
+            )
+    slow = time.perf_counter() - start
+    print(f"\n  All window widths and pairs: {fast * 1000:.1f} ms from cumulative histograms "
+          f"vs {slow * 1000:.0f} ms re-filtering observations per window")